@@ -1,6 +1,6 @@
 from typing import Union, Any, List, Optional, override
 
-from django.http import HttpRequest, HttpResponse
+from django.http import HttpRequest, HttpResponse, HttpResponseNotModified
 from ninja import NinjaAPI, Swagger
 from ninja.constants import NOT_SET, NOT_SET_TYPE
 import jwt
@@ -8,9 +8,15 @@ from ninja.throttling import BaseThrottle
 
 from arkad.auth import AuthBearer, OPTIONAL_AUTH
 from arkad.customized_django_ninja import Router
-from arkad.jwt_utils import PUBLIC_KEY, PublicKeySchema
+from arkad.jwt_utils import (
+    PUBLIC_KEY,
+    PublicKeySchema,
+    JWKS_JSON,
+    JWKS_ETAG,
+    JWKSetSchema,
+)
 from user_models.models import AuthenticatedRequest
-from user_models.api import router as user_router
+from user_models.api import me as me_router, router as user_router
 from student_sessions.api import router as student_sessions_router
 from companies.api import router as company_router
 from event_booking.api import router as event_booking_router
@@ -47,6 +53,18 @@ class CustomNinjaAPI(NinjaAPI):
         )
 
 
+# New keys are published well before they are used for signing, so clients may cache keys for long
+KEY_CACHE_CONTROL: str = "public, max-age=86400, stale-while-revalidate=604800"
+
+if not PUBLIC_KEY.strip().startswith(
+    "-----BEGIN PUBLIC KEY-----"
+) or not PUBLIC_KEY.strip().endswith("-----END PUBLIC KEY-----"):
+    raise ValueError("The public key is not a PEM encoded public key")
+
+_PUBLIC_KEY_RESPONSE: str = PublicKeySchema(public_key=PUBLIC_KEY).model_dump_json(
+    by_alias=True
+)
+
 api = CustomNinjaAPI(
     title="Arkad API",
     docs=Swagger(settings={"persistAuthorization": True}),
@@ -54,6 +72,7 @@ api = CustomNinjaAPI(
     default_router=Router(),
 )
 api.add_router("user", user_router)
+api.add_router("me", me_router)
 api.add_router("student-session", student_sessions_router)
 api.add_router("company", company_router)
 api.add_router("events", event_booking_router)
@@ -88,8 +107,33 @@ def on_invalid_algorithm(request: HttpRequest, exc: Exception) -> HttpResponse:
     tags=["Cryptography"],
 )
 def get_public_key(request: AuthenticatedRequest):
-    if not PUBLIC_KEY.strip().startswith(
-        "-----BEGIN PUBLIC KEY-----"
-    ) or not PUBLIC_KEY.strip().endswith("-----END PUBLIC KEY-----"):
-        raise jwt.InvalidTokenError("Something went very wrong")
-    return PublicKeySchema(public_key=PUBLIC_KEY)
+    """
+    Returns the PEM encoded public key of the original RS256 key.
+
+    Prefer .well-known/jwks.json which contains all keys, including rotated ones.
+    """
+    response = HttpResponse(_PUBLIC_KEY_RESPONSE, content_type="application/json")
+    response["Cache-Control"] = KEY_CACHE_CONTROL
+    return response
+
+
+@api.get(
+    ".well-known/jwks.json",
+    response={200: JWKSetSchema},
+    auth=None,
+    tags=["Cryptography"],
+)
+def get_jwks(request: HttpRequest):
+    """
+    Returns the JSON Web Key Set with every key tokens may be signed with, the key is
+    selected using the kid header of the token.
+
+    Served with long caching headers and an ETag, send If-None-Match to revalidate.
+    """
+    if request.headers.get("If-None-Match") == JWKS_ETAG:
+        response: HttpResponse = HttpResponseNotModified()
+    else:
+        response = HttpResponse(JWKS_JSON, content_type="application/json")
+    response["ETag"] = JWKS_ETAG
+    response["Cache-Control"] = KEY_CACHE_CONTROL
+    return response
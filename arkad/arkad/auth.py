@@ -1,25 +1,29 @@
-from typing import Callable
+from typing import Any, Callable
 
 import jwt
 from django.http import HttpRequest
 from ninja.security import HttpBearer
 
-from arkad.jwt_utils import jwt_decode
+from arkad.jwt_utils import jwt_decode_cached
+from user_models.auth_cache import get_cached_user, is_token_revoked
 from user_models.models import User
 
 
 class AuthBearer(HttpBearer):
     def authenticate(self, request: HttpRequest, token: str) -> User:
         # Implement authentication
-        decoded: dict[str, str] = jwt_decode(token)
+        decoded: dict[str, Any] = jwt_decode_cached(token)
         if "user_id" not in decoded:
             raise jwt.InvalidTokenError("No user id")
-        try:
-            user: User = User.objects.get(id=decoded["user_id"])
-            if not user.is_active:
-                raise jwt.InvalidTokenError("User is inactive")
-        except User.DoesNotExist:
+        user_id: int = int(decoded["user_id"])
+        # Cached lookup, invalidated whenever the user is saved or deleted
+        user: User | None = get_cached_user(user_id)
+        if user is None:
             raise jwt.InvalidTokenError("No such user")
+        if not user.is_active:
+            raise jwt.InvalidTokenError("User is inactive")
+        if is_token_revoked(user_id, decoded.get("iat")):
+            raise jwt.InvalidTokenError("Token has been revoked")
         request.user = user
         return user
 
@@ -3,7 +3,8 @@ from urllib.parse import parse_qs
 
 from channels.generic.websocket import AsyncWebsocketConsumer  # type: ignore[import-untyped]
 
-from arkad.jwt_utils import jwt_decode
+from arkad.jwt_utils import jwt_decode_cached
+from user_models.auth_cache import get_cached_user, is_token_revoked
 from user_models.models import User
 
 
@@ -55,7 +56,7 @@ class AuthenticatedAsyncWebsocketConsumer(AsyncWebsocketConsumer):  # type: igno
             return False
 
         try:
-            decoded: Dict[str, Any] = jwt_decode(token)
+            decoded: Dict[str, Any] = jwt_decode_cached(token)
             if (
                 expected_token_type is not None
                 and decoded.get("token_type") != expected_token_type
@@ -70,7 +71,7 @@ class AuthenticatedAsyncWebsocketConsumer(AsyncWebsocketConsumer):  # type: igno
 
             user_id: int = int(user_id_raw)
             # Minimal sync DB call; subclasses may override to fetch related data.
-            user: Optional[User] = await self._get_user(user_id)
+            user: Optional[User] = await self._get_user(user_id, decoded.get("iat"))
             if user is None or not user.is_active:
                 await self.close(code=4001)
                 return False
@@ -81,14 +82,15 @@ class AuthenticatedAsyncWebsocketConsumer(AsyncWebsocketConsumer):  # type: igno
             await self.close(code=4001)
             return False
 
-    async def _get_user(self, user_id: int) -> Optional[User]:
+    async def _get_user(
+        self, user_id: int, issued_at: Optional[float] = None
+    ) -> Optional[User]:
         # Import locally to avoid global decorator type confusion and keep strict typing.
         from channels.db import database_sync_to_async  # type: ignore[import-untyped]
 
         def _sync() -> Optional[User]:
-            try:
-                return User.objects.get(id=user_id)
-            except User.DoesNotExist:
+            if is_token_revoked(user_id, issued_at):
                 return None
+            return get_cached_user(user_id)
 
         return await database_sync_to_async(_sync)()  # type: ignore[no-any-return]
@@ -1,10 +1,17 @@
-from typing import override, Any
+import base64
+import binascii
+import json
+from typing import Callable, Sequence, override, Any
 
 import ninja
+from django.core.exceptions import ValidationError
+from django.db.models import Model, QuerySet
+from django.http import HttpResponse
 from ninja import Schema as NinjaSchema
+from ninja.errors import HttpError
 
 from typing import Generic, TypeVar
-from pydantic import RootModel
+from pydantic import Field, RootModel
 from pydantic.alias_generators import to_camel
 
 
@@ -36,3 +43,93 @@ T = TypeVar("T")
 
 class ListType(RootModel[list[T]], Generic[T]):
     pass
+
+
+MAX_PAGE_SIZE: int = 500
+# Response header with the cursor of the next page, left out on the last page
+NEXT_CURSOR_HEADER: str = "X-Next-Cursor"
+
+M = TypeVar("M", bound=Model)
+
+
+class KeysetPagination(Schema):
+    """
+    Opt-in keyset pagination for list routes, use as `pagination: Query[KeysetPagination]`.
+
+    Without `limit` the whole list is returned as before, so older app versions are unaffected.
+    With it the route returns at most `limit` items ordered by a unique key and sets the
+    X-Next-Cursor header, which is passed as `cursor` to get the items after them.
+    """
+
+    limit: int | None = Field(default=None, ge=1, le=MAX_PAGE_SIZE)
+    cursor: str | None = None
+
+    def after(self) -> Any:
+        """The key of the last item of the previous page, None for the first page."""
+        if self.cursor is None:
+            return None
+        try:
+            return json.loads(base64.urlsafe_b64decode(self.cursor.encode()))
+        except (binascii.Error, UnicodeDecodeError, ValueError):
+            raise HttpError(400, "Invalid cursor")
+
+
+def _encode_cursor(key: Any) -> str:
+    return base64.urlsafe_b64encode(json.dumps(key, default=str).encode()).decode()
+
+
+def _set_next_cursor(response: HttpResponse, last_key: Any | None) -> None:
+    if last_key is not None:
+        response[NEXT_CURSOR_HEADER] = _encode_cursor(last_key)
+
+
+def paginate_queryset(
+    queryset: QuerySet[M],
+    key: str,
+    pagination: KeysetPagination,
+    response: HttpResponse,
+) -> QuerySet[M] | list[M]:
+    """
+    Returns the page of the queryset after the cursor, ordered by the unique field `key`
+    (which should lead an index together with the fields the queryset is filtered on).
+    Returns the queryset untouched when pagination was not asked for.
+    """
+    if pagination.limit is None:
+        return queryset
+    after: Any = pagination.after()
+    queryset = queryset.order_by(key)
+    try:
+        if after is not None:
+            queryset = queryset.filter(**{f"{key}__gt": after})
+        # One extra row tells whether there is a next page
+        items: list[M] = list(queryset[: pagination.limit + 1])
+    except (TypeError, ValueError, ValidationError):
+        raise HttpError(400, "Invalid cursor")
+
+    page: list[M] = items[: pagination.limit]
+    has_next: bool = len(items) > pagination.limit
+    _set_next_cursor(response, getattr(page[-1], key) if has_next else None)
+    return page
+
+
+def paginate_sorted(
+    items: Sequence[T],
+    key: Callable[[T], Any],
+    pagination: KeysetPagination,
+    response: HttpResponse,
+) -> Sequence[T]:
+    """Like paginate_queryset, for items already in memory and sorted by the unique `key`."""
+    if pagination.limit is None:
+        return items
+    after: Any = pagination.after()
+    try:
+        remaining: list[T] = [
+            item for item in items if after is None or key(item) > after
+        ]
+    except TypeError:
+        raise HttpError(400, "Invalid cursor")
+
+    page: list[T] = remaining[: pagination.limit]
+    has_next: bool = len(remaining) > pagination.limit
+    _set_next_cursor(response, key(page[-1]) if has_next else None)
+    return page
@@ -0,0 +1,70 @@
+from typing import Any, ClassVar, Collection, Iterable, Self, cast
+
+from django.db import models
+
+
+class TrackedFieldsModel(models.Model):
+    """
+    Remembers the values of `tracked_fields` as they were loaded from (or last saved to) the
+    database, so a save can tell which of them changed without fetching the old row.
+
+    Receivers of post_save see the changes of the save that sent the signal, the remembered
+    values are only updated once the save has finished.
+    """
+
+    tracked_fields: ClassVar[tuple[str, ...]] = ()
+
+    class Meta:
+        abstract = True
+
+    @classmethod
+    def from_db(
+        cls, db: str | None, field_names: Collection[str], values: Collection[Any]
+    ) -> Self:
+        instance: Self = super().from_db(db, field_names, values)
+        instance._remember_tracked_fields()
+        return instance
+
+    def _attname(self, name: str) -> str:
+        return cast("models.Field[Any, Any]", self._meta.get_field(name)).attname
+
+    def _remember_tracked_fields(self, fields: Collection[str] | None = None) -> None:
+        deferred: set[str] = self.get_deferred_fields()
+        remembered: dict[str, Any] = self.__dict__.setdefault("_tracked_values", {})
+        for name in self.tracked_fields:
+            attname: str = self._attname(name)
+            if (fields is None or name in fields) and attname not in deferred:
+                remembered[name] = getattr(self, attname)
+
+    def changed_fields(self, update_fields: Iterable[str] | None = None) -> set[str]:
+        """
+        The tracked fields that differ from the database, all of them if the instance is new.
+        Pass the update_fields of a save to only get the changes that save writes.
+        """
+        names: list[str] = [
+            name
+            for name in self.tracked_fields
+            if update_fields is None or name in update_fields
+        ]
+        remembered: dict[str, Any] | None = self.__dict__.get("_tracked_values")
+        if remembered is None:
+            return set(names)
+
+        deferred: set[str] = self.get_deferred_fields()
+        changed: set[str] = set()
+        for name in names:
+            attname: str = self._attname(name)
+            if name in remembered:
+                if getattr(self, attname) != remembered[name]:
+                    changed.add(name)
+            elif attname not in deferred:  # Deferred when loaded, but assigned since
+                changed.add(name)
+        return changed
+
+    def save(self, *args: Any, **kwargs: Any) -> None:
+        super().save(*args, **kwargs)
+        self._remember_tracked_fields(kwargs.get("update_fields"))
+
+    def refresh_from_db(self, *args: Any, **kwargs: Any) -> None:
+        super().refresh_from_db(*args, **kwargs)
+        self._remember_tracked_fields(kwargs.get("fields"))
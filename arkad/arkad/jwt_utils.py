@@ -1,52 +1,261 @@
 import datetime
+import hashlib
+import json
 import os
+import threading
+import time
 from pathlib import Path
 from typing import Any, cast
 
 import jwt
+from cachetools import TLRUCache  # type: ignore[import-untyped]
+from cryptography.hazmat.primitives.asymmetric.ec import (
+    SECP256R1,
+    EllipticCurvePrivateKey,
+    EllipticCurvePublicKey,
+)
+from cryptography.hazmat.primitives.asymmetric.ed25519 import (
+    Ed25519PrivateKey,
+    Ed25519PublicKey,
+)
+from cryptography.hazmat.primitives.asymmetric.rsa import RSAPrivateKey, RSAPublicKey
+from cryptography.hazmat.primitives.serialization import (
+    Encoding,
+    PublicFormat,
+    load_pem_private_key,
+    load_pem_public_key,
+)
 from django.utils import timezone
 from arkad.customized_django_ninja import Schema
-from arkad.settings import BASE_DIR
+from arkad.settings import BASE_DIR, JWT_SIGNING_KEY_ID
 
 PRIVATE_SIGNING_KEY_LOCATION: Path = BASE_DIR / "private" / "private.pem"
 PUBLIC_KEY_LOCATION: Path = BASE_DIR / "private" / "public.pem"
 
+# Keyring used for key rotation. Every key is a PEM file named after its key id (kid):
+#   <kid>.pem      private key, can sign and verify
+#   <kid>.pub.pem  public key only, for retired keys whose tokens are still accepted
+# RSA (RS256), EC P-256 (ES256) and Ed25519 (EdDSA) keys are supported.
+# To rotate: add the new key, wait for clients to refresh the JWKS, then point
+# JWT_SIGNING_KEY_ID at it. Remove the old key once its tokens have expired.
+KEYRING_LOCATION: Path = BASE_DIR / "private" / "keys"
+
+# Key id of the private.pem/public.pem pair, also used for tokens without a kid header
+LEGACY_KEY_ID: str = "default"
+
+type PrivateKey = RSAPrivateKey | EllipticCurvePrivateKey | Ed25519PrivateKey
+type PublicKey = RSAPublicKey | EllipticCurvePublicKey | Ed25519PublicKey
+
+
+class JWTKey:
+    def __init__(
+        self, kid: str, public_key: PublicKey, private_key: PrivateKey | None = None
+    ) -> None:
+        self.kid = kid
+        self.public_key = public_key
+        self.private_key = private_key
+        self.algorithm = self._algorithm_for(public_key)
+
+    @staticmethod
+    def _algorithm_for(public_key: PublicKey) -> str:
+        if isinstance(public_key, RSAPublicKey):
+            return "RS256"
+        if isinstance(public_key, EllipticCurvePublicKey) and isinstance(
+            public_key.curve, SECP256R1
+        ):
+            return "ES256"
+        if isinstance(public_key, Ed25519PublicKey):
+            return "EdDSA"
+        raise ValueError("Unsupported key type, use RSA, EC P-256 or Ed25519 keys")
+
+    @classmethod
+    def from_private_pem(cls, kid: str, pem: bytes) -> "JWTKey":
+        private_key = load_pem_private_key(pem, password=None)
+        if not isinstance(
+            private_key, (RSAPrivateKey, EllipticCurvePrivateKey, Ed25519PrivateKey)
+        ):
+            raise ValueError(f"Unsupported private key type for key {kid}")
+        return cls(kid, private_key.public_key(), private_key)
+
+    @classmethod
+    def from_public_pem(cls, kid: str, pem: bytes) -> "JWTKey":
+        public_key = load_pem_public_key(pem)
+        if not isinstance(
+            public_key, (RSAPublicKey, EllipticCurvePublicKey, Ed25519PublicKey)
+        ):
+            raise ValueError(f"Unsupported public key type for key {kid}")
+        return cls(kid, public_key)
+
+    def public_pem(self) -> str:
+        return self.public_key.public_bytes(
+            Encoding.PEM, PublicFormat.SubjectPublicKeyInfo
+        ).decode()
+
+    def to_jwk(self) -> dict[str, Any]:
+        jwk: dict[str, Any] = jwt.get_algorithm_by_name(self.algorithm).to_jwk(
+            self.public_key, as_dict=True
+        )
+        jwk.update({"kid": self.kid, "alg": self.algorithm, "use": "sig"})
+        return jwk
+
+
+def load_keyring(keyring_location: Path) -> dict[str, JWTKey]:
+    keys: dict[str, JWTKey] = {}
+    if not keyring_location.exists():
+        return keys
+    for path in sorted(keyring_location.glob("*.pub.pem")):
+        kid: str = path.name.removesuffix(".pub.pem")
+        keys[kid] = JWTKey.from_public_pem(kid, path.read_bytes())
+    for path in sorted(keyring_location.glob("*.pem")):
+        if path.name.endswith(".pub.pem"):
+            continue
+        # A private key replaces a public only file with the same kid
+        keys[path.stem] = JWTKey.from_private_pem(path.stem, path.read_bytes())
+    return keys
+
+
 if not (BASE_DIR / "private").exists():
     os.makedirs(BASE_DIR / "private")
 
-if not PRIVATE_SIGNING_KEY_LOCATION.exists():
+JWT_KEYS: dict[str, JWTKey] = load_keyring(KEYRING_LOCATION)
+
+if PRIVATE_SIGNING_KEY_LOCATION.exists() != PUBLIC_KEY_LOCATION.exists():
     raise ValueError(
-        "The private key file does not exist, must be present at: "
+        "Both or neither of the key files must exist, expected at: "
         + str(PRIVATE_SIGNING_KEY_LOCATION)
+        + " and "
+        + str(PUBLIC_KEY_LOCATION)
+    )
+
+if PRIVATE_SIGNING_KEY_LOCATION.exists():
+    if LEGACY_KEY_ID in JWT_KEYS:
+        raise ValueError(
+            f"The keyring may not contain a key with the reserved id {LEGACY_KEY_ID}"
+        )
+    JWT_KEYS[LEGACY_KEY_ID] = JWTKey.from_private_pem(
+        LEGACY_KEY_ID, PRIVATE_SIGNING_KEY_LOCATION.read_bytes()
     )
 
-if not PUBLIC_KEY_LOCATION.exists():
+# Without explicit configuration sign with the legacy key, or the last private key by name
+_private_key_ids: list[str] = sorted(
+    kid for kid, key in JWT_KEYS.items() if key.private_key is not None
+)
+_SIGNING_KEY_ID: str | None = JWT_SIGNING_KEY_ID or (
+    LEGACY_KEY_ID
+    if LEGACY_KEY_ID in JWT_KEYS
+    else (_private_key_ids[-1] if _private_key_ids else None)
+)
+
+if _SIGNING_KEY_ID is None:
     raise ValueError(
-        "The public key file does not exist, must be present at: "
-        + str(PUBLIC_KEY_LOCATION)
+        "No private key found, one must be present at: "
+        + str(PRIVATE_SIGNING_KEY_LOCATION)
+        + " or in "
+        + str(KEYRING_LOCATION)
     )
 
-with open(PRIVATE_SIGNING_KEY_LOCATION, "r") as f:
-    PRIVATE_SIGNING_KEY: str = f.read()
+if _SIGNING_KEY_ID not in JWT_KEYS or JWT_KEYS[_SIGNING_KEY_ID].private_key is None:
+    raise ValueError(f"No private key found for the signing key {_SIGNING_KEY_ID}")
+
+SIGNING_KEY: JWTKey = JWT_KEYS[_SIGNING_KEY_ID]
+_SIGNING_PRIVATE_KEY: PrivateKey = cast(PrivateKey, SIGNING_KEY.private_key)
+
+if PUBLIC_KEY_LOCATION.exists():
+    with open(PUBLIC_KEY_LOCATION, "r") as f:
+        PUBLIC_KEY: str = f.read()
+else:
+    PUBLIC_KEY = SIGNING_KEY.public_pem()
+
+# The key set never changes while running, serialize it once
+JWKS_JSON: bytes = json.dumps(
+    {"keys": [key.to_jwk() for _, key in sorted(JWT_KEYS.items())]}
+).encode()
+JWKS_ETAG: str = '"' + hashlib.sha256(JWKS_JSON).hexdigest()[:32] + '"'
+
+# Verified claims, keyed by a hash of the token. Entries expire when the token does.
+VERIFIED_TOKEN_CACHE_SIZE: int = 4096
+# Upper bound for tokens without an exp claim
+VERIFIED_TOKEN_MAX_TTL_SECONDS: float = 60 * 60
+
+
+def _verified_token_expiry(key: str, claims: dict[str, Any], now: float) -> float:
+    max_expiry: float = now + VERIFIED_TOKEN_MAX_TTL_SECONDS
+    exp: Any = claims.get("exp")
+    if isinstance(exp, (int, float)):
+        return min(float(exp), max_expiry)
+    return max_expiry
+
 
-with open(PUBLIC_KEY_LOCATION, "r") as f:
-    PUBLIC_KEY: str = f.read()
+_verified_tokens: TLRUCache = TLRUCache(
+    maxsize=VERIFIED_TOKEN_CACHE_SIZE, ttu=_verified_token_expiry, timer=time.time
+)
+_verified_tokens_lock = threading.Lock()
 
 
 def jwt_encode(payload: dict[str, Any], expiry_minutes: int = 10) -> str:
     payload = payload.copy()
-    payload["exp"] = timezone.now() + datetime.timedelta(minutes=expiry_minutes)
-    return jwt.encode(payload, PRIVATE_SIGNING_KEY, algorithm="RS256")
+    now: datetime.datetime = timezone.now()
+    # Sub-second precision so tokens issued right after a revocation stay valid
+    payload.setdefault("iat", now.timestamp())
+    payload["exp"] = now + datetime.timedelta(minutes=expiry_minutes)
+    return jwt.encode(
+        payload,
+        _SIGNING_PRIVATE_KEY,
+        algorithm=SIGNING_KEY.algorithm,
+        headers={"kid": SIGNING_KEY.kid},
+    )
 
 
 def jwt_decode(token: str) -> dict[str, Any]:
-    return cast(dict[str, Any], jwt.decode(token, PUBLIC_KEY, algorithms=["RS256"]))
+    # Tokens issued before key rotation have no kid, they were signed by the legacy key
+    kid: Any = jwt.get_unverified_header(token).get("kid", LEGACY_KEY_ID)
+    key: JWTKey | None = JWT_KEYS.get(kid) if isinstance(kid, str) else None
+    if key is None:
+        raise jwt.InvalidTokenError("Unknown signing key")
+    # Only accept the algorithm belonging to the key to prevent algorithm confusion
+    return cast(
+        dict[str, Any],
+        jwt.decode(token, key.public_key, algorithms=[key.algorithm]),
+    )
+
+
+def jwt_decode_cached(token: str) -> dict[str, Any]:
+    """
+    Same as jwt_decode, but remembers verified tokens until they expire.
+
+    Used for bearer tokens which are sent with every request from the same device, so the
+    signature only has to be verified once per process. Failed verifications are never cached.
+    """
+    key: str = hashlib.sha256(token.encode(), usedforsecurity=False).hexdigest()
+    with _verified_tokens_lock:
+        claims: dict[str, Any] | None = _verified_tokens.get(key)
+    if claims is None:
+        claims = jwt_decode(token)
+        with _verified_tokens_lock:
+            _verified_tokens[key] = claims
+    return claims.copy()
 
 
 class PublicKeySchema(Schema):
     public_key: str
 
 
+class JWKSchema(Schema):
+    kid: str
+    kty: str
+    alg: str
+    use: str
+    n: str | None = None
+    e: str | None = None
+    crv: str | None = None
+    x: str | None = None
+    y: str | None = None
+
+
+class JWKSetSchema(Schema):
+    keys: list[JWKSchema]
+
+
 if __name__ == "__main__":
     # Verify that the setup works correctly:
     message: str = "Hello World!"
@@ -1,7 +1,10 @@
 from django.urls import re_path
+from event_booking.consumers import EventCapacityConsumer, WaitingRoomConsumer
 from person_counter.consumers import PingConsumer, RoomCounterConsumer
 
 websocket_urlpatterns = [
     re_path(r"ws/ping/$", PingConsumer.as_asgi()),
     re_path(r"ws/counter/$", RoomCounterConsumer.as_asgi()),
+    re_path(r"ws/events/queue/$", WaitingRoomConsumer.as_asgi()),
+    re_path(r"ws/events/$", EventCapacityConsumer.as_asgi()),
 ]
@@ -59,6 +59,7 @@ ALLOWED_HOSTS: list[str] = ["backend.arkadtlth.se", "staging.backend.arkadtlth.s
 CSRF_TRUSTED_ORIGINS = ["https://" + h for h in ALLOWED_HOSTS]
 CORS_ALLOW_ALL_ORIGINS = True  # Change this later
 CORS_ALLOW_CREDENTIALS = True
+CORS_EXPOSE_HEADERS = ["X-Next-Cursor"]  # Keyset pagination of list routes
 if DEBUG:
     ALLOWED_HOSTS.append("127.0.0.1")
     ALLOWED_HOSTS.append("0.0.0.0")
@@ -232,9 +233,25 @@ if CELERY_BROKER_URL:
     CELERY_TASK_TRACK_STARTED = True
     CELERY_TASK_TIME_LIMIT = 30 * 60  # 30 minutes
     CELERY_BROKER_CONNECTION_MAX_RETRIES = 0
+    CELERY_BEAT_SCHEDULE = {
+        # Only does work with REMINDER_ENGINE=sweeper, requires `celery -A arkad beat`
+        "sweep-reminders": {
+            "task": "notifications.tasks.sweep_reminders",
+            "schedule": 5 * 60,
+        },
+    }
 else:
     logging.warning("CELERY_BROKER_URL is not set, Celery will not work!")
 
+# How ticket and timeslot reminders are sent, see notifications/reminders.py
+# "eta": one Celery ETA task per reminder, "sweeper": a periodic task sends due reminders in bulk
+REMINDER_ENGINE: str = os.environ.get("REMINDER_ENGINE", "eta")
+if REMINDER_ENGINE not in ("eta", "sweeper"):
+    raise ValueError(f"Unknown REMINDER_ENGINE {REMINDER_ENGINE}, use eta or sweeper")
+
+# Key id (file name in private/keys) used to sign new JWTs, see arkad/jwt_utils.py
+JWT_SIGNING_KEY_ID: str | None = os.environ.get("JWT_SIGNING_KEY_ID") or None
+
 FIREBASE_CERT_PATH = BASE_DIR / "firebase_cert.json"
 APP_BASE_URL: str = "https://app.arkadtlth.se"
 
@@ -1,7 +1,13 @@
 import time
+from unittest import mock
+
+from django.core.cache import cache
+from django.db import OperationalError, transaction
+from django.test import TestCase, TransactionTestCase
+from psycopg import errors
 
-from django.test import TestCase
 from arkad.jwt_utils import jwt_decode
+from arkad.utils import atomic_with_retry
 from user_models.models import User
 
 
@@ -17,6 +23,139 @@ class TestJWT(TestCase):
         self.assertAlmostEqual(exp, time.time() + 30 * 24 * 60 * 60, delta=10)
 
 
+class TestVerifiedTokenCache(TestCase):
+    def test_cached_decode_matches_decode(self):
+        from arkad.jwt_utils import jwt_decode_cached, jwt_encode
+
+        token = jwt_encode({"user_id": 1})
+        self.assertEqual(jwt_decode_cached(token), jwt_decode(token))
+        # Callers get their own copy of the claims
+        jwt_decode_cached(token)["user_id"] = 2
+        self.assertEqual(jwt_decode_cached(token)["user_id"], 1)
+
+    def test_invalid_tokens_are_rejected(self):
+        import jwt
+        from arkad.jwt_utils import jwt_decode_cached, jwt_encode
+
+        expired = jwt_encode({"user_id": 1}, expiry_minutes=-1)
+        with self.assertRaises(jwt.ExpiredSignatureError):
+            jwt_decode_cached(expired)
+
+        token = jwt_encode({"user_id": 1})
+        jwt_decode_cached(token)
+        header, payload, signature = token.split(".")
+        with self.assertRaises(jwt.InvalidTokenError):
+            jwt_decode_cached(f"{header}.{payload}.{signature[::-1]}")
+
+
+class TestKeyRotation(TestCase):
+    def _write_keys(self, directory):
+        from pathlib import Path
+        from cryptography.hazmat.primitives.asymmetric import ec, ed25519
+        from cryptography.hazmat.primitives.serialization import (
+            Encoding,
+            NoEncryption,
+            PrivateFormat,
+            PublicFormat,
+        )
+
+        ed_key = ed25519.Ed25519PrivateKey.generate()
+        Path(directory, "2025-ed.pem").write_bytes(
+            ed_key.private_bytes(Encoding.PEM, PrivateFormat.PKCS8, NoEncryption())
+        )
+        ec_key = ec.generate_private_key(ec.SECP256R1())
+        Path(directory, "2024-ec.pub.pem").write_bytes(
+            ec_key.public_key().public_bytes(
+                Encoding.PEM, PublicFormat.SubjectPublicKeyInfo
+            )
+        )
+        return ed_key, ec_key
+
+    def test_tokens_carry_kid(self):
+        import jwt
+        from arkad.jwt_utils import SIGNING_KEY, jwt_encode
+
+        token = jwt_encode({"user_id": 1})
+        self.assertEqual(jwt.get_unverified_header(token)["kid"], SIGNING_KEY.kid)
+
+    def test_tokens_without_kid_use_legacy_key(self):
+        import jwt
+        from arkad.jwt_utils import JWT_KEYS, LEGACY_KEY_ID
+
+        legacy = JWT_KEYS[LEGACY_KEY_ID]
+        token = jwt.encode({"user_id": 1}, legacy.private_key, algorithm="RS256")
+        self.assertEqual(jwt_decode(token)["user_id"], 1)
+
+    def test_unknown_kid_is_rejected(self):
+        import jwt
+        from arkad.jwt_utils import JWT_KEYS, LEGACY_KEY_ID
+
+        legacy = JWT_KEYS[LEGACY_KEY_ID]
+        token = jwt.encode(
+            {"user_id": 1},
+            legacy.private_key,
+            algorithm="RS256",
+            headers={"kid": "does-not-exist"},
+        )
+        with self.assertRaises(jwt.InvalidTokenError):
+            jwt_decode(token)
+
+    def test_keyring_keys_verify(self):
+        import tempfile
+        from pathlib import Path
+        from unittest.mock import patch
+
+        import jwt
+        from arkad import jwt_utils
+
+        with tempfile.TemporaryDirectory() as directory:
+            ed_key, ec_key = self._write_keys(directory)
+            keyring = jwt_utils.load_keyring(Path(directory))
+
+        self.assertEqual(keyring["2025-ed"].algorithm, "EdDSA")
+        self.assertIsNotNone(keyring["2025-ed"].private_key)
+        self.assertEqual(keyring["2024-ec"].algorithm, "ES256")
+        self.assertIsNone(keyring["2024-ec"].private_key)
+
+        with patch.dict(jwt_utils.JWT_KEYS, keyring):
+            for kid, private_key, algorithm in (
+                ("2025-ed", ed_key, "EdDSA"),
+                ("2024-ec", ec_key, "ES256"),
+            ):
+                token = jwt.encode(
+                    {"user_id": 1},
+                    private_key,
+                    algorithm=algorithm,
+                    headers={"kid": kid},
+                )
+                self.assertEqual(jwt_decode(token)["user_id"], 1)
+
+            # The algorithm is bound to the key
+            token = jwt.encode(
+                {"user_id": 1},
+                jwt_utils.JWT_KEYS[jwt_utils.LEGACY_KEY_ID].private_key,
+                algorithm="RS256",
+                headers={"kid": "2025-ed"},
+            )
+            with self.assertRaises(jwt.InvalidTokenError):
+                jwt_decode(token)
+
+    def test_jwks_endpoint(self):
+        from arkad.jwt_utils import JWT_KEYS
+
+        response = self.client.get("/api/.well-known/jwks.json")
+        self.assertEqual(response.status_code, 200)
+        self.assertIn("max-age", response["Cache-Control"])
+        kids = {key["kid"] for key in response.json()["keys"]}
+        self.assertEqual(kids, set(JWT_KEYS))
+
+        response = self.client.get(
+            "/api/.well-known/jwks.json",
+            headers={"If-None-Match": response["ETag"]},
+        )
+        self.assertEqual(response.status_code, 304)
+
+
 class TestCache(TestCase):
     def test_cache(self):
         from django.core.cache import cache
@@ -27,3 +166,187 @@ class TestCache(TestCase):
         time.sleep(1)
         value = cache.get("test_key")
         self.assertIsNone(value)
+
+
+class TestAtomicWithRetry(TransactionTestCase):
+    @staticmethod
+    def _failing(*failures: Exception) -> mock.Mock:
+        return mock.Mock(side_effect=[*failures, "done"])
+
+    @staticmethod
+    def _conflict(cause: Exception) -> OperationalError:
+        error = OperationalError(str(cause))
+        error.__cause__ = cause
+        return error
+
+    @mock.patch("arkad.utils.time.sleep")
+    def test_retries_deadlocks_and_serialization_failures(self, sleep: mock.Mock):
+        fn = self._failing(
+            self._conflict(errors.DeadlockDetected("deadlock detected")),
+            self._conflict(errors.SerializationFailure("could not serialize")),
+        )
+        self.assertEqual(atomic_with_retry(fn), "done")
+        self.assertEqual(fn.call_count, 3)
+        self.assertEqual(sleep.call_count, 2)
+
+    @mock.patch("arkad.utils.time.sleep")
+    def test_gives_up_after_the_last_attempt(self, sleep: mock.Mock):
+        deadlock = self._conflict(errors.DeadlockDetected("deadlock detected"))
+        fn = self._failing(deadlock, deadlock)
+        with self.assertRaises(OperationalError):
+            atomic_with_retry(fn, attempts=2)
+        self.assertEqual(fn.call_count, 2)
+
+    def test_other_errors_and_nested_transactions_are_not_retried(self):
+        fn = self._failing(OperationalError("connection lost"))
+        with self.assertRaises(OperationalError):
+            atomic_with_retry(fn)
+
+        fn = self._failing(self._conflict(errors.DeadlockDetected("deadlock")))
+        with self.assertRaises(OperationalError), transaction.atomic():
+            atomic_with_retry(fn)
+        self.assertEqual(fn.call_count, 1)
+
+
+class TestAuthUserCache(TestCase):
+    def setUp(self):
+        from companies.models import Company
+
+        self.company = Company.objects.create(name="Cache Company")
+        self.user = User.objects.create_user(
+            "cache@test.com",
+            email="cache@test.com",
+            password="<PASSWORD>",
+            first_name="Cache",
+            last_name="User",
+            company=self.company,
+        )
+        self.headers = {"Authorization": self.user.create_jwt_token()}
+
+    def test_repeated_requests_do_not_query_user(self):
+        response = self.client.get("/api/user/profile", headers=self.headers)
+        self.assertEqual(response.status_code, 200)
+        with self.assertNumQueries(0):
+            response = self.client.get("/api/user/profile", headers=self.headers)
+        self.assertEqual(response.status_code, 200)
+
+    def test_company_is_preloaded(self):
+        from user_models.auth_cache import get_cached_user
+
+        get_cached_user(self.user.id)
+        with self.assertNumQueries(0):
+            user = get_cached_user(self.user.id)
+            self.assertTrue(user.is_company)
+            self.assertEqual(user.company.name, "Cache Company")
+
+    def test_deactivation_invalidates_cache(self):
+        response = self.client.get("/api/user/profile", headers=self.headers)
+        self.assertEqual(response.status_code, 200)
+        self.user.is_active = False
+        self.user.save()
+        response = self.client.get("/api/user/profile", headers=self.headers)
+        self.assertEqual(response.status_code, 401)
+
+    def test_user_cached_before_commit_is_invalidated_on_commit(self):
+        from user_models.auth_cache import (
+            _get_auth_state,
+            _local_entries,
+            _user_key,
+            get_cached_user,
+        )
+
+        with self.captureOnCommitCallbacks(execute=True):
+            self.user.is_active = False
+            self.user.save()
+            # A request that read the row before the commit caches the old user
+            stale = User.objects.get(id=self.user.id)
+            stale.is_active = True
+            epoch, _ = _get_auth_state(self.user.id)
+            cache.set(_user_key(self.user.id, epoch), stale)
+            _local_entries.clear()
+            self.assertTrue(get_cached_user(self.user.id).is_active)
+        self.assertFalse(get_cached_user(self.user.id).is_active)
+
+    def test_deleted_user_is_rejected(self):
+        response = self.client.get("/api/user/profile", headers=self.headers)
+        self.assertEqual(response.status_code, 200)
+        self.user.delete()
+        response = self.client.get("/api/user/profile", headers=self.headers)
+        self.assertEqual(response.status_code, 401)
+
+    def test_profile_update_is_visible_on_next_request(self):
+        self.client.get("/api/user/profile", headers=self.headers)
+        self.user.first_name = "Changed"
+        self.user.save()
+        response = self.client.get("/api/user/profile", headers=self.headers)
+        self.assertEqual(response.json()["firstName"], "Changed")
+
+
+class TestTokenRevocation(TestCase):
+    def setUp(self):
+        self.user = User.objects.create_user(
+            "revoke@test.com",
+            email="revoke@test.com",
+            password="<PASSWORD>",
+            first_name="Revoke",
+            last_name="User",
+        )
+        self.headers = {"Authorization": self.user.create_jwt_token()}
+
+    def test_token_has_issued_at(self):
+        token: str = self.user.create_jwt_token().removeprefix("Bearer ")
+        self.assertAlmostEqual(jwt_decode(token)["iat"], time.time(), delta=5)
+
+    def test_password_change_revokes_tokens(self):
+        self.user.set_password("<NEW PASSWORD>")
+        self.user.save()
+        response = self.client.get("/api/user/profile", headers=self.headers)
+        self.assertEqual(response.status_code, 401)
+
+        # Tokens issued after the change are accepted
+        headers = {"Authorization": self.user.create_jwt_token()}
+        response = self.client.get("/api/user/profile", headers=headers)
+        self.assertEqual(response.status_code, 200)
+
+    def test_unrelated_save_keeps_tokens(self):
+        self.user.first_name = "Changed"
+        self.user.save()
+        response = self.client.get("/api/user/profile", headers=self.headers)
+        self.assertEqual(response.status_code, 200)
+
+    def test_reactivated_user_needs_new_token(self):
+        self.user.is_active = False
+        self.user.save()
+        self.user.is_active = True
+        self.user.save()
+        response = self.client.get("/api/user/profile", headers=self.headers)
+        self.assertEqual(response.status_code, 401)
+
+    def test_tokens_without_issued_at_are_revoked(self):
+        import jwt
+        from arkad.jwt_utils import _SIGNING_PRIVATE_KEY, SIGNING_KEY
+        from user_models.auth_cache import revoke_user_tokens
+
+        legacy_token: str = jwt.encode(
+            {"user_id": self.user.id, "exp": time.time() + 600},
+            _SIGNING_PRIVATE_KEY,
+            algorithm=SIGNING_KEY.algorithm,
+            headers={"kid": SIGNING_KEY.kid},
+        )
+        headers = {"Authorization": f"Bearer {legacy_token}"}
+        response = self.client.get("/api/user/profile", headers=headers)
+        self.assertEqual(response.status_code, 200)
+
+        revoke_user_tokens(self.user.id)
+        response = self.client.get("/api/user/profile", headers=headers)
+        self.assertEqual(response.status_code, 401)
+
+    def test_delete_account_revokes_tokens(self):
+        from django.core.cache import cache
+        from user_models.auth_cache import _revoked_before_key
+
+        self.client.force_login(self.user)
+        response = self.client.post("/user/delete-account/")
+        self.assertEqual(response.status_code, 302)
+        self.assertFalse(User.objects.filter(id=self.user.id).exists())
+        self.assertIsNotNone(cache.get(_revoked_before_key(self.user.id)))
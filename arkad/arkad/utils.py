@@ -1,7 +1,19 @@
-from typing import Any
+from typing import Any, Callable, TypeVar
+import logging
+import random
+import time
 import uuid
 from pathlib import Path
 
+from django.db import OperationalError, connection, transaction
+from psycopg import errors
+
+from arkad.settings import ENVIRONMENT
+
+T = TypeVar("T")
+
+TRANSACTION_ATTEMPTS: int = 3
+
 
 def unique_file_upload_path(subfolder: str, _: Any, filename: str) -> str:
     """
@@ -11,3 +23,39 @@ def unique_file_upload_path(subfolder: str, _: Any, filename: str) -> str:
     unique_folder = str(uuid.uuid4().hex)
     file_path = Path(subfolder) / unique_folder / filename
     return str(file_path)
+
+
+def cache_namespace() -> str:
+    """
+    Prefix for cache keys derived from database ids.
+
+    Redis may be shared between deployments (and between parallel test databases),
+    ids are only unique within one database.
+    """
+    return f"{ENVIRONMENT}:{connection.settings_dict['NAME']}"
+
+
+def is_transaction_conflict(error: OperationalError) -> bool:
+    """True if Postgres aborted the transaction for a deadlock or a serialization failure."""
+    return isinstance(
+        error.__cause__, (errors.DeadlockDetected, errors.SerializationFailure)
+    )
+
+
+def atomic_with_retry(fn: Callable[[], T], attempts: int = TRANSACTION_ATTEMPTS) -> T:
+    """
+    Runs `fn` in a transaction and runs it again, after a short random pause, if the
+    transaction lost a deadlock or serialization conflict. Gives up after `attempts` runs.
+    Nested in another transaction the conflict aborts the outer one, so it is not retried.
+    """
+    retry: bool = not connection.in_atomic_block
+    for attempt in range(1, attempts + 1):
+        try:
+            with transaction.atomic():
+                return fn()
+        except OperationalError as e:
+            if not retry or attempt == attempts or not is_transaction_conflict(e):
+                raise
+            logging.info(f"Transaction conflict, retrying ({attempt}/{attempts}): {e}")
+            time.sleep(random.uniform(0, 0.05 * attempt))
+    raise AssertionError("Unreachable")
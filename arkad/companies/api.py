@@ -1,8 +1,15 @@
 from django.core.cache import cache
 from django.db.models import Exists, OuterRef
+from django.http import HttpResponse
+from ninja import Query
 
 from arkad.auth import OPTIONAL_AUTH
-from arkad.customized_django_ninja import Router, ListType
+from arkad.customized_django_ninja import (
+    KeysetPagination,
+    ListType,
+    Router,
+    paginate_sorted,
+)
 from student_sessions.models import StudentSession
 from user_models.models import AuthenticatedRequest
 from companies.models import Company
@@ -12,9 +19,14 @@ router = Router(tags=["Companies"])
 
 
 @router.get("/", response={200: ListType[CompanyOut]}, auth=OPTIONAL_AUTH)
-def get_companies(request: AuthenticatedRequest):
+def get_companies(
+    request: AuthenticatedRequest,
+    response: HttpResponse,
+    pagination: Query[KeysetPagination],
+):
     """
     Returns all mostly public information about companies (days with student sessions are also included).
+    Ordered by id, paginated if limit is given (see KeysetPagination).
     """
     companies_list_cache_key: str = "companies_list_cache"
     companies = cache.get(companies_list_cache_key)
@@ -26,10 +38,10 @@ def get_companies(request: AuthenticatedRequest):
                     StudentSession.objects.filter(company_id=OuterRef("pk"))
                 )
             )
-            .all()
+            .order_by("id")
         )
         cache.set(companies_list_cache_key, companies, 300)
-    return companies
+    return paginate_sorted(companies, lambda company: company.id, pagination, response)
 
 
 # We should probably not be able to change company information by api here, instead require Jexpo update.
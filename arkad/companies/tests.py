@@ -1,10 +1,12 @@
 # Create your tests here.
+from django.core.cache import cache
 from django.test import TestCase
 from .models import Company
 
 
 class TestGetCompanies(TestCase):
     def setUp(self):
+        cache.clear()  # The company list is cached
         # Create companies
         Company.objects.create(name="Company A", description="Description A")
         Company.objects.create(name="Company B", description="Description B")
@@ -17,3 +19,20 @@ class TestGetCompanies(TestCase):
         self.assertEqual(len(data), 3, data)
         company_names = {company["name"] for company in data}
         self.assertSetEqual(company_names, {"Company A", "Company B", "Company C"})
+
+    def test_get_companies_paginated(self):
+        names: list[str] = []
+        url = "/api/company/?limit=2"
+        while True:
+            response = self.client.get(url)
+            self.assertEqual(response.status_code, 200)
+            self.assertLessEqual(len(response.json()), 2)
+            names += [company["name"] for company in response.json()]
+            if "X-Next-Cursor" not in response.headers:
+                break
+            url = f"/api/company/?limit=2&cursor={response.headers['X-Next-Cursor']}"
+        self.assertEqual(names, ["Company A", "Company B", "Company C"])
+
+        self.assertEqual(
+            self.client.get("/api/company/?limit=2&cursor=%%%").status_code, 400
+        )
@@ -7,8 +7,8 @@ from import_export import resources, fields
 from import_export.admin import ExportMixin
 from import_export.widgets import BooleanWidget
 
-from .models import Event, Ticket
-from .views import create_lunch_event_view
+from .models import Event, Ticket, Waitlist
+from .views import create_lunch_event_view, lunch_event_tickets_view
 
 
 # --- Ticket Export Resource ---
@@ -135,7 +135,12 @@ class EventAdmin(ExportMixin, admin.ModelAdmin):  # type: ignore[type-arg, misc]
                 "create_lunch_event/",
                 self.admin_site.admin_view(create_lunch_event_view),
                 name="create_lunch_event",
-            )
+            ),
+            path(
+                "create_lunch_event/<int:event_id>/tickets/",
+                self.admin_site.admin_view(lunch_event_tickets_view),
+                name="lunch_event_tickets",
+            ),
         ]
         return custom_urls + urls
 
@@ -168,3 +173,11 @@ class TicketAdmin(admin.ModelAdmin):  # type: ignore[type-arg]
         "uuid",
     )
     readonly_fields = ("uuid", "event", "user")
+
+
+@admin.register(Waitlist)
+class WaitlistAdmin(admin.ModelAdmin):  # type: ignore[type-arg]
+    list_display = ("event", "user", "joined_at")
+    list_filter = ("event",)
+    search_fields = ("user__email", "user__first_name", "user__last_name")
+    readonly_fields = ("joined_at",)
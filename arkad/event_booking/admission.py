@@ -0,0 +1,119 @@
+"""
+Virtual waiting room for event release rushes.
+
+When a popular event is released every student hits acquire-ticket in the same second, which
+saturates the workers and Postgres. Events with an `admission_rate` therefore hand out queue
+positions from a Redis counter (in arrival order) and admit them at that rate:
+position `p` may book from `release_time + p / admission_rate` onwards.
+
+Admission is a pure function of the position and the clock, so nothing has to run in the
+background to let students in, and the status endpoint and the waiting room websocket only
+ever touch Redis. Students who arrive after the rush get a position that is already admitted.
+"""
+
+import datetime
+import time
+from typing import NamedTuple
+
+from django.core.cache import cache
+
+from arkad.utils import cache_namespace
+from event_booking.models import Event
+
+QUEUE_TTL_SECONDS: int = 24 * 60 * 60
+CONFIG_TTL_SECONDS: int = 60 * 60
+
+_MISSING = object()
+
+
+class AdmissionConfig(NamedTuple):
+    release_time: float
+    rate: float
+
+
+class QueueStatus(NamedTuple):
+    position: int
+    ahead: int  # Students in front who are not admitted yet
+    admitted: bool
+    admitted_at: datetime.datetime
+
+
+def _config_key(event_id: int) -> str:
+    return f"events:{cache_namespace()}:admission:{event_id}"
+
+
+def _counter_key(event_id: int) -> str:
+    return f"events:{cache_namespace()}:queue:{event_id}"
+
+
+def _position_key(event_id: int, user_id: int) -> str:
+    return f"events:{cache_namespace()}:queue:{event_id}:user:{user_id}"
+
+
+def _config_for(event: Event) -> AdmissionConfig | None:
+    if event.admission_rate is None or event.release_time is None:
+        return None
+    return AdmissionConfig(event.release_time.timestamp(), event.admission_rate)
+
+
+def store_admission_config(event: Event) -> None:
+    """Writes the waiting room configuration of the event through to Redis, call on save."""
+    cache.set(_config_key(event.id), _config_for(event), timeout=CONFIG_TTL_SECONDS)
+
+
+def forget_admission_config(event_id: int) -> None:
+    cache.delete(_config_key(event_id))
+
+
+def get_admission_config(event_id: int) -> AdmissionConfig | None:
+    """Returns the waiting room configuration or None if the event has no waiting room."""
+    config: AdmissionConfig | None | object = cache.get(_config_key(event_id), _MISSING)
+    if config is _MISSING:
+        event: Event | None = Event.objects.filter(id=event_id).first()
+        config = _config_for(event) if event is not None else None
+        cache.set(_config_key(event_id), config, timeout=CONFIG_TTL_SECONDS)
+    assert config is None or isinstance(config, AdmissionConfig)
+    return config
+
+
+def is_released(config: AdmissionConfig) -> bool:
+    return time.time() >= config.release_time
+
+
+def _queue_status(position: int, config: AdmissionConfig) -> QueueStatus:
+    now: float = time.time()
+    admitted_at: float = config.release_time + position / config.rate
+    admitted_count: int = max(0, int((now - config.release_time) * config.rate) + 1)
+    return QueueStatus(
+        position=position,
+        ahead=max(0, position - admitted_count),
+        admitted=now >= admitted_at,
+        admitted_at=datetime.datetime.fromtimestamp(admitted_at, tz=datetime.UTC),
+    )
+
+
+def get_queue_status(
+    event_id: int, user_id: int, config: AdmissionConfig
+) -> QueueStatus | None:
+    """Returns the status of the user in the queue, or None if the user has not joined."""
+    position: int | None = cache.get(_position_key(event_id, user_id))
+    return _queue_status(position, config) if position is not None else None
+
+
+def join_queue(event_id: int, user_id: int, config: AdmissionConfig) -> QueueStatus:
+    """
+    Returns the status of the user in the queue, handing out the next position on the first call.
+
+    Must only be called once the event is released.
+    """
+    position_key: str = _position_key(event_id, user_id)
+    position: int | None = cache.get(position_key)
+    if position is None:
+        counter_key: str = _counter_key(event_id)
+        cache.add(counter_key, 0, timeout=QUEUE_TTL_SECONDS)
+        position = cache.incr(counter_key) - 1
+        if not cache.add(position_key, position, timeout=QUEUE_TTL_SECONDS):
+            # The same student joined concurrently from another request, keep theirs
+            position = cache.get(position_key, position)
+    assert position is not None
+    return _queue_status(position, config)
@@ -1,64 +1,72 @@
-from django.db import transaction
-from django.db.models import QuerySet, Prefetch
+from functools import partial
+from uuid import UUID
+
+from django.db import IntegrityError, transaction
+from django.db.models import F, QuerySet
+from django.http import HttpResponse
 from django.utils import timezone
+from ninja import Query
 
 from arkad.auth import OPTIONAL_AUTH
-from arkad.customized_django_ninja import Router, ListType
+from arkad.customized_django_ninja import (
+    KeysetPagination,
+    ListType,
+    Router,
+    paginate_queryset,
+)
 from user_models.models import AuthenticatedRequest
-from event_booking.models import Event, Ticket
+from event_booking.admission import (
+    AdmissionConfig,
+    QueueStatus,
+    get_admission_config,
+    is_released,
+    join_queue,
+)
+from event_booking.capacity import capacity_changed
+from event_booking.catalog import (
+    get_ticket_statuses,
+    invalidate_event_catalog,
+    render_event_catalog,
+)
+from event_booking.models import Event, Ticket, Waitlist
 from event_booking.schemas import (
     EventSchema,
     TicketSchema,
     UseTicketSchema,
     EventUserInformation,
     EventUserStatus,
+    QueueStatusSchema,
+    WaitlistSchema,
+    TicketTokenSchema,
+    UseTicketsSchema,
+    UsedTicketsSchema,
+    ManifestSchema,
 )
+from event_booking.manifest import render_manifest
+from event_booking.ticket_tokens import issue_ticket_token
+from notifications.tasks import notify_event_waitlist_promoted
 
 
 router = Router(tags=["Events"])
 
 
 @router.get("", response={200: ListType[EventSchema]}, auth=OPTIONAL_AUTH)
-def get_events(request: AuthenticatedRequest):
+def get_events(request: AuthenticatedRequest, pagination: Query[KeysetPagination]):
     """
-    Returns a list of all events
+    Returns a list of all events, ordered by id. Paginated if limit is given (see KeysetPagination)
     """
     if not request.user.is_authenticated:
-        return [
-            EventSchema.from_orm(e)
-            for e in Event.objects.filter(visible_time__lte=timezone.now()).all()
-        ]
-
-    user_tickets_qs = Ticket.objects.filter(user_id=request.user.id)
-
-    # Use Prefetch to attach only the relevant tickets to the events
-    # The related manager will be named 'user_tickets' instead of the default 'tickets'
-    events: QuerySet[Event] = Event.objects.prefetch_related(
-        Prefetch("tickets", queryset=user_tickets_qs, to_attr="user_tickets")
+        return render_event_catalog({}, pagination=pagination)
+    return render_event_catalog(
+        get_ticket_statuses(request.user.id),
+        include_hidden=request.user.is_staff,
+        pagination=pagination,
     )
 
-    if not request.user.is_staff:
-        events = events.filter(visible_time__lte=timezone.now())
-
-    result: list[EventSchema] = []
-    for event in events.all():
-        schema = EventSchema.from_orm(event)
-
-        # Access the prefetched list, which will contain 0 or 1 ticket
-        user_tickets_list: list[Ticket] = event.user_tickets
-        user_ticket: Ticket | None = user_tickets_list[0] if user_tickets_list else None
-
-        if user_ticket is not None:
-            schema.status = user_ticket.status()
-
-        result.append(schema)
-
-    return result
-
 
 @router.get("booked-events", response={200: ListType[EventSchema]})
 def get_booked_events(request: AuthenticatedRequest):
-    ts: QuerySet[Ticket] = request.user.ticket_set.prefetch_related("event").all()
+    ts: QuerySet[Ticket] = request.user.ticket_set.select_related("event").all()
 
     result: list = []
     for ticket in ts:
@@ -99,12 +107,24 @@ def get_event(request: AuthenticatedRequest, event_id: int):
 @router.get(
     "/{event_id}/attending", response={200: ListType[EventUserInformation], 401: str}
 )
-def get_users_attending_event(request: AuthenticatedRequest, event_id: int):
+def get_users_attending_event(
+    request: AuthenticatedRequest,
+    response: HttpResponse,
+    event_id: int,
+    pagination: Query[KeysetPagination],
+):
     """
-    Returns a list of names of the attending users, only if the calling user is staff
+    Returns a list of names of the attending users, only if the calling user is staff.
+    Paginated by ticket if limit is given (see KeysetPagination)
     """
     if not request.user.is_staff:
         return 401, "Not a staff user"
+    tickets = paginate_queryset(
+        Ticket.objects.select_related("user").filter(event_id=event_id),
+        "uuid",
+        pagination,
+        response,
+    )
     return 200, [
         EventUserInformation(
             full_name=str(ticket.user),
@@ -112,14 +132,30 @@ def get_users_attending_event(request: AuthenticatedRequest, event_id: int):
             ticket_used=ticket.used,
             user_id=ticket.user.id,
         )
-        for ticket in Ticket.objects.prefetch_related("user").filter(event_id=event_id)
+        for ticket in tickets
     ]
 
 
-@router.get("get-ticket/{event_id}", response={200: UseTicketSchema, 401: str})
+@router.get("/{event_id}/manifest", response={200: ManifestSchema, 304: None, 401: str})
+def get_event_manifest(request: AuthenticatedRequest, event_id: int):
+    """
+    Returns every ticket to the event for offline check-in, only if the calling user is staff.
+
+    Send `Accept: application/msgpack` for MessagePack instead of JSON and `Accept-Encoding:
+    gzip` for a compressed response. Revalidate with If-None-Match, 304 if nothing changed.
+    """
+    if not request.user.is_staff:
+        return 401, "Not a staff user"
+    return render_manifest(request, event_id)
+
+
+@router.get(
+    "get-ticket/{event_id}", response={200: TicketTokenSchema, 401: str, 409: str}
+)
 def get_event_ticket(request: AuthenticatedRequest, event_id: int):
     """
-    Returns a ticket
+    Returns a ticket, with the signed token to show as QR code for offline scanning.
+    409 once the event is over, the ticket can no longer be used.
     """
     tickets: QuerySet[Ticket] = request.user.ticket_set.prefetch_related(
         "event"
@@ -128,7 +164,10 @@ def get_event_ticket(request: AuthenticatedRequest, event_id: int):
         return 401, "Unauthorized"
     ticket: Ticket | None = tickets.first()  # Should only be one
     assert ticket is not None, "Should not be possible"
-    return UseTicketSchema(uuid=ticket.uuid, event_id=ticket.event.id)
+    token: str | None = issue_ticket_token(ticket)
+    if token is None:
+        return 409, "Event already ended"
+    return TicketTokenSchema(uuid=ticket.uuid, event_id=ticket.event.id, token=token)
 
 
 @router.post("use-ticket", response={200: TicketSchema, 401: str, 404: str})
@@ -147,47 +186,121 @@ def verify_ticket(request: AuthenticatedRequest, ticket: UseTicketSchema):
     ).update(used=True)
     if modified_tickets == 1:
         # uuid is unique so we can safely assume we got the ticket
-        return 200, Ticket.objects.prefetch_related("user").get(uuid=ticket.uuid)
+        return 200, Ticket.objects.select_related("user").get(uuid=ticket.uuid)
     return 404, "Ticket not found or already used"
 
 
+@router.post("use-tickets", response={200: UsedTicketsSchema, 401: str})
+def use_tickets(request: AuthenticatedRequest, tickets: UseTicketsSchema):
+    """
+    Marks a batch of scanned tickets as used, uploaded by scanners that check ticket tokens
+    offline. Tickets that were already used (e.g. scanned on another device) are returned as
+    conflicts, uuids which are not tickets to the event as not found.
+
+    If not a staff user, return 401.
+    """
+    if not request.user.is_staff:
+        return 401, "This route is staff only."
+    requested: list[UUID] = list(dict.fromkeys(tickets.uuids))
+    used: set[UUID] = (
+        Ticket.mark_used(tickets.event_id, requested) if requested else set()
+    )
+    remaining: list[UUID] = [u for u in requested if u not in used]
+    existing: set[UUID] = (
+        set(
+            Ticket.objects.filter(
+                event_id=tickets.event_id, uuid__in=remaining
+            ).values_list("uuid", flat=True)
+        )
+        if remaining
+        else set()
+    )
+    return 200, UsedTicketsSchema(
+        used=[u for u in requested if u in used],
+        conflicts=[u for u in remaining if u in existing],
+        not_found=[u for u in remaining if u not in existing],
+    )
+
+
+def _booking_rejection(event_id: int) -> tuple[int, str]:
+    """Explains why a seat could not be claimed, only used when booking fails."""
+    event: Event | None = Event.objects.filter(id=event_id).first()
+    if event is None:
+        return 404, "Event not found"
+    if not event.booking_change_allowed():
+        return 409, "Booking period has expired"
+    if event.release_time is None:
+        return 409, "Event release date not yet scheduled"
+    if event.release_time >= timezone.now():
+        return 409, "Event not yet released"
+    if event.end_time <= timezone.now():
+        return 409, "Event already ended"
+    return 409, "Event already fully booked"
+
+
+@router.get("queue/{event_id}", response={200: QueueStatusSchema, 404: str, 409: str})
+def get_queue_status(request: AuthenticatedRequest, event_id: int):
+    """
+    Joins the waiting room of a high-demand event, or returns the current place in it.
+
+    Poll this (or connect to ws/events/queue/) until admitted, then acquire the ticket.
+    Returns 404 if the event has no waiting room and 409 if it is not released yet.
+    """
+    config: AdmissionConfig | None = get_admission_config(event_id)
+    if config is None:
+        return 404, "Event has no waiting room"
+    if not is_released(config):
+        return 409, "Event not yet released"
+    status: QueueStatus = join_queue(event_id, request.user.id, config)
+    return 200, QueueStatusSchema(event_id=event_id, **status._asdict())
+
+
 @router.post(
-    "acquire-ticket/{event_id}", response={200: EventSchema, 409: str, 404: str}
+    "acquire-ticket/{event_id}",
+    response={200: EventSchema, 409: str, 404: str, 429: QueueStatusSchema},
 )
 def book_event(request: AuthenticatedRequest, event_id: int):
     """
     Book an event if it is not already fully booked
-    """
-    with transaction.atomic():
-        try:
-            event: Event = (
-                Event.objects.filter(id=event_id).select_for_update().get(id=event_id)
-            )
-            if not event.booking_change_allowed():
-                return 409, "Booking period has expired"
-            if event.release_time is None:
-                return 409, "Event release date not yet scheduled"
-            if event.release_time >= timezone.now():
-                return 409, "Event not yet released"
-            if event.end_time <= timezone.now():
-                return 409, "Event already ended"
-        except Event.DoesNotExist:
-            return 404, "Event not found"
-
-        if event.number_booked < event.capacity:
-            if event.tickets.filter(user_id=request.user.id).exists():
-                return 409, "You have already booked this event"
-            ticket: Ticket = Ticket.objects.create(user=request.user, event=event)
-            event.number_booked += 1
-            event.tickets.add(ticket)
-            event.save()
-
-            schema = EventSchema.from_orm(event)
-            schema.status = ticket.status()
 
-            return 200, schema
-        else:
-            return 409, "Event already fully booked"
+    Events with a waiting room return 429 with the queue status until the student is admitted.
+    """
+    # High-demand events only let students through the waiting room at a fixed rate,
+    # everyone else is turned away here without touching the database.
+    config: AdmissionConfig | None = get_admission_config(event_id)
+    if config is not None:
+        if not is_released(config):
+            return 409, "Event not yet released"
+        status: QueueStatus = join_queue(event_id, request.user.id, config)
+        if not status.admitted:
+            return 429, QueueStatusSchema(event_id=event_id, **status._asdict())
+
+    now = timezone.now()
+    try:
+        with transaction.atomic():
+            # Claim a seat without locking the row first, the condition makes the update a no-op
+            # when the event is full or not bookable, the capacity constraint backs it up.
+            claimed: int = Event.objects.filter(
+                id=event_id,
+                number_booked__lt=F("capacity"),
+                release_time__lt=now,
+                end_time__gt=now,
+                start_time__gt=now + Event.booking_change_deadline_delta(),
+            ).update(number_booked=F("number_booked") + 1)
+            if not claimed:
+                return _booking_rejection(event_id)
+            # The unique constraint rejects a second ticket, rolling back the claimed seat
+            ticket: Ticket = Ticket.objects.create(user=request.user, event_id=event_id)
+            # A freed seat may be booked directly by a student who is also waiting for one
+            Waitlist.objects.filter(event_id=event_id, user_id=request.user.id).delete()
+    except IntegrityError:
+        return 409, "You have already booked this event"
+    invalidate_event_catalog()
+    capacity_changed(event_id)
+
+    schema = EventSchema.from_orm(ticket.event)
+    schema.status = ticket.status()
+    return 200, schema
 
 
 @router.post(
@@ -212,10 +325,72 @@ def unbook_event(request: AuthenticatedRequest, event_id: int):
         if deleted_count == 0:
             return 404, "You do not have a ticket for this event"
 
-        # Update the counter
-        event.number_booked -= 1
-        event.save()
+        # The seat goes to the first student on the waitlist, if any, so the counter stays
+        promoted: Ticket | None = event.promote_from_waitlist()
+        if promoted is not None:
+            transaction.on_commit(
+                partial(notify_event_waitlist_promoted.delay, str(promoted.uuid))
+            )
+        else:
+            # Update the counter
+            event.number_booked -= 1
+            event.save(update_fields=["number_booked"])
 
         schema = EventSchema.from_orm(event)
         schema.status = EventUserStatus.NOT_BOOKED
         return 200, schema
+
+
+@router.post("waitlist/{event_id}", response={200: WaitlistSchema, 404: str, 409: str})
+def join_waitlist(request: AuthenticatedRequest, event_id: int):
+    """
+    Join the waitlist of a fully booked event, joining again returns the current place.
+
+    When someone unbooks, the first student on the waitlist automatically gets their ticket
+    and is notified, so there is no need to keep retrying acquire-ticket.
+    """
+    with transaction.atomic():
+        # Locked like unbook_event, so a seat freed meanwhile is either still counted as
+        # free here or handed to this student by the promotion
+        event: Event | None = (
+            Event.objects.select_for_update().filter(id=event_id).first()
+        )
+        if event is None:
+            return 404, "Event not found"
+        if not event.booking_change_allowed():
+            return 409, "Booking period has expired"
+        if event.release_time is None or event.release_time >= timezone.now():
+            return 409, "Event not yet released"
+        if event.tickets.filter(user_id=request.user.id).exists():
+            return 409, "You have already booked this event"
+        if event.number_booked < event.capacity:
+            return 409, "Event is not fully booked"
+
+        entry, _ = Waitlist.objects.get_or_create(event=event, user=request.user)
+        return 200, WaitlistSchema(event_id=event_id, position=entry.position())
+
+
+@router.get("waitlist/{event_id}", response={200: WaitlistSchema, 404: str})
+def get_waitlist_position(request: AuthenticatedRequest, event_id: int):
+    """
+    Returns the place on the waitlist of the event, 1 is next in line.
+    """
+    entry: Waitlist | None = Waitlist.objects.filter(
+        event_id=event_id, user_id=request.user.id
+    ).first()
+    if entry is None:
+        return 404, "You are not on the waitlist for this event"
+    return 200, WaitlistSchema(event_id=event_id, position=entry.position())
+
+
+@router.delete("waitlist/{event_id}", response={200: str, 404: str})
+def leave_waitlist(request: AuthenticatedRequest, event_id: int):
+    """
+    Leave the waitlist of the event.
+    """
+    deleted_count, _ = Waitlist.objects.filter(
+        event_id=event_id, user_id=request.user.id
+    ).delete()
+    if deleted_count == 0:
+        return 404, "You are not on the waitlist for this event"
+    return 200, "Left the waitlist"
@@ -0,0 +1,65 @@
+"""
+Live seat counts of events, pushed to clients connected to ws/events/ (EventCapacityConsumer).
+
+Right after an event is released it is booked many times per second, so changes are coalesced
+per event: the first change schedules the publish_event_capacity task COALESCE_SECONDS later
+and the changes until it runs ride along, as it reads the current counter. Every update holds
+the absolute number_booked, so a client that misses one is corrected by the next.
+"""
+
+from functools import partial
+
+from asgiref.sync import async_to_sync
+from channels.layers import get_channel_layer  # type: ignore[import-untyped]
+from django.core.cache import cache
+from django.db import transaction
+from django.utils import timezone
+
+from arkad.utils import cache_namespace
+from event_booking.models import Event
+
+CAPACITY_GROUP: str = "event_capacity"
+COALESCE_SECONDS: float = 0.25
+# Lets changes schedule a publish again if the scheduled task was lost
+PENDING_TIMEOUT_SECONDS: int = 5
+
+
+def _pending_key(event_id: int) -> str:
+    return f"events:{cache_namespace()}:capacity-pending:{event_id}"
+
+
+def _schedule_publish(event_id: int) -> None:
+    from event_booking.tasks import publish_event_capacity  # Avoid circular import
+
+    # Only the first change in a window schedules a publish
+    if cache.add(_pending_key(event_id), True, timeout=PENDING_TIMEOUT_SECONDS):
+        publish_event_capacity.apply_async((event_id,), countdown=COALESCE_SECONDS)
+
+
+def capacity_changed(event_id: int) -> None:
+    """Call when number_booked or capacity of an event changed, publishes once committed."""
+    # A broker hiccup must not fail the booking that was already committed
+    transaction.on_commit(partial(_schedule_publish, event_id), robust=True)
+
+
+def publish_capacity(event_id: int) -> None:
+    """Sends the current seat count of the event to every client, if the event is visible."""
+    # Cleared before reading, so a change committed after the read schedules a new publish
+    cache.delete(_pending_key(event_id))
+    counts: tuple[int, int] | None = (
+        Event.objects.filter(id=event_id, visible_time__lte=timezone.now())
+        .values_list("number_booked", "capacity")
+        .first()
+    )
+    if counts is None:
+        return
+    number_booked, capacity = counts
+    async_to_sync(get_channel_layer().group_send)(
+        CAPACITY_GROUP,
+        {
+            "type": "capacity.update",
+            "event_id": event_id,
+            "number_booked": number_booked,
+            "capacity": capacity,
+        },
+    )
@@ -0,0 +1,129 @@
+"""
+Shared catalog of events served by GET /api/events.
+
+The event list is identical for every user until an event is edited or booked, only the
+booking status differs. The catalog is therefore serialized once and cached, and each request
+only filters it by visibility and appends the status of the user's own tickets, which is one
+values_list query.
+
+The cached catalog is stored under a version which is bumped whenever an event is saved or
+deleted (number_booked changes included), so a request that read the database just before a
+change can never write a stale catalog back under the new version. The version is bumped both
+immediately and when the transaction commits, otherwise a request running before the commit
+could cache the old rows under the new version.
+"""
+
+import json
+import time
+from typing import NamedTuple, Sequence
+
+from django.core.cache import cache
+from django.db import transaction
+from django.http import HttpResponse
+from ninja.responses import NinjaJSONEncoder
+
+from arkad.customized_django_ninja import KeysetPagination, paginate_sorted
+from arkad.utils import cache_namespace
+from event_booking.models import Event, Ticket
+from event_booking.schemas import EventSchema, EventUserStatus
+
+CATALOG_TTL_SECONDS: int = 60 * 60
+
+
+class CatalogEntry(NamedTuple):
+    event_id: int
+    visible_time: float
+    # Serialized EventSchema without the status and closing brace, status is appended per user
+    json_prefix: str
+
+
+def _version_key() -> str:
+    return f"events:{cache_namespace()}:catalog-version"
+
+
+def _catalog_key(version: int) -> str:
+    return f"events:{cache_namespace()}:catalog:{version}"
+
+
+def _get_catalog_version() -> int:
+    key: str = _version_key()
+    version: int | None = cache.get(key)
+    if version is None:
+        version = time.time_ns()
+        if not cache.add(key, version, timeout=None):
+            # Someone else initialised it first, use theirs
+            version = cache.get(key, version)
+    assert version is not None
+    return version
+
+
+def _serialize_event(event: Event) -> CatalogEntry:
+    data: dict[str, object] = EventSchema.from_orm(event).model_dump(by_alias=True)
+    del data["status"]
+    # Same encoder as the ninja renderer, so the output is identical to a schema response
+    serialized: str = json.dumps(data, cls=NinjaJSONEncoder)
+    return CatalogEntry(event.id, event.visible_time.timestamp(), serialized[:-1])
+
+
+def get_event_catalog() -> list[CatalogEntry]:
+    """Returns every event (visible or not) ordered by id, built at most once per change."""
+    version: int = _get_catalog_version()
+    catalog: list[CatalogEntry] | None = cache.get(_catalog_key(version))
+    if catalog is None:
+        catalog = [_serialize_event(e) for e in Event.objects.order_by("id")]
+        cache.set(_catalog_key(version), catalog, timeout=CATALOG_TTL_SECONDS)
+    return catalog
+
+
+def invalidate_event_catalog() -> None:
+    """Call whenever an event is created, changed or deleted, also for queryset updates."""
+
+    def bump() -> None:
+        cache.set(_version_key(), time.time_ns(), timeout=None)
+
+    bump()
+    transaction.on_commit(bump)
+
+
+def get_ticket_statuses(user_id: int) -> dict[int, EventUserStatus]:
+    """Maps event ids to the status of the user's ticket for that event."""
+    statuses: dict[int, EventUserStatus] = {}
+    for event_id, used in Ticket.objects.filter(user_id=user_id).values_list(
+        "event_id", "used"
+    ):
+        statuses.setdefault(
+            event_id, EventUserStatus.TICKET_USED if used else EventUserStatus.BOOKED
+        )
+    return statuses
+
+
+def render_event_catalog(
+    statuses: dict[int, EventUserStatus],
+    include_hidden: bool = False,
+    pagination: KeysetPagination | None = None,
+) -> HttpResponse:
+    """
+    Renders the catalog as a JSON list of EventSchema, with `statuses` mapping event ids
+    to the status of the requesting user (defaults to not booked). Only the page after the
+    cursor is rendered if `pagination` has a limit.
+    """
+    now: float = time.time()
+    response = HttpResponse(content_type="application/json; charset=utf-8")
+    entries: Sequence[CatalogEntry] = [
+        entry
+        for entry in get_event_catalog()
+        if include_hidden or entry.visible_time <= now
+    ]
+    if pagination is not None:
+        entries = paginate_sorted(
+            entries, lambda entry: entry.event_id, pagination, response
+        )
+
+    parts: list[str] = []
+    for entry in entries:
+        status: EventUserStatus = statuses.get(
+            entry.event_id, EventUserStatus.NOT_BOOKED
+        )
+        parts.append(f'{entry.json_prefix}, "status": "{status.value}"}}')
+    response.content = "[" + ", ".join(parts) + "]"
+    return response
@@ -0,0 +1,151 @@
+import asyncio
+import logging
+import time
+from datetime import datetime
+from typing import Any, Literal, Optional
+
+from channels.db import database_sync_to_async  # type: ignore[import-untyped]
+from pydantic import BaseModel
+
+from arkad.consumers import AuthenticatedAsyncWebsocketConsumer
+from event_booking.capacity import CAPACITY_GROUP
+from event_booking.admission import (
+    AdmissionConfig,
+    QueueStatus,
+    get_admission_config,
+    is_released,
+    join_queue,
+)
+
+
+class QueueStatusMessage(BaseModel):
+    type: Literal["queue_status"] = "queue_status"
+    event_id: int
+    position: int
+    ahead: int
+    admitted: bool
+    admitted_at: datetime
+
+
+class QueueErrorMessage(BaseModel):
+    type: Literal["error"] = "error"
+    message: str
+
+
+class CapacityMessage(BaseModel):
+    type: Literal["capacity"] = "capacity"
+    event_id: int
+    number_booked: int
+    capacity: int
+
+
+class WaitingRoomConsumer(AuthenticatedAsyncWebsocketConsumer):
+    """
+    Pushes the waiting room status of an event to the student until they are admitted.
+
+    Connect to ws/events/queue/?event=<event id>&token=<websocket token>. Joins the queue once
+    the event is released, sends the status every few seconds and a final status with
+    `admitted: true` right when the student may book, then closes.
+    """
+
+    update_interval_seconds: float = 5
+    push_task: Optional[asyncio.Task[None]] = None
+
+    async def connect(self) -> None:
+        self.parse_query_params()
+        if not await self.authenticate_from_query(expected_token_type="websocket"):
+            return
+
+        await self.accept()
+        event_id_qp: Optional[str] = self.get_query_param("event")
+        if event_id_qp is None or not event_id_qp.isdigit():
+            await self._reject("Event id is required.", code=4000)
+            return
+        event_id: int = int(event_id_qp)
+        if await self._get_config(event_id) is None:
+            await self._reject("Event has no waiting room.", code=4004)
+            return
+        self.push_task = asyncio.create_task(self._push_status(event_id))
+
+    async def disconnect(self, close_code: int) -> None:
+        if self.push_task and not self.push_task.done():
+            self.push_task.cancel()
+
+    async def _reject(self, message: str, code: int) -> None:
+        await self.send(text_data=QueueErrorMessage(message=message).model_dump_json())
+        await self.close(code=code)
+
+    async def _push_status(self, event_id: int) -> None:
+        try:
+            while True:
+                # Re-read every round, staff may move the release or change the rate
+                config: Optional[AdmissionConfig] = await self._get_config(event_id)
+                if config is None:
+                    await self._reject("Event has no waiting room.", code=4004)
+                    return
+                if not is_released(config):
+                    await asyncio.sleep(
+                        min(
+                            config.release_time - time.time(),
+                            self.update_interval_seconds,
+                        )
+                    )
+                    continue
+
+                status: QueueStatus = await self._join_queue(event_id, config)
+                await self.send(
+                    text_data=QueueStatusMessage(
+                        event_id=event_id, **status._asdict()
+                    ).model_dump_json()
+                )
+                if status.admitted:
+                    await self.close()
+                    return
+                await asyncio.sleep(
+                    min(
+                        status.admitted_at.timestamp() - time.time(),
+                        self.update_interval_seconds,
+                    )
+                )
+        except asyncio.CancelledError:
+            pass
+        except Exception:
+            logging.exception("Waiting room push for event %s failed", event_id)
+            await self.close(code=1011)
+
+    @database_sync_to_async  # type: ignore[misc]
+    def _get_config(self, event_id: int) -> Optional[AdmissionConfig]:
+        return get_admission_config(event_id)
+
+    @database_sync_to_async  # type: ignore[misc]
+    def _join_queue(self, event_id: int, config: AdmissionConfig) -> QueueStatus:
+        return join_queue(event_id, self.user.id, config)
+
+
+class EventCapacityConsumer(AuthenticatedAsyncWebsocketConsumer):
+    """
+    Pushes the seat counts of events as they are booked, instead of polling GET /api/events.
+
+    Connect to ws/events/?token=<websocket token>. A `capacity` message with the current
+    number_booked of an event is sent at most every few hundred milliseconds per event while
+    it is being booked, see event_booking.capacity.
+    """
+
+    async def connect(self) -> None:
+        self.parse_query_params()
+        if not await self.authenticate_from_query(expected_token_type="websocket"):
+            return
+        await self.channel_layer.group_add(CAPACITY_GROUP, self.channel_name)
+        await self.accept()
+
+    async def disconnect(self, close_code: int) -> None:
+        await self.channel_layer.group_discard(CAPACITY_GROUP, self.channel_name)
+
+    async def capacity_update(self, event: dict[str, Any]) -> None:
+        await self.send(
+            text_data=CapacityMessage(
+                event_id=event["event_id"],
+                number_booked=event["number_booked"],
+                capacity=event["capacity"],
+            ).model_dump_json()
+        )
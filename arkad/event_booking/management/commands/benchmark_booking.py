@@ -0,0 +1,149 @@
+import contextlib
+import time
+import multiprocessing
+from concurrent.futures import ProcessPoolExecutor
+from datetime import timedelta
+from functools import partial
+from types import SimpleNamespace
+from typing import Any, Callable
+from unittest import mock
+
+from django.contrib.auth.hashers import make_password
+from django.core.management import BaseCommand, CommandParser
+from django.db import connections, transaction
+from django.utils import timezone
+
+from event_booking.api import book_event
+from event_booking.models import Event, Ticket
+from user_models.models import User
+
+
+def legacy_book_event(user: User, event_id: int) -> int:
+    """The previous acquire-ticket path, which serialises every booking on the event row lock."""
+    with transaction.atomic():
+        event: Event = Event.objects.select_for_update().get(id=event_id)
+        if not event.booking_change_allowed():
+            return 409
+        if event.number_booked >= event.capacity:
+            return 409
+        if event.tickets.filter(user_id=user.id).exists():
+            return 409
+        ticket: Ticket = Ticket.objects.create(user=user, event=event)
+        event.number_booked += 1
+        event.tickets.add(ticket)
+        event.save()
+        return 200
+
+
+def conditional_book_event(user: User, event_id: int) -> int:
+    status, _ = book_event(SimpleNamespace(user=user), event_id)  # type: ignore[arg-type]
+    return int(status)
+
+
+def book_chunk(
+    book: Callable[[User, int], int], event_id: int, chunk: list[User]
+) -> list[tuple[int, float]]:
+    """Books the event for a share of the students over the worker's own connection."""
+    timings: list[tuple[int, float]] = []
+    for user in chunk:
+        start: float = time.perf_counter()
+        status: int = book(user, event_id)
+        timings.append((status, time.perf_counter() - start))
+    return timings
+
+
+class Command(BaseCommand):
+    help = (
+        "Fires parallel bookings at one event and compares the throughput of the previous "
+        "row-locking acquire-ticket path with the conditional update path. "
+        "Creates (and removes) its own event and users in the configured database."
+    )
+
+    def add_arguments(self, parser: CommandParser) -> None:
+        parser.add_argument(
+            "--bookings", type=int, default=500, help="Students booking the event."
+        )
+        parser.add_argument(
+            "--capacity", type=int, default=300, help="Seats in the event."
+        )
+        parser.add_argument(
+            "--workers", type=int, default=32, help="Concurrent booking processes."
+        )
+        parser.add_argument(
+            "--with-notifications",
+            action="store_true",
+            help="Also queue the ticket reminders (requires a Celery broker).",
+        )
+
+    def handle(self, *args: Any, **options: Any) -> None:
+        n: int = options["bookings"]
+        prefix: str = f"benchmark-booking-{time.time_ns()}"
+        users: list[User] = User.objects.bulk_create(
+            User(username=f"{prefix}-{i}", password=make_password(None))
+            for i in range(n)
+        )
+        try:
+            with (
+                contextlib.nullcontext()
+                if options["with_notifications"]
+                else mock.patch("notifications.tasks.schedule_ticket_reminders.delay")
+            ):
+                for name, book in (
+                    ("select_for_update (previous)", legacy_book_event),
+                    ("conditional update", conditional_book_event),
+                ):
+                    self._run(name, book, users, options)
+        finally:
+            User.objects.filter(username__startswith=prefix).delete()
+
+    def _run(
+        self,
+        name: str,
+        book: Callable[[User, int], int],
+        users: list[User],
+        options: dict[str, Any],
+    ) -> None:
+        now = timezone.now()
+        event: Event = Event.objects.create(
+            name="Booking benchmark",
+            type="ce",
+            location="Benchmark",
+            visible_time=now + timedelta(days=365),
+            release_time=now - timedelta(minutes=1),
+            start_time=now + timedelta(days=30),
+            end_time=now + timedelta(days=30, hours=2),
+            capacity=options["capacity"],
+            send_notifications_for_event=False,
+        )
+
+        workers: int = options["workers"]
+        chunks: list[list[User]] = [users[i::workers] for i in range(workers)]
+        # Separate processes so the database, not the interpreter lock, is what is measured
+        connections.close_all()
+        try:
+            start: float = time.perf_counter()
+            with ProcessPoolExecutor(
+                max_workers=workers,
+                mp_context=multiprocessing.get_context("fork"),
+                initializer=connections.close_all,
+            ) as executor:
+                results: list[tuple[int, float]] = [
+                    timing
+                    for timings in executor.map(
+                        partial(book_chunk, book, event.id), chunks
+                    )
+                    for timing in timings
+                ]
+            elapsed: float = time.perf_counter() - start
+
+            event.refresh_from_db()
+            booked: int = sum(1 for status, _ in results if status == 200)
+            latencies: list[float] = sorted(latency for _, latency in results)
+            p99: float = latencies[max(0, int(len(latencies) * 0.99) - 1)]
+            assert booked == event.number_booked == event.tickets.count()
+            self.stdout.write(
+                f"{name:30} {len(results) / elapsed:8.1f} bookings/s, "
+                f"p99 {p99 * 1000:7.1f} ms, {booked} seats taken of {event.capacity}"
+            )
+        finally:
+            event.delete()
@@ -1,14 +1,15 @@
-import os
 from datetime import datetime, timedelta
 
 import pytz
-import qrcode
 from django.core.management.base import BaseCommand, CommandParser
-from reportlab.lib.pagesizes import A4
-from reportlab.pdfgen import canvas
 
-from event_booking.models import Event, Ticket
-from user_models.models import User
+from event_booking.models import Event
+from event_booking.ticket_sheets import (
+    LARGE_TICKETS,
+    issue_printed_tickets,
+    ticket_sheets_filename,
+    ticket_sheets_zip,
+)
 
 
 class Command(BaseCommand):
@@ -77,94 +78,22 @@ class Command(BaseCommand):
             )
         )
 
-        # Create a directory for the ticket PDFs
-        dir_name = (
-            f"{event.name.replace(' ', '_')}_{start_time.strftime('%Y%m%d_%H%M')}"
-        )
-        os.makedirs(dir_name, exist_ok=True)
-
         try:
-            user, created = User.objects.get_or_create(
-                username=username, defaults={"email": f"{username}@fake-user.com"}
-            )
-            if created:
-                user.set_unusable_password()
-                user.save()
-                self.stdout.write(
-                    self.style.SUCCESS(
-                        f"User '{username}' did not exist, so a new user was created."
-                    )
-                )
-
-            tickets = []
-            for _ in range(amount):
-                ticket = Ticket.objects.create(user=user, event=event)
-                tickets.append(ticket)
-
+            tickets = issue_printed_tickets(event, username, amount)
             self.stdout.write(
                 self.style.SUCCESS(
-                    f"Successfully created {amount} tickets for {user.username} for event {event.name}."
+                    f"Successfully created {amount} tickets for {username} for event {event.name}."
                 )
             )
 
-            # Group tickets into chunks of 4
-            ticket_chunks = [tickets[i : i + 4] for i in range(0, len(tickets), 4)]
-            pdf_count = 0
-
-            for chunk in ticket_chunks:
-                pdf_count += 1
-                pdf_path = os.path.join(dir_name, f"tickets_page_{pdf_count}.pdf")
-                c = canvas.Canvas(pdf_path, pagesize=A4)
-                width, height = A4
-
-                positions = [
-                    (0, height / 2),  # Top-left
-                    (width / 2, height / 2),  # Top-right
-                    (0, 0),  # Bottom-left
-                    (width / 2, 0),  # Bottom-right
-                ]
-
-                for i, ticket in enumerate(chunk):
-                    x_offset, y_offset = positions[i]
-
-                    c.setFont("Helvetica-Bold", 16)
-                    c.drawString(
-                        x_offset + 50,
-                        y_offset + height / 2 - 50,
-                        "Lunch Ticket",
-                    )
-
-                    c.setFont("Helvetica", 12)
-                    c.drawString(
-                        x_offset + 50,
-                        y_offset + height / 2 - 70,
-                        f"Start: {event.start_time.strftime('%Y-%m-%d %H:%M')}",
-                    )
-                    c.drawString(
-                        x_offset + 50,
-                        y_offset + height / 2 - 90,
-                        f"End: {event.end_time.strftime('%Y-%m-%d %H:%M')}",
-                    )
-
-                    qr_img = qrcode.make(str(ticket.uuid))
-                    qr_path = os.path.join(dir_name, f"qr_{ticket.uuid}.png")
-                    with open(qr_path, "wb") as f:
-                        qr_img.save(f)
-
-                    c.drawImage(
-                        qr_path,
-                        x_offset + 50,
-                        y_offset + height / 2 - 250,
-                        width=150,
-                        height=150,
-                    )
-                    os.remove(qr_path)
-
-                c.save()
+            zip_path = ticket_sheets_filename(event)
+            with open(zip_path, "wb") as f:
+                for chunk in ticket_sheets_zip(tickets, event, LARGE_TICKETS):
+                    f.write(chunk)
 
             self.stdout.write(
                 self.style.SUCCESS(
-                    f"Successfully created {len(tickets)} tickets in {pdf_count} PDF files in '{dir_name}'."
+                    f"Successfully created {len(tickets)} tickets in '{zip_path}'."
                 )
             )
 
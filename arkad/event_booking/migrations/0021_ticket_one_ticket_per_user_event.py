@@ -0,0 +1,41 @@
+# Generated by Django 5.2.7 on 2026-10-17 00:53
+
+from django.conf import settings
+from django.db import migrations, models
+
+
+def mark_bulk_issued_tickets(apps, schema_editor):
+    """Tickets sharing event and user were printed in bulk (lunch tickets), exempt them"""
+    Ticket = apps.get_model('event_booking', 'Ticket')
+
+    duplicated = (
+        Ticket.objects.values('event_id', 'user_id')
+        .annotate(count=models.Count('uuid'))
+        .filter(count__gt=1)
+    )
+    for row in duplicated:
+        Ticket.objects.filter(event_id=row['event_id'], user_id=row['user_id']).update(
+            issued_in_bulk=True
+        )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('event_booking', '0020_alter_event_notify_registration_opening_and_more'),
+        ('notifications', '0008_scheduledcelerytasks_has_run'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='ticket',
+            name='issued_in_bulk',
+            field=models.BooleanField(default=False, editable=False, help_text='Printed tickets held by one placeholder user (e.g. lunch tickets), these are exempt from the one ticket per user and event rule.'),
+        ),
+        migrations.RunPython(mark_bulk_issued_tickets, migrations.RunPython.noop),
+        migrations.AddConstraint(
+            model_name='ticket',
+            constraint=models.UniqueConstraint(condition=models.Q(('issued_in_bulk', False)), fields=('event', 'user'), name='one_ticket_per_user_event'),
+        ),
+    ]
@@ -0,0 +1,19 @@
+# Generated by Django 5.2.7 on 2026-10-17 01:07
+
+import django.core.validators
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('event_booking', '0021_ticket_one_ticket_per_user_event'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='event',
+            name='admission_rate',
+            field=models.FloatField(blank=True, default=None, help_text='Students let through the waiting room per second after release. Set for high-demand events, leave empty to disable the waiting room.', null=True, validators=[django.core.validators.MinValueValidator(0.1)]),
+        ),
+    ]
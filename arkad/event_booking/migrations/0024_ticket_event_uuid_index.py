@@ -0,0 +1,20 @@
+# Generated by Django 5.2.7 on 2026-10-17 02:03
+
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('event_booking', '0023_waitlist'),
+        ('notifications', '0009_sentreminder'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='ticket',
+            index=models.Index(fields=['event', 'uuid'], name='event_booki_event_i_0f8cd5_idx'),
+        ),
+    ]
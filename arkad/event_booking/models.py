@@ -1,21 +1,27 @@
 import uuid
 from datetime import timedelta, datetime
+from functools import partial
 from typing import Type, Any
+from uuid import UUID
 
 from django.core.exceptions import ValidationError
-from django.db import models
-from django.db.models import Q, CheckConstraint
-from django.db.models.signals import post_save, pre_save
+from django.core.validators import MinValueValidator
+from django.db import connection, models, transaction
+from django.db.models import Q, CheckConstraint, UniqueConstraint
+from django.db.models.signals import post_delete, post_save
 from django.dispatch import receiver
 from django.utils import timezone
 
 from arkad.defaults import DEFAULT_VISIBLE_TIME_EVENT, DEFAULT_RELEASE_TIME_EVENT
+from arkad.field_tracking import TrackedFieldsModel
 from companies.models import Company
 from event_booking.schemas import EventUserStatus
 from user_models.models import User
-from notifications.models import ScheduledCeleryTasks
+from notifications.models import ScheduledCeleryTasks, reminder_sweeper_enabled
 
 EVENT_TYPES: dict[str, str] = {"ce": "Company event", "lu": "Lunch", "ba": "Banquet"}
+# Events with at least this many tickets get their reminders rescheduled in the background
+RESCHEDULE_IN_BACKGROUND_FROM: int = 200
 
 
 class Ticket(models.Model):
@@ -23,6 +29,12 @@ class Ticket(models.Model):
     uuid = models.UUIDField(primary_key=True, default=uuid.uuid4, editable=False)
     event = models.ForeignKey("Event", on_delete=models.CASCADE, related_name="tickets")
     used = models.BooleanField(default=False)
+    issued_in_bulk = models.BooleanField(
+        default=False,
+        editable=False,
+        help_text="Printed tickets held by one placeholder user (e.g. lunch tickets), "
+        "these are exempt from the one ticket per user and event rule.",
+    )
 
     notify_event_tomorrow = models.ForeignKey(
         ScheduledCeleryTasks,
@@ -52,46 +64,143 @@ class Ticket(models.Model):
         editable=False,
     )
 
+    class Meta:
+        constraints = [
+            UniqueConstraint(
+                fields=["event", "user"],
+                condition=Q(issued_in_bulk=False),
+                name="one_ticket_per_user_event",
+            )
+        ]
+        # Keyset pagination of the attendees of an event
+        indexes = [models.Index(fields=["event", "uuid"])]
+
     def __str__(self) -> str:
         return f"{self.user}'s ticket to {self.event}"
 
     def status(self) -> EventUserStatus:
         return EventUserStatus.TICKET_USED if self.used else EventUserStatus.BOOKED
 
-    def schedule_notifications(self, start_time: datetime) -> None:
-        """Schedule notifications for this ticket."""
+    NOTIFICATION_FIELDS: list[str] = [
+        "notify_event_tomorrow",
+        "notify_event_in_one_hour",
+        "notify_registration_closes_tomorrow",
+    ]
+
+    def _notification_tasks(
+        self, start_time: datetime
+    ) -> list[tuple[str, Any, datetime, list[Any]]]:
+        """The reminders still ahead for this ticket, as (field, task, eta, arguments)."""
         from notifications import tasks
 
-        self.remove_notifications()  # Make sure that all tasks are removed
+        if reminder_sweeper_enabled():
+            return []  # Sent by the reminder sweeper instead
+
+        now: datetime = timezone.now()
+        notification_tasks: list[tuple[str, Any, datetime, list[Any]]] = []
 
         # (Du har anmält dig till) YYY (som är) med XXX är imorgon
         eta1 = start_time - timedelta(hours=24)
-        if eta1 > timezone.now():
-            self.notify_event_tomorrow = ScheduledCeleryTasks.schedule_task(
-                task_function=tasks.notify_event_tomorrow,
-                eta=eta1,
-                arguments=[self.uuid],
+        if eta1 > now:
+            notification_tasks.append(
+                (
+                    "notify_event_tomorrow",
+                    tasks.notify_event_tomorrow,
+                    eta1,
+                    [self.uuid],
+                )
             )
 
         eta2 = start_time - timedelta(hours=1)
-        if eta2 > timezone.now():
+        if eta2 > now:
             # (Du har anmält dig till) YYY (som är) med XXX är om en timme
-            self.notify_event_in_one_hour = ScheduledCeleryTasks.schedule_task(
-                task_function=tasks.notify_event_one_hour,
-                eta=eta2,
-                arguments=[self.uuid],
+            notification_tasks.append(
+                (
+                    "notify_event_in_one_hour",
+                    tasks.notify_event_one_hour,
+                    eta2,
+                    [self.uuid],
+                )
             )
         # Anmälan för YYY med XXX stänger imorgon
         booking_freezes_at = self.event.booking_freezes_at
         eta3 = booking_freezes_at - timedelta(days=1)
-        if eta3 > timezone.now():
-            self.notify_registration_closes_tomorrow = (
-                ScheduledCeleryTasks.schedule_task(
-                    task_function=tasks.notify_event_registration_closes_tomorrow,
-                    eta=eta3,
-                    arguments=[self.uuid],
+        if eta3 > now:
+            notification_tasks.append(
+                (
+                    "notify_registration_closes_tomorrow",
+                    tasks.notify_event_registration_closes_tomorrow,
+                    eta3,
+                    [self.uuid],
                 )
             )
+        return notification_tasks
+
+    def schedule_notifications(self, start_time: datetime) -> None:
+        """Schedule notifications for this ticket."""
+        self.remove_notifications()  # Make sure that all tasks are removed
+
+        notification_tasks = self._notification_tasks(start_time)
+        scheduled = ScheduledCeleryTasks.schedule_tasks(
+            [(task, eta, arguments) for _, task, eta, arguments in notification_tasks]
+        )
+        for (field, *_), scheduled_task in zip(notification_tasks, scheduled):
+            setattr(self, field, scheduled_task)
+
+    @classmethod
+    def schedule_notifications_in_bulk(cls, tickets: list["Ticket"]) -> None:
+        """
+        Schedules and saves the notifications of tickets that have none yet, using one insert
+        for all reminder rows and one update for the tickets. Tickets need their event loaded.
+        """
+        notification_tasks = [
+            (ticket, field, task, eta, arguments)
+            for ticket in tickets
+            for field, task, eta, arguments in ticket._notification_tasks(
+                ticket.event.start_time
+            )
+        ]
+        scheduled = ScheduledCeleryTasks.schedule_tasks(
+            [
+                (task, eta, arguments)
+                for _, _, task, eta, arguments in notification_tasks
+            ]
+        )
+        for (ticket, field, *_), scheduled_task in zip(notification_tasks, scheduled):
+            setattr(ticket, field, scheduled_task)
+        Ticket.objects.bulk_update(tickets, cls.NOTIFICATION_FIELDS)
+
+    @classmethod
+    def remove_notifications_in_bulk(cls, tickets: list["Ticket"]) -> None:
+        """
+        Bulk version of remove_notifications, revoking the reminders of all tickets with one
+        broadcast and one update. The tickets are not saved.
+        """
+        ScheduledCeleryTasks.revoke_tasks(
+            [
+                task_id
+                for ticket in tickets
+                for field in cls.NOTIFICATION_FIELDS
+                if (task_id := getattr(ticket, f"{field}_id")) is not None
+            ]
+        )
+        for ticket in tickets:
+            for field in cls.NOTIFICATION_FIELDS:
+                setattr(ticket, field, None)
+
+    @classmethod
+    def mark_used(cls, event_id: int, ticket_uuids: list[UUID]) -> set[UUID]:
+        """
+        Marks the unused tickets among `ticket_uuids` of the event as used in one statement.
+        Returns the uuids that were marked by this call, the others were used or do not exist.
+        """
+        with connection.cursor() as cursor:
+            cursor.execute(
+                f"UPDATE {connection.ops.quote_name(cls._meta.db_table)} SET used = true "
+                "WHERE event_id = %s AND uuid = ANY(%s) AND used = false RETURNING uuid",
+                [event_id, ticket_uuids],
+            )
+            return {row[0] for row in cursor.fetchall()}
 
     def remove_notifications(self) -> None:
         """Remove scheduled notifications for this ticket."""
@@ -118,19 +227,27 @@ def schedule_ticket_notifications(
 ) -> None:
     disabled: bool = getattr(instance, "_signal_receivers_disabled", False)
 
-    if created and not disabled:
-        instance.schedule_notifications(instance.event.start_time)
-        setattr(instance, "_signal_receivers_disabled", True)
-        instance.save(
-            update_fields=[
-                "notify_event_tomorrow",
-                "notify_event_in_one_hour",
-                "notify_registration_closes_tomorrow",
-            ]
+    if created and not disabled and not reminder_sweeper_enabled():
+        # Scheduling writes three rows and talks to the broker, keep that out of the booking
+        from notifications.tasks import (
+            schedule_ticket_reminders,
+        )  # Avoid circular import
+
+        transaction.on_commit(
+            partial(schedule_ticket_reminders.delay, [str(instance.uuid)])
         )
 
 
-class Event(models.Model):
+class Event(TrackedFieldsModel):
+    # Changes to these reschedule notifications, the waiting room or are pushed to ws/events/
+    tracked_fields = (
+        "start_time",
+        "release_time",
+        "admission_rate",
+        "number_booked",
+        "capacity",
+    )
+
     name = models.CharField(max_length=100)
     description = models.TextField(default="")
 
@@ -174,6 +291,15 @@ class Event(models.Model):
         help_text="If false, no notifications will be sent for this event.",
     )
 
+    admission_rate = models.FloatField(
+        null=True,
+        blank=True,
+        default=None,
+        validators=[MinValueValidator(0.1)],
+        help_text="Students let through the waiting room per second after release. "
+        "Set for high-demand events, leave empty to disable the waiting room.",
+    )
+
     class Meta:
         constraints = [
             CheckConstraint(
@@ -226,6 +352,24 @@ class Event(models.Model):
             self.notify_registration_opening.revoke()
             self.notify_registration_opening = None
 
+    def promote_from_waitlist(self) -> Ticket | None:
+        """
+        Gives a freed seat to the first student on the waitlist, returns their new ticket.
+
+        Must be called inside the transaction that freed the seat, with the event row locked.
+        """
+        entry: Waitlist | None = (
+            self.waitlist.select_for_update()
+            .exclude(user__ticket__event=self)
+            .order_by("joined_at", "id")
+            .first()
+        )
+        if entry is None:
+            return None
+        ticket: Ticket = Ticket.objects.create(user_id=entry.user_id, event=self)
+        entry.delete()
+        return ticket
+
     def verify_user_has_ticket(self, user_id: int) -> bool:
         return self.tickets.filter(user_id=user_id, used=False).exists()
 
@@ -239,6 +383,31 @@ class Event(models.Model):
         else:
             return "Event"
 
+    def reschedule_ticket_notifications(self) -> None:
+        """
+        Revokes and reschedules the reminders of every ticket to the event in bulk: one revoke
+        broadcast, one insert of the new reminder rows and one update of the tickets.
+        """
+        # The related manager sets ticket.event to self, so no query per ticket
+        tickets: list[Ticket] = list(self.tickets.all())
+        Ticket.remove_notifications_in_bulk(tickets)
+        Ticket.schedule_notifications_in_bulk(tickets)
+
+    def reschedule_ticket_notifications_on_commit(self) -> None:
+        """
+        Reschedules the ticket reminders once the transaction commits, so a rollback leaves
+        the reminders as they were. In a background task if the event has too many tickets
+        to do it within the request.
+        """
+        from notifications.tasks import (
+            reschedule_event_reminders,
+        )  # Avoid circular import
+
+        if self.tickets.count() < RESCHEDULE_IN_BACKGROUND_FROM:
+            transaction.on_commit(partial(reschedule_event_reminders, self.id))
+        else:
+            transaction.on_commit(partial(reschedule_event_reminders.delay, self.id))
+
     def revoke_and_reschedule_tasks(self) -> None:
         """
         Remove and reschedule notifications for the event and all related tickets if the event is in the future.
@@ -247,75 +416,142 @@ class Event(models.Model):
         self.remove_notifications()
         if self.send_notifications_for_event:
             self.schedule_notifications()
-            # For each ticket, remove and reschedule notifications if the event is in the future
-            for ticket in self.tickets.all():
-                ticket.remove_notifications()
-                if self.start_time > timezone.now():
-                    ticket.schedule_notifications(self.start_time)
-                setattr(ticket, "_signal_receivers_disabled", True)
-                ticket.save()
-            setattr(self, "_signal_receivers_disabled", True)
-            self.save()
-
-
-@receiver(pre_save, sender=Event)
-def cache_old_event_times(sender: Type[Event], instance: Event, **kwargs: Any) -> None:
-    """
-    Store the 'old' start_time on the instance object *before* it gets saved
-    so we can compare it in the post_save signal.
-    """
-    if instance.pk:  # Check if this is an update (not a new creation)
-        try:
-            old_instance = Event.objects.get(pk=instance.pk)
-            # Store the old time on the instance for later use
-            setattr(instance, "_old_start_time", old_instance.start_time)
-            setattr(instance, "_old_release_time", old_instance.release_time)
-        except Event.DoesNotExist:
-            # Should not happen on a pre_save for an existing pk, but good to be safe
-            pass
+            self.reschedule_ticket_notifications_on_commit()
+            self.save(update_fields=["notify_registration_opening"])
+
+
+class Waitlist(models.Model):
+    """Students waiting for a seat on a fully booked event, served first come first served."""
+
+    event = models.ForeignKey(Event, on_delete=models.CASCADE, related_name="waitlist")
+    user = models.ForeignKey(User, on_delete=models.CASCADE)
+    joined_at = models.DateTimeField(auto_now_add=True)
+
+    class Meta:
+        constraints = [
+            UniqueConstraint(
+                fields=["event", "user"], name="one_waitlist_entry_per_user"
+            )
+        ]
+        indexes = [models.Index(fields=["event", "joined_at"])]
+
+    def __str__(self) -> str:
+        return f"{self.user} waiting for {self.event}"
+
+    def position(self) -> int:
+        """1-based place in the queue for the event, among students still without a ticket."""
+        return (
+            Waitlist.objects.filter(event_id=self.event_id)
+            .exclude(user__ticket__event_id=self.event_id)
+            .filter(
+                Q(joined_at__lt=self.joined_at)
+                | Q(joined_at=self.joined_at, id__lt=self.id)
+            )
+            .count()
+            + 1
+        )
 
 
 @receiver(post_save, sender=Event)
 def schedule_event_notifications(
-    sender: Type[Event], instance: Event, created: bool, **kwargs: Any
+    sender: Type[Event],
+    instance: Event,
+    created: bool,
+    update_fields: frozenset[str] | None,
+    **kwargs: Any,
 ) -> None:
-    if getattr(instance, "_signal_receivers_disabled", False):
-        return
-
-    # Get the old start_time we cached in the pre_save signal
-    old_start_time = getattr(instance, "_old_start_time", None)
-    old_release_time = getattr(instance, "_old_release_time", None)
+    changed: set[str] = instance.changed_fields(update_fields)
+    start_changed: bool = "start_time" in changed
+    release_changed: bool = "release_time" in changed
 
-    start_changed: bool = created or old_start_time != instance.start_time
-    release_changed: bool = created or old_release_time != instance.release_time
-
-    # If it's not a new event AND the start_time hasn't changed, do nothing.
-    if not created and not start_changed and not release_changed:
-        return  # The times didn't change, so no rescheduling is needed.
+    # If the times didn't change (e.g. only number_booked was saved), no rescheduling is needed
+    if not start_changed and not release_changed:
+        return
 
     if instance.send_notifications_for_event:
         # Schedule notifications for the Event itself
         if release_changed:
             instance.schedule_notifications()
 
-        if start_changed:
-            tickets_to_update = []
-            for ticket in instance.tickets.all():
-                ticket.schedule_notifications(instance.start_time)
-                tickets_to_update.append(ticket)
-
-            if tickets_to_update:
-                fields_to_update = [
-                    "notify_event_tomorrow",
-                    "notify_event_in_one_hour",
-                    "notify_registration_closes_tomorrow",
-                ]
-                Ticket.objects.bulk_update(tickets_to_update, fields_to_update)
+        if start_changed and not created:
+            instance.reschedule_ticket_notifications_on_commit()
 
         if release_changed:
-            setattr(instance, "_signal_receivers_disabled", True)
-            instance.save(
-                update_fields=[
-                    "notify_registration_opening",
-                ]
-            )
+            # Touches no tracked field, so this receiver returns straight away
+            instance.save(update_fields=["notify_registration_opening"])
+
+
+@receiver(post_save, sender=Ticket)
+@receiver(post_delete, sender=Ticket)
+def invalidate_agenda_on_ticket_change(
+    sender: Type[Ticket], instance: Ticket, **kwargs: Any
+) -> None:
+    from user_models.agenda import invalidate_agendas  # Avoid circular import
+
+    invalidate_agendas([instance.user_id])
+
+
+@receiver(post_save, sender=Event)
+@receiver(post_delete, sender=Event)
+def invalidate_agendas_on_event_change(
+    sender: Type[Event],
+    instance: Event,
+    created: bool = False,
+    update_fields: frozenset[str] | None = None,
+    **kwargs: Any,
+) -> None:
+    """Moving or renaming an event changes the agenda of everyone with a ticket."""
+    from user_models.agenda import invalidate_all_agendas  # Avoid circular import
+
+    # Nobody has a ticket yet, or only the counter or reminder was saved
+    if created or (
+        update_fields is not None
+        and update_fields <= {"number_booked", "notify_registration_opening"}
+    ):
+        return
+    invalidate_all_agendas()
+
+
+@receiver(post_save, sender=Event)
+@receiver(post_delete, sender=Event)
+def invalidate_event_catalog_on_change(
+    sender: Type[Event], instance: Event, **kwargs: Any
+) -> None:
+    """Any change to an event (including its number_booked counter) changes GET /api/events."""
+    from event_booking.catalog import invalidate_event_catalog  # Avoid circular import
+
+    invalidate_event_catalog()
+
+
+@receiver(post_save, sender=Event)
+def publish_capacity_on_change(
+    sender: Type[Event],
+    instance: Event,
+    update_fields: frozenset[str] | None,
+    **kwargs: Any,
+) -> None:
+    """Unbooking and admin edits, bookings update the counter with a queryset update."""
+    if instance.changed_fields(update_fields) & {"number_booked", "capacity"}:
+        from event_booking.capacity import capacity_changed  # Avoid circular import
+
+        capacity_changed(instance.id)
+
+
+@receiver(post_save, sender=Event)
+@receiver(post_delete, sender=Event)
+def update_admission_config(
+    sender: Type[Event], instance: Event, created: bool = False, **kwargs: Any
+) -> None:
+    """Keeps the waiting room configuration in Redis in sync, it is read on every booking."""
+    from event_booking.admission import (  # Avoid circular import
+        forget_admission_config,
+        store_admission_config,
+    )
+
+    if kwargs["signal"] is post_delete:
+        forget_admission_config(instance.id)
+    elif instance.changed_fields(kwargs["update_fields"]) & {
+        "release_time",
+        "admission_rate",
+    }:
+        store_admission_config(instance)
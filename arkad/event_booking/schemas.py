@@ -57,8 +57,49 @@ class UseTicketSchema(Schema):
     event_id: int
 
 
+class TicketTokenSchema(UseTicketSchema):
+    # Signed ticket token for the QR code, see event_booking/ticket_tokens.py
+    token: str
+
+
+class UseTicketsSchema(Schema):
+    event_id: int
+    uuids: list[UUID]
+
+
+class UsedTicketsSchema(Schema):
+    used: list[UUID]  # Marked as used by this request
+    conflicts: list[UUID]  # Already used, e.g. scanned on another device
+    not_found: list[UUID]  # Not tickets to the event
+
+
+class ManifestTicketSchema(Schema):
+    uuid: UUID
+    name: str
+    food_preferences: str | None
+    used: bool
+
+
+class ManifestSchema(Schema):
+    event_id: int
+    tickets: list[ManifestTicketSchema]
+
+
 class EventUserInformation(Schema):
     user_id: int
     full_name: str
     food_preferences: str | None
     ticket_used: bool
+
+
+class QueueStatusSchema(Schema):
+    event_id: int
+    position: int
+    ahead: int
+    admitted: bool
+    admitted_at: datetime
+
+
+class WaitlistSchema(Schema):
+    event_id: int
+    position: int
@@ -0,0 +1,27 @@
+import logging
+
+from celery import shared_task  # type: ignore[import-untyped]
+
+from event_booking.capacity import publish_capacity
+from event_booking.models import Event
+from event_booking.ticket_sheets import LAYOUTS, write_ticket_sheets
+
+logger = logging.getLogger(__name__)
+
+
+@shared_task  # type: ignore
+def render_ticket_sheets(event_id: int, layout: str) -> None:
+    """Renders the printable ticket sheets of a (lunch) event for download from the admin."""
+    try:
+        event: Event = Event.objects.get(id=event_id)
+    except Event.DoesNotExist:
+        logger.warning(f"Event with id {event_id} not found.")
+        return
+    path = write_ticket_sheets(event, LAYOUTS[layout])
+    logger.info(f"Rendered ticket sheets for event {event_id} to {path}")
+
+
+@shared_task  # type: ignore
+def publish_event_capacity(event_id: int) -> None:
+    """Pushes the coalesced seat count changes of an event to ws/events/, see capacity.py."""
+    publish_capacity(event_id)
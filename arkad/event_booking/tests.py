@@ -1,13 +1,44 @@
 import datetime
+import gzip
+import io
+import tempfile
+import zipfile
+from unittest.mock import patch
+from pathlib import Path
 from uuid import uuid4
 
+import jwt
+import billiard  # type: ignore[import-untyped]
+from asgiref.sync import sync_to_async
+from channels.testing import WebsocketCommunicator  # type: ignore[import-untyped]
+import msgpack  # type: ignore[import-untyped]
 import pytz
 from django.test import TestCase, Client
 from django.contrib.auth import get_user_model
+from django.core.cache import cache
+from django.db import IntegrityError, connection, transaction
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
 from django.utils import timezone
-from event_booking.models import Event, Ticket
+from event_booking.admission import _counter_key, _position_key
+from event_booking.models import Event, Ticket, Waitlist
 from companies.models import Company
 from event_booking.schemas import UseTicketSchema, EventSchema, EventUserInformation
+from event_booking.capacity import COALESCE_SECONDS, _pending_key, publish_capacity
+from event_booking.consumers import EventCapacityConsumer
+from event_booking.tasks import render_ticket_sheets
+from event_booking.ticket_sheets import (
+    SMALL_TICKETS,
+    issue_printed_tickets,
+    render_pages,
+)
+from event_booking.ticket_tokens import (
+    VALID_AFTER_EVENT_END,
+    issue_ticket_token,
+    verify_ticket_token,
+)
+from notifications.models import ScheduledCeleryTasks
+from notifications.tasks import reschedule_event_reminders
 
 User = get_user_model()
 
@@ -44,6 +75,22 @@ class EventBookingTestCase(TestCase):
             visible_time=timezone.now() - datetime.timedelta(days=9),
             capacity=100,
         )
+        self._forget_waiting_room()
+
+    def tearDown(self):
+        self._forget_waiting_room()
+
+    def _forget_waiting_room(self) -> None:
+        # Queues of earlier test runs may be left under the same event id
+        cache.delete_many(
+            [
+                _counter_key(self.event.id),
+                *(
+                    _position_key(self.event.id, user.id)
+                    for user in (self.user, self.user2)
+                ),
+            ]
+        )
 
     def _get_auth_headers(self, user: User) -> dict:
         """Generate JWT token for the user."""
@@ -65,6 +112,63 @@ class EventBookingTestCase(TestCase):
         self.assertEqual(response.status_code, 200)
         self.assertEqual(len(response.json()), 1)  # Only one event exists
 
+    def test_get_events_paginated(self):
+        hidden = Event.objects.create(
+            name="Hidden Event",
+            location="Hall",
+            start_time=self.event.start_time,
+            end_time=self.event.end_time,
+            visible_time=timezone.now() + datetime.timedelta(days=1),
+            capacity=10,
+        )
+        later = Event.objects.create(
+            name="Later Event",
+            location="Hall",
+            start_time=self.event.start_time,
+            end_time=self.event.end_time,
+            visible_time=timezone.now() - datetime.timedelta(days=1),
+            capacity=10,
+        )
+        headers = self._get_auth_headers(self.user)
+        response = self.client.get("/api/events?limit=1", headers=headers)
+        self.assertEqual([e["id"] for e in response.json()], [self.event.id])
+        cursor = response.headers["X-Next-Cursor"]
+
+        response = self.client.get(
+            f"/api/events?limit=1&cursor={cursor}", headers=headers
+        )
+        # The hidden event is skipped, and there is nothing after the last page
+        self.assertEqual([e["id"] for e in response.json()], [later.id])
+        self.assertNotIn("X-Next-Cursor", response.headers)
+
+        response = self.client.get(
+            f"/api/events?limit=1&cursor={cursor}",
+            headers=self._get_auth_headers(self.staff_user),
+        )
+        self.assertEqual([e["id"] for e in response.json()], [hidden.id])
+
+    def test_get_attending_information_paginated(self):
+        for i in range(5):
+            Ticket.objects.create(
+                user=User.objects.create_user(username=f"attendee{i}", password="p"),
+                event=self.event,
+            )
+        headers = self._get_auth_headers(self.staff_user)
+        url = f"/api/events/{self.event.id}/attending?limit=2"
+        user_ids: list[int] = []
+        while url:
+            response = self.client.get(url, headers=headers)
+            self.assertEqual(response.status_code, 200)
+            user_ids += [attendee["userId"] for attendee in response.json()]
+            cursor = response.headers.get("X-Next-Cursor")
+            url = (
+                cursor
+                and f"/api/events/{self.event.id}/attending?limit=2&cursor={cursor}"
+            )
+        self.assertCountEqual(
+            user_ids, self.event.tickets.values_list("user_id", flat=True)
+        )
+
     def test_get_event(self):
         headers = self._get_auth_headers(self.user)
         response = self.client.get(f"/api/events/{self.event.id}/", headers=headers)
@@ -80,6 +184,23 @@ class EventBookingTestCase(TestCase):
         self.event.refresh_from_db()
         self.assertEqual(self.event.number_booked, 1)
 
+    def test_book_event_schedules_reminders_after_commit(self):
+        headers = self._get_auth_headers(self.user)
+        with patch("notifications.tasks.schedule_ticket_reminders.delay") as schedule:
+            with self.captureOnCommitCallbacks() as callbacks:
+                response = self.client.post(
+                    f"/api/events/acquire-ticket/{self.event.id}", headers=headers
+                )
+            self.assertEqual(response.status_code, 200)
+            # Nothing is scheduled from within the booking transaction
+            schedule.assert_not_called()
+            for callback in callbacks:
+                callback()
+
+        ticket: Ticket = Ticket.objects.get(user=self.user, event=self.event)
+        schedule.assert_called_once_with([str(ticket.uuid)])
+        self.assertIsNone(ticket.notify_event_tomorrow)
+
     def test_booked_events(self):
         headers = self._get_auth_headers(self.user)
         response = self.client.post(
@@ -447,3 +568,734 @@ class EventBookingTestCase(TestCase):
         self.assertIsNotNone(user2_info)
         self.assertTrue(user1_info.ticket_used)
         self.assertFalse(user2_info.ticket_used)
+
+    def test_get_events_matches_event_schema(self):
+        import json
+        from ninja.responses import NinjaJSONEncoder
+
+        Ticket.objects.create(user=self.user, event=self.event, used=True)
+        response = self.client.get(
+            "/api/events", headers=self._get_auth_headers(self.user)
+        )
+        schema = EventSchema.from_orm(self.event)
+        schema.status = "ticket_used"
+        expected = json.loads(
+            json.dumps(schema.model_dump(by_alias=True), cls=NinjaJSONEncoder)
+        )
+        self.assertEqual(response.json(), [expected])
+
+    def test_get_events_cached_catalog(self):
+        headers = self._get_auth_headers(self.user)
+        self.client.get("/api/events", headers=headers)
+        # Only the ticket overlay is queried once the catalog is cached
+        with self.assertNumQueries(1):
+            response = self.client.get("/api/events", headers=headers)
+        self.assertEqual(response.json()[0]["status"], "not_booked")
+        with self.assertNumQueries(0):
+            self.client.get("/api/events")
+
+    def test_get_events_reflects_bookings(self):
+        headers = self._get_auth_headers(self.user)
+        self.client.get("/api/events", headers=headers)
+        self.client.post(f"/api/events/acquire-ticket/{self.event.id}", headers=headers)
+
+        response = self.client.get("/api/events", headers=headers)
+        self.assertEqual(response.json()[0]["numberBooked"], 1)
+        self.assertEqual(response.json()[0]["status"], "booked")
+        response = self.client.get(
+            "/api/events", headers=self._get_auth_headers(self.user2)
+        )
+        self.assertEqual(response.json()[0]["numberBooked"], 1)
+        self.assertEqual(response.json()[0]["status"], "not_booked")
+
+    def test_get_events_reflects_edits_and_deletes(self):
+        self.client.get("/api/events")
+        self.event.name = "Renamed"
+        self.event.save()
+        self.assertEqual(self.client.get("/api/events").json()[0]["name"], "Renamed")
+        self.event.delete()
+        self.assertEqual(self.client.get("/api/events").json(), [])
+
+    def test_one_ticket_per_user_and_event_is_enforced(self):
+        from django.db import IntegrityError, transaction
+
+        Ticket.objects.create(user=self.user, event=self.event)
+        with self.assertRaises(IntegrityError), transaction.atomic():
+            Ticket.objects.create(user=self.user, event=self.event)
+        # Printed tickets are all held by the same placeholder user
+        Ticket.objects.create(user=self.user2, event=self.event, issued_in_bulk=True)
+        Ticket.objects.create(user=self.user2, event=self.event, issued_in_bulk=True)
+
+    def test_book_event_twice_keeps_counter(self):
+        headers = self._get_auth_headers(self.user)
+        self.client.post(f"/api/events/acquire-ticket/{self.event.id}", headers=headers)
+        response = self.client.post(
+            f"/api/events/acquire-ticket/{self.event.id}", headers=headers
+        )
+        self.assertEqual(response.json(), "You have already booked this event")
+        self.event.refresh_from_db()
+        self.assertEqual(self.event.number_booked, 1)
+
+    def test_book_event_returns_updated_event(self):
+        response = self.client.post(
+            f"/api/events/acquire-ticket/{self.event.id}",
+            headers=self._get_auth_headers(self.user),
+        )
+        self.assertEqual(response.json()["numberBooked"], 1)
+        self.assertEqual(response.json()["status"], "booked")
+
+    def test_book_nonexistent_event(self):
+        response = self.client.post(
+            "/api/events/acquire-ticket/999999",
+            headers=self._get_auth_headers(self.user),
+        )
+        self.assertEqual(response.status_code, 404)
+
+    def _enable_waiting_room(self, rate: float) -> None:
+        self.event.release_time = timezone.now() - datetime.timedelta(minutes=1)
+        self.event.admission_rate = rate
+        self.event.save()
+
+    def test_waiting_room_admits_first_in_line(self):
+        # One student per 1000 seconds, only the first one in line is admitted now
+        self._enable_waiting_room(0.001)
+        headers = self._get_auth_headers(self.user)
+        response = self.client.get(
+            f"/api/events/queue/{self.event.id}", headers=headers
+        )
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.json()["position"], 0)
+        self.assertTrue(response.json()["admitted"])
+        response = self.client.post(
+            f"/api/events/acquire-ticket/{self.event.id}", headers=headers
+        )
+        self.assertEqual(response.status_code, 200)
+
+    def test_waiting_room_turns_away_until_admitted(self):
+        self._enable_waiting_room(0.001)
+        self.client.get(
+            f"/api/events/queue/{self.event.id}",
+            headers=self._get_auth_headers(self.user),
+        )
+        headers = self._get_auth_headers(self.user2)
+        response = self.client.get(
+            f"/api/events/queue/{self.event.id}", headers=headers
+        )
+        self.assertEqual(response.json()["position"], 1)
+        self.assertEqual(response.json()["ahead"], 0)
+        self.assertFalse(response.json()["admitted"])
+        # Turned away without touching the database, keeping the place in the queue
+        with self.assertNumQueries(0):
+            response = self.client.post(
+                f"/api/events/acquire-ticket/{self.event.id}", headers=headers
+            )
+        self.assertEqual(response.status_code, 429)
+        self.assertEqual(response.json()["position"], 1)
+        self.event.refresh_from_db()
+        self.assertEqual(self.event.number_booked, 0)
+
+    def test_waiting_room_admits_at_rate(self):
+        self._enable_waiting_room(1000)
+        for user in (self.user, self.user2):
+            response = self.client.get(
+                f"/api/events/queue/{self.event.id}",
+                headers=self._get_auth_headers(user),
+            )
+            self.assertTrue(response.json()["admitted"])
+
+    def test_waiting_room_before_release(self):
+        self._enable_waiting_room(1)
+        self.event.release_time = timezone.now() + datetime.timedelta(days=1)
+        self.event.save()
+        response = self.client.get(
+            f"/api/events/queue/{self.event.id}",
+            headers=self._get_auth_headers(self.user),
+        )
+        self.assertEqual(response.status_code, 409)
+
+    def test_event_without_waiting_room(self):
+        response = self.client.get(
+            f"/api/events/queue/{self.event.id}",
+            headers=self._get_auth_headers(self.user),
+        )
+        self.assertEqual(response.status_code, 404)
+
+    def _fill_event(self) -> None:
+        """Books the only seat of the event for self.user."""
+        self.event.capacity = 1
+        self.event.number_booked = 1
+        self.event.save()
+        Ticket.objects.create(user=self.user, event=self.event)
+
+    def test_join_waitlist(self):
+        self._fill_event()
+        headers = self._get_auth_headers(self.user2)
+        response = self.client.post(
+            f"/api/events/waitlist/{self.event.id}", headers=headers
+        )
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.json()["position"], 1)
+        # Joining again keeps the place
+        response = self.client.post(
+            f"/api/events/waitlist/{self.event.id}", headers=headers
+        )
+        self.assertEqual(response.json()["position"], 1)
+        self.assertEqual(Waitlist.objects.filter(event=self.event).count(), 1)
+
+    def test_join_waitlist_checks_capacity_under_the_unbook_lock(self):
+        self._fill_event()
+        with CaptureQueriesContext(connection) as queries:
+            self.client.post(
+                f"/api/events/waitlist/{self.event.id}",
+                headers=self._get_auth_headers(self.user2),
+            )
+        event_table = Event._meta.db_table
+        self.assertTrue(
+            any(
+                f'FROM "{event_table}"' in query["sql"] and "FOR UPDATE" in query["sql"]
+                for query in queries
+            )
+        )
+
+    def test_join_waitlist_of_bookable_event(self):
+        response = self.client.post(
+            f"/api/events/waitlist/{self.event.id}",
+            headers=self._get_auth_headers(self.user),
+        )
+        self.assertEqual(response.status_code, 409)
+        self.assertEqual(response.json(), "Event is not fully booked")
+
+    def test_waitlist_is_first_come_first_served(self):
+        self._fill_event()
+        third_user = User.objects.create_user(username="testuser3", password="p")
+        for user in (self.user2, third_user):
+            self.client.post(
+                f"/api/events/waitlist/{self.event.id}",
+                headers=self._get_auth_headers(user),
+            )
+        response = self.client.get(
+            f"/api/events/waitlist/{self.event.id}",
+            headers=self._get_auth_headers(third_user),
+        )
+        self.assertEqual(response.json()["position"], 2)
+
+        with (
+            patch("event_booking.api.notify_event_waitlist_promoted.delay") as notify,
+            self.captureOnCommitCallbacks(execute=True),
+        ):
+            response = self.client.post(
+                f"/api/events/remove-ticket/{self.event.id}",
+                headers=self._get_auth_headers(self.user),
+            )
+        self.assertEqual(response.status_code, 200)
+
+        promoted: Ticket = Ticket.objects.get(event=self.event)
+        self.assertEqual(promoted.user, self.user2)
+        notify.assert_called_once_with(str(promoted.uuid))
+        self.event.refresh_from_db()
+        self.assertEqual(self.event.number_booked, 1)
+        response = self.client.get(
+            f"/api/events/waitlist/{self.event.id}",
+            headers=self._get_auth_headers(third_user),
+        )
+        self.assertEqual(response.json()["position"], 1)
+
+    def test_book_after_joining_waitlist(self):
+        self._fill_event()
+        third_user = User.objects.create_user(username="testuser3", password="p")
+        for user in (self.user2, third_user):
+            self.client.post(
+                f"/api/events/waitlist/{self.event.id}",
+                headers=self._get_auth_headers(user),
+            )
+        # A seat is added and taken directly by the first student on the waitlist
+        self.event.capacity = 2
+        self.event.save()
+        response = self.client.post(
+            f"/api/events/acquire-ticket/{self.event.id}",
+            headers=self._get_auth_headers(self.user2),
+        )
+        self.assertEqual(response.status_code, 200)
+        self.assertFalse(
+            Waitlist.objects.filter(event=self.event, user=self.user2).exists()
+        )
+        response = self.client.get(
+            f"/api/events/waitlist/{self.event.id}",
+            headers=self._get_auth_headers(third_user),
+        )
+        self.assertEqual(response.json()["position"], 1)
+
+        # Entries of students who hold a ticket do not count towards the position
+        Waitlist.objects.create(event=self.event, user=self.user)
+        Waitlist.objects.filter(user=self.user).update(
+            joined_at=timezone.now() - datetime.timedelta(days=1)
+        )
+        self.assertEqual(
+            Waitlist.objects.get(event=self.event, user=third_user).position(), 1
+        )
+
+    def test_leave_waitlist(self):
+        self._fill_event()
+        headers = self._get_auth_headers(self.user2)
+        self.client.post(f"/api/events/waitlist/{self.event.id}", headers=headers)
+        response = self.client.delete(
+            f"/api/events/waitlist/{self.event.id}", headers=headers
+        )
+        self.assertEqual(response.status_code, 200)
+        response = self.client.get(
+            f"/api/events/waitlist/{self.event.id}", headers=headers
+        )
+        self.assertEqual(response.status_code, 404)
+
+        # Nobody left to promote, the seat is freed
+        self.client.post(
+            f"/api/events/remove-ticket/{self.event.id}",
+            headers=self._get_auth_headers(self.user),
+        )
+        self.event.refresh_from_db()
+        self.assertEqual(self.event.number_booked, 0)
+
+    def test_get_ticket_returns_signed_token(self):
+        ticket = Ticket.objects.create(user=self.user, event=self.event)
+        response = self.client.get(
+            f"/api/events/get-ticket/{self.event.id}",
+            headers=self._get_auth_headers(self.user),
+        )
+        self.assertEqual(response.status_code, 200)
+        claims = verify_ticket_token(response.json()["token"])
+        self.assertEqual(claims.ticket_uuid, ticket.uuid)
+        self.assertEqual(claims.event_id, self.event.id)
+        self.assertEqual(claims.user_id, self.user.id)
+        self.assertGreater(claims.expires_at, self.event.end_time)
+
+    def test_get_ticket_of_an_ended_event(self):
+        Ticket.objects.create(user=self.user, event=self.event)
+        self.event.end_time = timezone.now() - VALID_AFTER_EVENT_END
+        self.event.save()
+        response = self.client.get(
+            f"/api/events/get-ticket/{self.event.id}",
+            headers=self._get_auth_headers(self.user),
+        )
+        self.assertEqual(response.status_code, 409)
+        self.assertEqual(response.json(), "Event already ended")
+
+    def test_ticket_token_is_not_a_login(self):
+        ticket = Ticket.objects.create(user=self.user, event=self.event)
+        response = self.client.get(
+            "/api/events/booked-events",
+            headers={"Authorization": f"Bearer {issue_ticket_token(ticket)}"},
+        )
+        self.assertEqual(response.status_code, 401)
+        with self.assertRaises(jwt.InvalidTokenError):
+            verify_ticket_token(self.user.create_jwt_token().removeprefix("Bearer "))
+
+    def test_use_tickets_reports_conflicts(self):
+        ticket = Ticket.objects.create(user=self.user, event=self.event)
+        used_elsewhere = Ticket.objects.create(
+            user=self.user2, event=self.event, used=True
+        )
+        unknown = uuid4()
+        # The staff user lookup, the update and the conflict lookup
+        with self.assertNumQueries(3):
+            response = self.client.post(
+                "/api/events/use-tickets",
+                data={
+                    "event_id": self.event.id,
+                    "uuids": [str(ticket.uuid), str(used_elsewhere.uuid), str(unknown)],
+                },
+                content_type="application/json",
+                headers=self._get_auth_headers(self.staff_user),
+            )
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(
+            response.json(),
+            {
+                "used": [str(ticket.uuid)],
+                "conflicts": [str(used_elsewhere.uuid)],
+                "notFound": [str(unknown)],
+            },
+        )
+        ticket.refresh_from_db()
+        self.assertTrue(ticket.used)
+
+    def test_use_tickets_for_other_event_and_non_staff(self):
+        ticket = Ticket.objects.create(user=self.user, event=self.event)
+        data = {"event_id": self.event.id + 1, "uuids": [str(ticket.uuid)]}
+        response = self.client.post(
+            "/api/events/use-tickets",
+            data=data,
+            content_type="application/json",
+            headers=self._get_auth_headers(self.user),
+        )
+        self.assertEqual(response.status_code, 401)
+        response = self.client.post(
+            "/api/events/use-tickets",
+            data=data,
+            content_type="application/json",
+            headers=self._get_auth_headers(self.staff_user),
+        )
+        self.assertEqual(response.json()["notFound"], [str(ticket.uuid)])
+        ticket.refresh_from_db()
+        self.assertFalse(ticket.used)
+
+    def test_event_manifest(self):
+        self.user.food_preferences = "Vegan"
+        self.user.save()
+        ticket = Ticket.objects.create(user=self.user, event=self.event, used=True)
+        url = f"/api/events/{self.event.id}/manifest"
+        headers = self._get_auth_headers(self.staff_user)
+
+        self.assertEqual(
+            self.client.get(url, headers=self._get_auth_headers(self.user)).status_code,
+            401,
+        )
+        response = self.client.get(url, headers=headers)
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(
+            response.json(),
+            {
+                "eventId": self.event.id,
+                "tickets": [
+                    {
+                        "uuid": str(ticket.uuid),
+                        "name": "test test",
+                        "foodPreferences": "Vegan",
+                        "used": True,
+                    }
+                ],
+            },
+        )
+
+        # Unchanged, the scanner keeps its copy
+        response = self.client.get(
+            url, headers={**headers, "If-None-Match": response["ETag"]}
+        )
+        self.assertEqual(response.status_code, 304)
+
+    def test_event_manifest_msgpack_gzip(self):
+        Ticket.objects.create(user=self.user, event=self.event)
+        response = self.client.get(
+            f"/api/events/{self.event.id}/manifest",
+            headers={
+                **self._get_auth_headers(self.staff_user),
+                "Accept": "application/msgpack",
+                "Accept-Encoding": "gzip",
+            },
+        )
+        self.assertEqual(response["Content-Type"], "application/msgpack")
+        self.assertEqual(response["Content-Encoding"], "gzip")
+        manifest = msgpack.unpackb(gzip.decompress(response.content))
+        self.assertEqual(len(manifest["tickets"]), 1)
+        self.assertFalse(manifest["tickets"][0]["used"])
+
+
+class LunchTicketSheetsTestCase(TestCase):
+    def setUp(self):
+        self.superuser = User.objects.create_superuser(
+            username="admin", password="password"
+        )
+        self.client.force_login(self.superuser)
+        self.data = {
+            "username": "lunch",
+            "time_start": "2030-11-01T12:00",
+            "duration": 60,
+            "amount": 13,
+        }
+
+    def _zip_names(self, content: bytes) -> list[str]:
+        with zipfile.ZipFile(io.BytesIO(content)) as zip_file:
+            for name in zip_file.namelist():
+                self.assertTrue(zip_file.read(name).startswith(b"%PDF"))
+            return zip_file.namelist()
+
+    def test_create_lunch_event_streams_ticket_sheets(self):
+        with (
+            patch("notifications.tasks.schedule_ticket_reminders.delay") as schedule,
+            self.captureOnCommitCallbacks(execute=True),
+        ):
+            response = self.client.post(
+                reverse("admin:create_lunch_event"), data=self.data
+            )
+        self.assertEqual(response.status_code, 200)
+        self.assertTrue(response.streaming)
+        self.assertEqual(
+            self._zip_names(b"".join(response.streaming_content)),
+            ["tickets_page_1.pdf", "tickets_page_2.pdf"],
+        )
+        event = Event.objects.get(type="lu")
+        self.assertEqual(event.tickets.filter(issued_in_bulk=True).count(), 13)
+        # Printed tickets get no reminders
+        schedule.assert_not_called()
+
+    def test_large_batches_are_rendered_in_the_background(self):
+        with (
+            patch("event_booking.views.MAX_TICKETS_IN_REQUEST", 10),
+            patch("event_booking.tasks.render_ticket_sheets.delay") as render,
+            self.captureOnCommitCallbacks(execute=True),
+        ):
+            response = self.client.post(
+                reverse("admin:create_lunch_event"), data=self.data
+            )
+        event = Event.objects.get(type="lu")
+        download_url = reverse("admin:lunch_event_tickets", args=[event.id])
+        self.assertRedirects(response, download_url)
+        render.assert_called_once_with(event.id, "small")
+
+        with (
+            tempfile.TemporaryDirectory() as directory,
+            patch("event_booking.ticket_sheets.LUNCH_TICKETS_DIR", Path(directory)),
+        ):
+            self.assertContains(self.client.get(download_url), "being generated")
+            render_ticket_sheets(event.id, "small")
+            response = self.client.get(download_url)
+            self.assertEqual(response["Content-Type"], "application/zip")
+            self.assertEqual(
+                len(self._zip_names(b"".join(response.streaming_content))), 2
+            )
+
+    def test_render_pages_in_process_pool(self):
+        event = Event.objects.create(
+            name="Lunch",
+            type="lu",
+            start_time=timezone.now(),
+            end_time=timezone.now() + datetime.timedelta(hours=1),
+            capacity=30,
+        )
+        tickets = issue_printed_tickets(event, "lunch", 30)
+        with (
+            patch("event_booking.ticket_sheets.MIN_PAGES_FOR_PROCESS_POOL", 1),
+            patch("event_booking.ticket_sheets.RENDER_PROCESSES", 2),
+        ):
+            pages = list(render_pages(tickets, event, SMALL_TICKETS))
+        self.assertEqual(len(pages), 3)
+        self.assertTrue(all(page.startswith(b"%PDF") for page in pages))
+
+    def test_render_ticket_sheets_in_daemonic_worker(self):
+        event = Event.objects.create(
+            name="Lunch",
+            type="lu",
+            start_time=timezone.now(),
+            end_time=timezone.now() + datetime.timedelta(hours=1),
+            capacity=30,
+        )
+        issue_printed_tickets(event, "lunch", 30)
+
+        def render(errors: billiard.Queue) -> None:
+            # The forked child borrows the test transaction while the test waits for it
+            try:
+                render_ticket_sheets(event.id, "small")
+                errors.put(None)
+            except BaseException as e:
+                errors.put(repr(e))
+
+        with (
+            tempfile.TemporaryDirectory() as directory,
+            patch("event_booking.ticket_sheets.LUNCH_TICKETS_DIR", Path(directory)),
+            patch("event_booking.ticket_sheets.MIN_PAGES_FOR_PROCESS_POOL", 1),
+            patch("event_booking.ticket_sheets.RENDER_PROCESSES", 2),
+        ):
+            # Like the prefork pool of `celery worker`
+            errors = billiard.Queue()
+            worker = billiard.Process(target=render, args=(errors,), daemon=True)
+            worker.start()
+            self.assertIsNone(errors.get(timeout=60))
+            worker.join()
+            with zipfile.ZipFile(Path(directory) / f"event_{event.id}.zip") as sheets:
+                self.assertEqual(len(sheets.namelist()), 3)
+
+
+class EventRescheduleTestCase(TestCase):
+    def setUp(self):
+        self.start_time = timezone.now() + datetime.timedelta(days=30)
+        self.event = Event.objects.create(
+            name="Moved Event",
+            start_time=self.start_time,
+            end_time=self.start_time + datetime.timedelta(hours=2),
+            capacity=100,
+        )
+
+    def _book(self, amount: int) -> list[Ticket]:
+        booked = self.event.tickets.count()
+        tickets = [
+            Ticket.objects.create(
+                user=User.objects.create_user(username=f"moved{i}", password="p"),
+                event=self.event,
+            )
+            for i in range(booked, booked + amount)
+        ]
+        Ticket.schedule_notifications_in_bulk(tickets)
+        return tickets
+
+    def _move_event(self) -> None:
+        self.event.start_time += datetime.timedelta(days=1)
+        self.event.end_time += datetime.timedelta(days=1)
+        with self.captureOnCommitCallbacks(execute=True):
+            self.event.save()
+
+    def test_moving_event_reschedules_tickets_in_bulk(self):
+        tickets = self._book(3)
+        old_tasks = set(ScheduledCeleryTasks.objects.values_list("id", flat=True))
+        self.assertEqual(len(old_tasks), 9)
+
+        with patch("arkad.celery.app.control.revoke") as revoke:
+            self._move_event()
+        # One broadcast for all reminders
+        revoke.assert_called_once()
+        self.assertEqual(len(revoke.call_args.args[0]), 9)
+        self.assertFalse(
+            ScheduledCeleryTasks.objects.filter(
+                id__in=old_tasks, revoked=False
+            ).exists()
+        )
+
+        for ticket in tickets:
+            ticket.refresh_from_db()
+            self.assertNotIn(ticket.notify_event_tomorrow_id, old_tasks)
+            self.assertEqual(
+                ticket.notify_event_tomorrow.eta,
+                self.event.start_time - datetime.timedelta(hours=24),
+            )
+
+    def test_rolled_back_move_keeps_the_reminders(self):
+        self._book(3)
+        old_tasks = set(ScheduledCeleryTasks.objects.values_list("id", flat=True))
+        with (
+            patch("arkad.celery.app.control.revoke") as revoke,
+            self.captureOnCommitCallbacks(execute=True),
+        ):
+            try:
+                with transaction.atomic():
+                    self.event.start_time += datetime.timedelta(days=1)
+                    self.event.end_time += datetime.timedelta(days=1)
+                    self.event.save()
+                    raise IntegrityError
+            except IntegrityError:
+                pass
+        revoke.assert_not_called()
+        self.assertEqual(
+            set(
+                ScheduledCeleryTasks.objects.filter(revoked=False).values_list(
+                    "id", flat=True
+                )
+            ),
+            old_tasks,
+        )
+
+    def test_saving_event_does_not_fetch_old_times(self):
+        event = Event.objects.get(id=self.event.id)
+        event.name = "Renamed Event"
+        with self.assertNumQueries(1):  # Only the UPDATE
+            event.save()
+
+    def test_counter_saves_skip_rescheduling(self):
+        self._book(1)
+        event = Event.objects.get(id=self.event.id)
+        with patch.object(Event, "reschedule_ticket_notifications_on_commit") as later:
+            event.number_booked += 1
+            event.save(update_fields=["number_booked"])
+            later.assert_not_called()
+
+            event.start_time += datetime.timedelta(days=1)
+            event.save()
+            later.assert_called_once()
+            self.assertEqual(event.changed_fields(), set())
+
+    def test_query_count_does_not_grow_with_tickets(self):
+        def queries_to_reschedule() -> int:
+            with CaptureQueriesContext(connection) as queries:
+                self.event.reschedule_ticket_notifications()
+            return len(queries)
+
+        self._book(2)
+        few = queries_to_reschedule()
+        self._book(20)[0].delete()  # Tickets without reminders are handled too
+        self.assertEqual(queries_to_reschedule(), few)
+
+    def test_background_reschedule_does_not_lock_the_event_row(self):
+        self._book(2)
+        with CaptureQueriesContext(connection) as queries:
+            reschedule_event_reminders(self.event.id)
+        sql = [query["sql"] for query in queries]
+        self.assertTrue(any("pg_advisory_xact_lock" in query for query in sql))
+        self.assertFalse(any("FOR UPDATE" in query for query in sql))
+
+    def test_large_events_are_rescheduled_in_the_background(self):
+        self._book(3)
+        with (
+            patch("event_booking.models.RESCHEDULE_IN_BACKGROUND_FROM", 3),
+            patch("notifications.tasks.reschedule_event_reminders.delay") as later,
+            self.captureOnCommitCallbacks(execute=True),
+        ):
+            self.event.revoke_and_reschedule_tasks()
+        later.assert_called_once_with(self.event.id)
+        self.assertEqual(ScheduledCeleryTasks.objects.filter(revoked=True).count(), 0)
+
+        reschedule_event_reminders(self.event.id)
+        self.assertEqual(ScheduledCeleryTasks.objects.filter(revoked=True).count(), 9)
+        self.assertEqual(ScheduledCeleryTasks.objects.filter(revoked=False).count(), 9)
+
+
+class EventCapacityUpdatesTestCase(TestCase):
+    def setUp(self):
+        self.event = Event.objects.create(
+            name="Popular Event",
+            location="Hall",
+            release_time=timezone.now() - datetime.timedelta(minutes=1),
+            start_time=timezone.now() + datetime.timedelta(days=9),
+            end_time=timezone.now() + datetime.timedelta(days=10),
+            visible_time=timezone.now() - datetime.timedelta(days=1),
+            capacity=10,
+        )
+        # A publish may be left pending under the same event id by an earlier test run
+        cache.delete(_pending_key(self.event.id))
+        self.users = [
+            User.objects.create_user(username=f"booker{i}", password="p")
+            for i in range(3)
+        ]
+
+    def _book(self, user) -> None:
+        response = self.client.post(
+            f"/api/events/acquire-ticket/{self.event.id}",
+            headers={"Authorization": user.create_jwt_token()},
+        )
+        self.assertEqual(response.status_code, 200)
+
+    def test_changes_are_coalesced(self):
+        with patch("event_booking.tasks.publish_event_capacity.apply_async") as publish:
+            with self.captureOnCommitCallbacks(execute=True):
+                self._book(self.users[0])
+            with self.captureOnCommitCallbacks(execute=True):
+                self._book(self.users[1])
+            publish.assert_called_once_with(
+                (self.event.id,), countdown=COALESCE_SECONDS
+            )
+
+            # Changes after the publish read the counter are published again
+            publish_capacity(self.event.id)
+            with self.captureOnCommitCallbacks(execute=True):
+                self.client.post(
+                    f"/api/events/remove-ticket/{self.event.id}",
+                    headers={"Authorization": self.users[0].create_jwt_token()},
+                )
+            self.assertEqual(publish.call_count, 2)
+
+    async def test_consumer_receives_updates(self):
+        communicator = WebsocketCommunicator(
+            EventCapacityConsumer.as_asgi(), "/ws/events/"
+        )
+        communicator.scope["user"] = self.users[0]
+        connected, _ = await communicator.connect()
+        self.assertTrue(connected)
+
+        await Event.objects.filter(id=self.event.id).aupdate(number_booked=4)
+        await sync_to_async(publish_capacity)(self.event.id)
+        self.assertEqual(
+            await communicator.receive_json_from(),
+            {
+                "type": "capacity",
+                "event_id": self.event.id,
+                "number_booked": 4,
+                "capacity": 10,
+            },
+        )
+        await communicator.disconnect()
@@ -0,0 +1,218 @@
+"""
+Printable ticket sheets for events handed out on paper, such as lunch tickets.
+
+The tickets are created with one bulk insert (they belong to a placeholder user and need no
+reminders, so skipping the post_save signals is intended). Every ticket gets a QR code of its
+uuid which is drawn as vector graphics, so nothing touches the disk. Pages are rendered in a
+process pool once there are enough of them (serially inside a Celery worker, whose prefork
+processes are daemonic and may not have children), and the PDFs (one per page) are streamed
+as a zip.
+
+Large batches take longer than a web request may, those are rendered by the Celery task
+render_ticket_sheets into LUNCH_TICKETS_DIR and downloaded from the admin once ready.
+"""
+
+import datetime
+import io
+import multiprocessing
+import os
+import zipfile
+from concurrent.futures import ProcessPoolExecutor
+from pathlib import Path
+from typing import Iterable, Iterator, NamedTuple
+
+from reportlab.graphics import renderPDF
+from reportlab.graphics.barcode.qr import QrCodeWidget
+from reportlab.graphics.shapes import Drawing
+from reportlab.lib.pagesizes import A4
+from reportlab.pdfgen import canvas
+
+from arkad.settings import BASE_DIR, make_local_time
+from event_booking.models import Event, Ticket
+from user_models.models import User
+
+# Not in media, which is served publicly
+LUNCH_TICKETS_DIR: Path = BASE_DIR / "private" / "lunch_tickets"
+# Larger batches are rendered in the background instead of in the request
+MAX_TICKETS_IN_REQUEST: int = 240
+# Below this the process pool costs more than it saves
+MIN_PAGES_FOR_PROCESS_POOL: int = 8
+RENDER_PROCESSES: int = min(4, os.cpu_count() or 1)
+
+
+class SheetLayout(NamedTuple):
+    columns: int
+    rows: int
+    title_size: int
+    text_size: int
+    qr_size: float
+    margin: float  # From the top left corner of each ticket
+
+    @property
+    def tickets_per_page(self) -> int:
+        return self.columns * self.rows
+
+
+SMALL_TICKETS = SheetLayout(
+    columns=3, rows=4, title_size=12, text_size=10, qr_size=100, margin=20
+)
+LARGE_TICKETS = SheetLayout(
+    columns=2, rows=2, title_size=16, text_size=12, qr_size=150, margin=40
+)
+LAYOUTS: dict[str, SheetLayout] = {"small": SMALL_TICKETS, "large": LARGE_TICKETS}
+
+
+def issue_printed_tickets(event: Event, username: str, amount: int) -> list[Ticket]:
+    """Creates `amount` tickets to the event held by the placeholder user `username`."""
+    user, created = User.objects.get_or_create(
+        username=username, defaults={"email": f"{username}@fake-user.com"}
+    )
+    if created:
+        user.set_unusable_password()
+        user.save()
+    return Ticket.objects.bulk_create(
+        (Ticket(user=user, event=event, issued_in_bulk=True) for _ in range(amount)),
+        batch_size=1000,
+    )
+
+
+def _draw_qr_code(
+    c: canvas.Canvas, value: str, x: float, y: float, size: float
+) -> None:
+    widget = QrCodeWidget(value)
+    x1, y1, x2, y2 = widget.getBounds()
+    drawing = Drawing(
+        size, size, transform=[size / (x2 - x1), 0, 0, size / (y2 - y1), 0, 0]
+    )
+    drawing.add(widget)
+    renderPDF.draw(drawing, c, x, y)
+
+
+def render_page(
+    ticket_uuids: list[str], title: str, lines: list[str], layout: SheetLayout
+) -> bytes:
+    """Renders one PDF page with up to layout.tickets_per_page tickets."""
+    buffer = io.BytesIO()
+    c = canvas.Canvas(buffer, pagesize=A4)
+    width, height = A4
+    cell_width: float = width / layout.columns
+    cell_height: float = height / layout.rows
+
+    for i, ticket_uuid in enumerate(ticket_uuids):
+        row, col = divmod(i, layout.columns)
+        left: float = col * cell_width + layout.margin
+        top: float = (layout.rows - row) * cell_height - layout.margin
+
+        c.setFont("Helvetica-Bold", layout.title_size)
+        c.drawString(left, top - 10, title)
+        c.setFont("Helvetica", layout.text_size)
+        for j, line in enumerate(lines):
+            c.drawString(left, top - 30 - 20 * j, line)
+        _draw_qr_code(
+            c,
+            ticket_uuid,
+            left,
+            top - 30 - 20 * len(lines) - layout.qr_size,
+            layout.qr_size,
+        )
+
+    c.save()
+    return buffer.getvalue()
+
+
+def _render_page_args(args: tuple[list[str], str, list[str], SheetLayout]) -> bytes:
+    return render_page(*args)
+
+
+def render_pages(
+    tickets: list[Ticket], event: Event, layout: SheetLayout
+) -> Iterator[bytes]:
+    """
+    Renders the ticket sheets page by page, in a process pool for larger batches unless
+    already in a daemonic process.
+    """
+    lines: list[str] = [
+        f"Start: {make_local_time(event.start_time).strftime('%Y-%m-%d %H:%M')}",
+        f"End: {make_local_time(event.end_time).strftime('%Y-%m-%d %H:%M')}",
+    ]
+    n: int = layout.tickets_per_page
+    pages: list[tuple[list[str], str, list[str], SheetLayout]] = [
+        ([str(t.uuid) for t in tickets[i : i + n]], "Lunch Ticket", lines, layout)
+        for i in range(0, len(tickets), n)
+    ]
+    if (
+        len(pages) < MIN_PAGES_FOR_PROCESS_POOL
+        or RENDER_PROCESSES == 1
+        # Daemonic processes, such as the Celery prefork workers, may not have children
+        or multiprocessing.current_process().daemon
+    ):
+        yield from map(_render_page_args, pages)
+        return
+    with ProcessPoolExecutor(max_workers=RENDER_PROCESSES) as executor:
+        # map keeps the page order and renders ahead while earlier pages are consumed
+        yield from executor.map(_render_page_args, pages)
+
+
+class _ZipStream(io.RawIOBase):
+    """Write only file which collects what zipfile writes, so it can be yielded in parts."""
+
+    def __init__(self) -> None:
+        super().__init__()
+        self.chunks: list[bytes] = []
+
+    def writable(self) -> bool:
+        return True
+
+    def write(self, b: bytes) -> int:  # type: ignore[override]
+        self.chunks.append(bytes(b))
+        return len(b)
+
+    def drain(self) -> bytes:
+        data: bytes = b"".join(self.chunks)
+        self.chunks.clear()
+        return data
+
+
+def stream_zip(files: Iterable[tuple[str, bytes]]) -> Iterator[bytes]:
+    """Zips (name, content) pairs, yielding the archive while the files are produced."""
+    stream = _ZipStream()
+    # The stream can not seek, so zipfile writes the sizes after each file instead
+    with zipfile.ZipFile(stream, "w", zipfile.ZIP_DEFLATED) as zip_file:
+        for name, content in files:
+            zip_file.writestr(name, content)
+            yield stream.drain()
+    yield stream.drain()
+
+
+def ticket_sheets_zip(
+    tickets: list[Ticket], event: Event, layout: SheetLayout
+) -> Iterator[bytes]:
+    """The ticket sheets as a streamed zip of tickets_page_<n>.pdf files."""
+    return stream_zip(
+        (f"tickets_page_{n}.pdf", pdf)
+        for n, pdf in enumerate(render_pages(tickets, event, layout), start=1)
+    )
+
+
+def ticket_sheets_path(event_id: int) -> Path:
+    """Where render_ticket_sheets stores the zip of the event."""
+    return LUNCH_TICKETS_DIR / f"event_{event_id}.zip"
+
+
+def write_ticket_sheets(event: Event, layout: SheetLayout) -> Path:
+    """Renders the sheets of every ticket to the event to ticket_sheets_path."""
+    tickets: list[Ticket] = list(event.tickets.order_by("uuid"))
+    path: Path = ticket_sheets_path(event.id)
+    path.parent.mkdir(parents=True, exist_ok=True)
+    partial_path: Path = path.with_suffix(".zip.part")
+    with open(partial_path, "wb") as f:
+        for chunk in ticket_sheets_zip(tickets, event, layout):
+            f.write(chunk)
+    # Only complete files are ever offered for download
+    os.replace(partial_path, path)
+    return path
+
+
+def ticket_sheets_filename(event: Event) -> str:
+    local_start: datetime.datetime = make_local_time(event.start_time)
+    return f"{event.name.replace(' ', '_')}_{local_start.strftime('%Y%m%d_%H%M')}.zip"
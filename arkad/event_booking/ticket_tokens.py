@@ -0,0 +1,70 @@
+"""
+Signed ticket tokens, so door scanners can check tickets without a connection.
+
+The QR code of a ticket holds a JWT signed with the same keys as the bearer tokens. Scanners
+verify it against the public keys from .well-known/jwks.json, check that it is for the event
+being scanned and that it has not expired, and queue the uuid. The queue is uploaded to
+POST /events/use-tickets, which reports tickets already used on another device as conflicts.
+
+The claims are kept short to keep the QR code small. The user is deliberately not stored in a
+`user_id` claim, the bearer authentication would otherwise accept the token as a login.
+"""
+
+import datetime
+import math
+import uuid
+from typing import Any, NamedTuple
+
+import jwt
+from django.utils import timezone
+
+from arkad.jwt_utils import jwt_decode, jwt_encode
+from event_booking.models import Ticket
+
+TICKET_TOKEN_TYPE: str = "ticket"
+# Tokens stay valid for a while after the event ends, for late scans and uploads
+VALID_AFTER_EVENT_END: datetime.timedelta = datetime.timedelta(hours=12)
+
+
+class TicketClaims(NamedTuple):
+    ticket_uuid: uuid.UUID
+    event_id: int
+    user_id: int
+    expires_at: datetime.datetime
+
+
+def issue_ticket_token(ticket: Ticket) -> str | None:
+    """
+    Returns the signed token for the QR code of the ticket, the event must be loaded.
+    None once the event is over and a token would no longer be valid.
+    """
+    valid_for: datetime.timedelta = (
+        ticket.event.end_time + VALID_AFTER_EVENT_END - timezone.now()
+    )
+    if valid_for <= datetime.timedelta(0):
+        return None
+    return jwt_encode(
+        {
+            "typ": TICKET_TOKEN_TYPE,
+            "tid": str(ticket.uuid),
+            "eid": ticket.event_id,
+            "uid": ticket.user_id,
+        },
+        expiry_minutes=math.ceil(valid_for.total_seconds() / 60),
+    )
+
+
+def verify_ticket_token(token: str) -> TicketClaims:
+    """Raises jwt.InvalidTokenError unless the token is a valid, unexpired ticket token."""
+    claims: dict[str, Any] = jwt_decode(token)
+    if claims.get("typ") != TICKET_TOKEN_TYPE:
+        raise jwt.InvalidTokenError("Not a ticket token")
+    try:
+        return TicketClaims(
+            ticket_uuid=uuid.UUID(claims["tid"]),
+            event_id=int(claims["eid"]),
+            user_id=int(claims["uid"]),
+            expires_at=datetime.datetime.fromtimestamp(claims["exp"], tz=datetime.UTC),
+        )
+    except (KeyError, TypeError, ValueError) as e:
+        raise jwt.InvalidTokenError("Malformed ticket token") from e
@@ -7,4 +7,9 @@ urlpatterns = [
     path(
         "create_lunch_event/", views.create_lunch_event_view, name="create_lunch_event"
     ),
+    path(
+        "create_lunch_event/<int:event_id>/tickets/",
+        views.lunch_event_tickets_view,
+        name="lunch_event_tickets",
+    ),
 ]
@@ -1,24 +1,33 @@
-import os
-import shutil
-import zipfile
 from datetime import timedelta
-from io import BytesIO
+from functools import partial
 
 import pytz
-import qrcode
 from django.contrib.admin.views.decorators import staff_member_required
-from django.http import HttpResponse, HttpRequest
-from django.shortcuts import render
-from reportlab.lib.pagesizes import A4
-from reportlab.pdfgen import canvas
+from django.db import transaction
+from django.http import (
+    FileResponse,
+    HttpRequest,
+    HttpResponse,
+    StreamingHttpResponse,
+)
+from django.http.response import HttpResponseBase
+from django.shortcuts import get_object_or_404, redirect, render
 
 from .forms import CreateLunchEventForm
-from .models import Event, Ticket
-from user_models.models import User
+from .models import Event
+from .tasks import render_ticket_sheets
+from .ticket_sheets import (
+    MAX_TICKETS_IN_REQUEST,
+    SMALL_TICKETS,
+    issue_printed_tickets,
+    ticket_sheets_filename,
+    ticket_sheets_path,
+    ticket_sheets_zip,
+)
 
 
 @staff_member_required
-def create_lunch_event_view(request: HttpRequest) -> HttpResponse:
+def create_lunch_event_view(request: HttpRequest) -> HttpResponseBase:
     # Make sure user is superuser
     if not request.user.is_superuser:
         return HttpResponse("Unauthorized", status=401)
@@ -60,87 +69,23 @@ def create_lunch_event_view(request: HttpRequest) -> HttpResponse:
             )
             event.save()
 
-            user, created = User.objects.get_or_create(
-                username=username, defaults={"email": f"{username}@fake-user.com"}
+            tickets = issue_printed_tickets(event, username, amount)
+            if amount > MAX_TICKETS_IN_REQUEST:
+                # Would not finish within the request timeout, render in the background
+                transaction.on_commit(
+                    partial(render_ticket_sheets.delay, event.id, "small")
+                )
+                return redirect(
+                    "admin:lunch_event_tickets", event_id=event.id, permanent=False
+                )
+
+            response = StreamingHttpResponse(
+                ticket_sheets_zip(tickets, event, SMALL_TICKETS),
+                content_type="application/zip",
             )
-            if created:
-                user.set_unusable_password()
-                user.save()
-
-            tickets = []
-            for _ in range(amount):
-                ticket = Ticket.objects.create(user=user, event=event)
-                tickets.append(ticket)
-
-            dir_name = (
-                f"{event.name.replace(' ', '_')}_{start_time.strftime('%Y%m%d_%H%M')}"
+            response["Content-Disposition"] = (
+                f'attachment; filename="{ticket_sheets_filename(event)}"'
             )
-            if not os.path.exists(dir_name):
-                os.makedirs(dir_name)
-
-            ticket_chunks = [tickets[i : i + 12] for i in range(0, len(tickets), 12)]
-            pdf_count = 0
-
-            for chunk in ticket_chunks:
-                pdf_count += 1
-                pdf_path = os.path.join(dir_name, f"tickets_page_{pdf_count}.pdf")
-                c = canvas.Canvas(pdf_path, pagesize=A4)
-                width, height = A4
-
-                positions = []
-                for row in range(4):
-                    for col in range(3):
-                        positions.append((col * (width / 3), (3 - row) * (height / 4)))
-
-                for i, ticket in enumerate(chunk):
-                    x_offset, y_offset = positions[i]
-                    cell_height = height / 4
-                    c.setFont("Helvetica-Bold", 12)
-                    c.drawString(
-                        x_offset + 20, y_offset + cell_height - 30, "Lunch Ticket"
-                    )
-                    c.setFont("Helvetica", 10)
-                    c.drawString(
-                        x_offset + 20,
-                        y_offset + cell_height - 50,
-                        f"Start: {start_time.strftime('%Y-%m-%d %H:%M')}",
-                    )
-                    c.drawString(
-                        x_offset + 20,
-                        y_offset + cell_height - 70,
-                        f"End: {end_time.strftime('%Y-%m-%d %H:%M')}",
-                    )
-
-                    qr_img = qrcode.make(str(ticket.uuid))
-                    qr_path = os.path.join(dir_name, f"qr_{ticket.uuid}.png")
-                    with open(qr_path, "wb") as f:
-                        qr_img.save(f)
-
-                    c.drawImage(
-                        qr_path,
-                        x_offset + 20,
-                        y_offset + 20,
-                        width=100,
-                        height=100,
-                    )
-                    os.remove(qr_path)
-
-                c.save()
-
-            zip_buffer = BytesIO()
-            with zipfile.ZipFile(
-                zip_buffer, "a", zipfile.ZIP_DEFLATED, False
-            ) as zip_file:
-                for root, _, files in os.walk(dir_name):
-                    for file in files:
-                        zip_file.write(os.path.join(root, file), file)
-
-            shutil.rmtree(dir_name)
-
-            response = HttpResponse(
-                zip_buffer.getvalue(), content_type="application/zip"
-            )
-            response["Content-Disposition"] = f'attachment; filename="{dir_name}.zip"'
             return response
 
     else:
@@ -151,3 +96,21 @@ def create_lunch_event_view(request: HttpRequest) -> HttpResponse:
         "admin/create_lunch_event.html",
         {"form": form, "title": "Create Lunch Event"},
     )
+
+
+@staff_member_required
+def lunch_event_tickets_view(request: HttpRequest, event_id: int) -> HttpResponseBase:
+    """Downloads the ticket sheets rendered in the background, or says they are not ready."""
+    if not request.user.is_superuser:
+        return HttpResponse("Unauthorized", status=401)
+    event: Event = get_object_or_404(Event, id=event_id)
+    path = ticket_sheets_path(event.id)
+    if not path.exists():
+        return render(
+            request,
+            "admin/lunch_event_tickets_pending.html",
+            {"event": event, "title": "Lunch Tickets"},
+        )
+    return FileResponse(
+        open(path, "rb"), as_attachment=True, filename=ticket_sheets_filename(event)
+    )
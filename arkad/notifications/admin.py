@@ -6,7 +6,7 @@ from django.http import HttpRequest
 from django.utils.html import format_html
 
 from arkad.settings import DEBUG
-from notifications.models import Notification, ScheduledCeleryTasks
+from notifications.models import Notification, ScheduledCeleryTasks, SentReminder
 
 
 # Create a custom admin class for NotificationLog,
@@ -189,3 +189,17 @@ class ScheduledCeleryTasksAdmin(admin.ModelAdmin):  # type: ignore[type-arg]
         if obj.error:
             return format_html(f'<pre style="color: red;">{obj.error}</pre>')
         return "N/A"
+
+
+@admin.register(SentReminder)
+class SentReminderAdmin(admin.ModelAdmin):  # type: ignore[type-arg]
+    # Written by the reminder sweeper only
+    list_display = ("kind", "target", "subject_time", "sent_at")
+    list_filter = ("kind", "sent_at")
+    search_fields = ("target",)
+
+    def has_add_permission(self, request):
+        return False
+
+    def has_change_permission(self, request, obj=None):
+        return False
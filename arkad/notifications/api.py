@@ -1,4 +1,5 @@
 from arkad.customized_django_ninja import Router
+from user_models.auth_cache import invalidate_cached_user
 from user_models.models import AuthenticatedRequest, User
 from notifications.schema import UpdateFCMTokenSchema
 
@@ -14,9 +15,13 @@ def update_fcm_token(request: AuthenticatedRequest, data: UpdateFCMTokenSchema):
     Also checks that no other user has the same token, and clears it if so. This is to avoid
     sending notifications to the wrong user if the token is reused for the same device.
     """
-    User.objects.filter(fcm_token=data.fcm_token).exclude(id=request.user.id).update(
-        fcm_token=None
+    other_users = User.objects.filter(fcm_token=data.fcm_token).exclude(
+        id=request.user.id
     )
+    for user_id in other_users.values_list("id", flat=True):
+        # .update() bypasses the signals which keep the auth cache fresh
+        invalidate_cached_user(user_id)
+    other_users.update(fcm_token=None)
     request.user.fcm_token = data.fcm_token  # user
     request.user.save()
     return 200, "Updated fcm token"
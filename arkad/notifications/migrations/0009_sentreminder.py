@@ -0,0 +1,26 @@
+# Generated by Django 5.2.7 on 2026-10-17 01:29
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('notifications', '0008_scheduledcelerytasks_has_run'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='SentReminder',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('kind', models.PositiveSmallIntegerField(choices=[(1, 'Event tomorrow'), (2, 'Event in one hour'), (3, 'Event registration closes tomorrow'), (4, 'Timeslot tomorrow'), (5, 'Timeslot in one hour'), (6, 'Timeslot booking closes tomorrow')])),
+                ('target', models.CharField(help_text='Ticket uuid or application:timeslot id', max_length=64)),
+                ('subject_time', models.DateTimeField(help_text='The start time or deadline the reminder is about')),
+                ('sent_at', models.DateTimeField(auto_now_add=True)),
+            ],
+            options={
+                'constraints': [models.UniqueConstraint(fields=('kind', 'target', 'subject_time'), name='one_reminder_per_subject_time')],
+            },
+        ),
+    ]
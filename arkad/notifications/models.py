@@ -1,10 +1,12 @@
 import datetime
 import json
 import logging
+import uuid
 from typing import Any, cast
 
 from celery import Task  # type: ignore[import-untyped]
 from celery.result import AsyncResult  # type: ignore[import-untyped]
+from django.conf import settings
 from django.db import models
 from django.db.models.signals import pre_save
 from django.dispatch import receiver
@@ -108,6 +110,16 @@ class ScheduledCeleryTasks(models.Model):
             return f"Scheduled Task: {self.task_name} at {self.eta}"
         return f"Revoked Task: {self.task_name} at {self.eta}"
 
+    @staticmethod
+    def _task_name(task_function: Task) -> str:
+        if hasattr(task_function, "name"):
+            return cast(str, getattr(task_function, "name"))
+        elif hasattr(task_function, "__class__") and hasattr(
+            task_function.__class__, "name"
+        ):
+            return cast(str, getattr(task_function.__class__, "name"))
+        return str(task_function)
+
     @classmethod
     def schedule_task(
         cls, task_function: Task, eta: datetime.datetime, arguments: list[Any]
@@ -121,18 +133,8 @@ class ScheduledCeleryTasks(models.Model):
         if eta <= timezone.now():
             raise ValueError("ETA must be in the future.")
 
-        task_name: str
-        if hasattr(task_function, "name"):
-            task_name = cast(str, getattr(task_function, "name"))
-        elif hasattr(task_function, "__class__") and hasattr(
-            task_function.__class__, "name"
-        ):
-            task_name = cast(str, getattr(task_function.__class__, "name"))
-        else:
-            task_name = str(task_function)
-
         scheduled_task = cls.objects.create(
-            task_name=task_name,
+            task_name=cls._task_name(task_function),
             task_arguments=json.loads(
                 json.dumps(arguments, default=str)
             ),  # Ensure JSON serializable, if not use str()
@@ -144,6 +146,46 @@ class ScheduledCeleryTasks(models.Model):
         )
         return scheduled_task
 
+    @classmethod
+    def schedule_tasks(
+        cls, tasks: list[tuple[Task, datetime.datetime, list[Any]]]
+    ) -> list["ScheduledCeleryTasks"]:
+        """
+        Bulk version of schedule_task for (task function, eta, arguments) tuples.
+        All rows are inserted with one query before the tasks are published over a single
+        broker connection, so a task can never start before its row exists.
+        Returns the instances in the same order as `tasks`.
+        """
+        from arkad.celery import app as celery_app
+
+        if any(eta <= timezone.now() for _, eta, _ in tasks):
+            raise ValueError("ETA must be in the future.")
+
+        scheduled_tasks: list[ScheduledCeleryTasks] = (
+            ScheduledCeleryTasks.objects.bulk_create(
+                ScheduledCeleryTasks(
+                    task_name=cls._task_name(task_function),
+                    task_arguments=json.loads(json.dumps(arguments, default=str)),
+                    eta=eta,
+                    task_id=str(uuid.uuid4()),
+                )
+                for task_function, eta, arguments in tasks
+            )
+        )
+        if scheduled_tasks:
+            with celery_app.producer_or_acquire() as producer:
+                for scheduled_task, (task_function, eta, arguments) in zip(
+                    scheduled_tasks, tasks
+                ):
+                    task_function.apply_async(
+                        args=arguments,
+                        eta=eta,
+                        task_id=scheduled_task.task_id,
+                        producer=producer,
+                    )
+            logging.info(f"Scheduled {len(scheduled_tasks)} tasks")
+        return scheduled_tasks
+
     @property
     def fetch_status(self) -> str:
         """
@@ -194,6 +236,24 @@ class ScheduledCeleryTasks(models.Model):
         else:
             logging.warning(f"Task {self.task_id} already revoked.")
 
+    @classmethod
+    def revoke_tasks(cls, ids: list[int]) -> int:
+        """
+        Bulk version of revoke for the tasks with the given primary keys. The workers are
+        told about all of them in one revoke broadcast and the rows are marked with one update.
+        Returns the number of tasks revoked, tasks already revoked are skipped.
+        """
+        from arkad.celery import app as celery_app
+
+        pending = ScheduledCeleryTasks.objects.filter(id__in=ids, revoked=False)
+        task_ids: list[str] = list(pending.values_list("task_id", flat=True))
+        if not task_ids:
+            return 0
+        celery_app.control.revoke(task_ids)
+        revoked: int = pending.filter(task_id__in=task_ids).update(revoked=True)
+        logging.info(f"Revoked {revoked} tasks")
+        return revoked
+
     def update_status(self) -> None:
         self.status = str(self.fetch_status)
         self.error = str(self.fetch_error)
@@ -263,3 +323,44 @@ def send_notification(sender: Any, instance: Notification, **kwargs: Any) -> Non
             sent_email = True
         instance.fcm_sent = sent_fcm
         instance.email_sent = sent_email
+
+
+def reminder_sweeper_enabled() -> bool:
+    """True if reminders are sent by the reminder sweeper instead of per reminder ETA tasks."""
+    return bool(settings.REMINDER_ENGINE == "sweeper")
+
+
+class ReminderKind(models.IntegerChoices):
+    EVENT_TOMORROW = 1, "Event tomorrow"
+    EVENT_IN_ONE_HOUR = 2, "Event in one hour"
+    EVENT_REGISTRATION_CLOSES_TOMORROW = 3, "Event registration closes tomorrow"
+    TIMESLOT_TOMORROW = 4, "Timeslot tomorrow"
+    TIMESLOT_IN_ONE_HOUR = 5, "Timeslot in one hour"
+    TIMESLOT_BOOKING_CLOSES_TOMORROW = 6, "Timeslot booking closes tomorrow"
+
+
+class SentReminder(models.Model):
+    """
+    A reminder sent by the reminder sweeper, so it is sent once.
+    Keyed on the time the reminder is about, a moved event or timeslot is reminded again.
+    """
+
+    kind = models.PositiveSmallIntegerField(choices=ReminderKind.choices)
+    target = models.CharField(
+        max_length=64, help_text="Ticket uuid or application:timeslot id"
+    )
+    subject_time = models.DateTimeField(
+        help_text="The start time or deadline the reminder is about"
+    )
+    sent_at = models.DateTimeField(auto_now_add=True)
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(
+                fields=["kind", "target", "subject_time"],
+                name="one_reminder_per_subject_time",
+            )
+        ]
+
+    def __str__(self) -> str:
+        return f"{self.get_kind_display()} for {self.target} at {self.subject_time}"
@@ -0,0 +1,181 @@
+"""
+Reminder sweeper, the alternative to one Celery ETA task per reminder (REMINDER_ENGINE=sweeper).
+
+Every ticket and accepted timeslot application otherwise parks up to three ETA messages in
+Redis (held in worker memory until due), and moving an event revokes and reschedules all of
+them. The sweeper instead runs every few minutes and looks up, per kind of reminder, the
+tickets and applications whose reminder became due since the previous sweeps, e.g. tickets
+to events starting between 24h - LOOKBACK and 24h from now. Each reminder is recorded in
+SentReminder before it is dispatched in batches, so it is sent at most once.
+
+Nothing is stored ahead of time: moving an event or timeslot just moves it into a later
+window, and since SentReminder is keyed on the time the reminder is about, the new time is
+reminded again. Tickets and applications that still have a pending ETA task (scheduled
+before switching engines) are left to that task.
+"""
+
+import datetime
+from typing import Any, Iterator, NamedTuple
+
+from django.db.models import Q
+
+from event_booking.models import Event, Ticket
+from notifications.models import ReminderKind, SentReminder
+from student_sessions.models import ApplicationStatus, TimeslotSelection
+
+# Reminders are still sent when up to this late, so a missed sweep or a restart loses nothing
+LOOKBACK: datetime.timedelta = datetime.timedelta(minutes=15)
+BATCH_SIZE: int = 200
+# Sent reminders are only needed until the time they are about has passed
+KEEP_SENT_FOR: datetime.timedelta = datetime.timedelta(days=1)
+
+# Kind, how long before the event start the reminder is sent, and the ETA task field
+TICKET_REMINDERS: list[tuple[ReminderKind, datetime.timedelta, str]] = [
+    (
+        ReminderKind.EVENT_TOMORROW,
+        datetime.timedelta(hours=24),
+        "notify_event_tomorrow",
+    ),
+    (
+        ReminderKind.EVENT_IN_ONE_HOUR,
+        datetime.timedelta(hours=1),
+        "notify_event_in_one_hour",
+    ),
+    (
+        ReminderKind.EVENT_REGISTRATION_CLOSES_TOMORROW,
+        Event.booking_change_deadline_delta() + datetime.timedelta(days=1),
+        "notify_registration_closes_tomorrow",
+    ),
+]
+
+# Kind, the timeslot time it is about, how long before it is sent, and the ETA task field
+TIMESLOT_REMINDERS: list[tuple[ReminderKind, str, datetime.timedelta, str]] = [
+    (
+        ReminderKind.TIMESLOT_TOMORROW,
+        "start_time",
+        datetime.timedelta(hours=24),
+        "notify_timeslot_tomorrow",
+    ),
+    (
+        ReminderKind.TIMESLOT_IN_ONE_HOUR,
+        "start_time",
+        datetime.timedelta(hours=1),
+        "notify_timeslot_in_one_hour",
+    ),
+    (
+        ReminderKind.TIMESLOT_BOOKING_CLOSES_TOMORROW,
+        "booking_closes_at",
+        datetime.timedelta(days=1),
+        "notify_timeslot_booking_closes_tomorrow",
+    ),
+]
+
+
+class DueReminder(NamedTuple):
+    kind: ReminderKind
+    target: str
+    subject_time: datetime.datetime
+    arguments: list[Any]  # For the sender of the kind in notifications.tasks
+
+
+def _no_pending_eta_task(field: str) -> Q:
+    return Q(**{f"{field}__isnull": True}) | Q(**{f"{field}__revoked": True})
+
+
+def _due_ticket_reminders(now: datetime.datetime) -> Iterator[DueReminder]:
+    for kind, before, field in TICKET_REMINDERS:
+        tickets = (
+            Ticket.objects.filter(
+                used=False,
+                # Like the ETA path, printed lunch tickets and muted events are not reminded
+                issued_in_bulk=False,
+                event__send_notifications_for_event=True,
+                event__start_time__gt=now + before - LOOKBACK,
+                event__start_time__lte=now + before,
+            )
+            .filter(_no_pending_eta_task(field))
+            .values_list("uuid", "event__start_time")
+        )
+        for ticket_uuid, start_time in tickets:
+            yield DueReminder(kind, str(ticket_uuid), start_time, [str(ticket_uuid)])
+
+
+def _due_timeslot_reminders(now: datetime.datetime) -> Iterator[DueReminder]:
+    selections = TimeslotSelection.objects
+    for kind, time_field, before, field in TIMESLOT_REMINDERS:
+        subject_time_field = f"timeslot__{time_field}"
+        selected = (
+            selections.filter(
+                application__status=ApplicationStatus.ACCEPTED,
+                **{
+                    f"{subject_time_field}__gt": now + before - LOOKBACK,
+                    f"{subject_time_field}__lte": now + before,
+                },
+            )
+            .filter(_no_pending_eta_task(f"application__{field}"))
+            .values_list(
+                "application_id",
+                "timeslot_id",
+                "application__user_id",
+                "timeslot__student_session_id",
+                subject_time_field,
+            )
+        )
+        for application_id, timeslot_id, user_id, session_id, subject_time in selected:
+            arguments: list[Any] = (
+                [timeslot_id, application_id]
+                if kind == ReminderKind.TIMESLOT_BOOKING_CLOSES_TOMORROW
+                else [user_id, session_id, timeslot_id]
+            )
+            yield DueReminder(
+                kind, f"{application_id}:{timeslot_id}", subject_time, arguments
+            )
+
+
+def claim_due_reminders(now: datetime.datetime) -> list[DueReminder]:
+    """
+    Returns the reminders that are due and not sent yet, and records them as sent.
+    Only one sweep may run at a time, see notifications.tasks.sweep_reminders.
+    """
+    due: list[DueReminder] = [
+        *_due_ticket_reminders(now),
+        *_due_timeslot_reminders(now),
+    ]
+    if not due:
+        return []
+
+    sent: set[tuple[int, str, datetime.datetime]] = set(
+        SentReminder.objects.filter(
+            target__in={reminder.target for reminder in due}
+        ).values_list("kind", "target", "subject_time")
+    )
+    unsent: list[DueReminder] = [
+        reminder
+        for reminder in due
+        if (reminder.kind, reminder.target, reminder.subject_time) not in sent
+    ]
+    SentReminder.objects.bulk_create(
+        (
+            SentReminder(
+                kind=reminder.kind,
+                target=reminder.target,
+                subject_time=reminder.subject_time,
+            )
+            for reminder in unsent
+        ),
+        ignore_conflicts=True,
+    )
+    return unsent
+
+
+def forget_old_reminders(now: datetime.datetime) -> None:
+    """Deletes sent reminders about times that have passed, keeping the table small."""
+    SentReminder.objects.filter(subject_time__lt=now - KEEP_SENT_FOR).delete()
+
+
+def batches(reminders: list[DueReminder]) -> Iterator[tuple[ReminderKind, list[Any]]]:
+    """Groups the reminders per kind into (kind, list of sender arguments) batches."""
+    for kind in ReminderKind:
+        arguments: list[Any] = [r.arguments for r in reminders if r.kind == kind]
+        for i in range(0, len(arguments), BATCH_SIZE):
+            yield kind, arguments[i : i + BATCH_SIZE]
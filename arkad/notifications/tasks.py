@@ -4,9 +4,19 @@ from functools import wraps
 from typing import Any, Callable
 
 from celery import shared_task  # type: ignore[import-untyped]
+from django.core.cache import cache
+from django.db import connection, transaction
+from django.utils import timezone
 
+from arkad.utils import cache_namespace
 from event_booking.models import Event, Ticket
-from notifications.models import Notification, ScheduledCeleryTasks
+from notifications import reminders
+from notifications.models import (
+    Notification,
+    ReminderKind,
+    ScheduledCeleryTasks,
+    reminder_sweeper_enabled,
+)
 from student_sessions.models import StudentSession, SessionType, StudentSessionTimeslot
 from user_models.models import User
 from arkad.settings import APP_BASE_URL, make_local_time
@@ -58,10 +68,7 @@ def db_backed_task_validity(func) -> Callable:  # type: ignore # noqa: F821
 # --- Event Reminders ---
 
 
-@shared_task(bind=True)  # type: ignore
-@db_backed_task_validity
-def notify_event_tomorrow(self, ticket_uuid: uuid.UUID) -> None:  # type: ignore[no-untyped-def]
-    """Notify the user that they have an event tomorrow (with email)."""
+def send_event_tomorrow(ticket_uuid: uuid.UUID | str) -> None:
     try:
         # Select user and event to minimize queries
         ticket: Ticket = Ticket.objects.select_related("user", "event").get(
@@ -112,8 +119,12 @@ def notify_event_tomorrow(self, ticket_uuid: uuid.UUID) -> None:  # type: ignore
 
 @shared_task(bind=True)  # type: ignore
 @db_backed_task_validity
-def notify_event_one_hour(self, ticket_uuid: uuid.UUID) -> None:  # type: ignore[no-untyped-def]
-    """Notify the user that they have an event in one hour (FCM only)."""
+def notify_event_tomorrow(self, ticket_uuid: uuid.UUID) -> None:  # type: ignore[no-untyped-def]
+    """Notify the user that they have an event tomorrow (with email)."""
+    send_event_tomorrow(ticket_uuid)
+
+
+def send_event_one_hour(ticket_uuid: uuid.UUID | str) -> None:
     try:
         ticket: Ticket = Ticket.objects.select_related("user", "event").get(
             uuid=ticket_uuid, used=False
@@ -138,6 +149,13 @@ def notify_event_one_hour(self, ticket_uuid: uuid.UUID) -> None:  # type: ignore
     )
 
 
+@shared_task(bind=True)  # type: ignore
+@db_backed_task_validity
+def notify_event_one_hour(self, ticket_uuid: uuid.UUID) -> None:  # type: ignore[no-untyped-def]
+    """Notify the user that they have an event in one hour (FCM only)."""
+    send_event_one_hour(ticket_uuid)
+
+
 # --- Student Session Reminders ---
 
 
@@ -181,12 +199,9 @@ def _get_session_notification_texts(
     return title, fcm_body, email_heading, email_note, time_info, disclaimer_str
 
 
-@shared_task(bind=True)  # type: ignore
-@db_backed_task_validity
-def notify_student_session_tomorrow(  # type: ignore[no-untyped-def]
-    self, user_id: int, student_session_id: int, timeslot_id: int
+def send_student_session_tomorrow(
+    user_id: int, student_session_id: int, timeslot_id: int
 ) -> None:
-    """Notify the user about a student session tomorrow (with email)."""
     try:
         user = User.objects.get(id=user_id)
         session: StudentSession = StudentSession.objects.select_related("company").get(
@@ -240,10 +255,16 @@ def notify_student_session_tomorrow(  # type: ignore[no-untyped-def]
 
 @shared_task(bind=True)  # type: ignore
 @db_backed_task_validity
-def notify_student_session_one_hour(  # type: ignore[no-untyped-def]
+def notify_student_session_tomorrow(  # type: ignore[no-untyped-def]
     self, user_id: int, student_session_id: int, timeslot_id: int
 ) -> None:
-    """Notify the user about a student session in one hour (FCM only)."""
+    """Notify the user about a student session tomorrow (with email)."""
+    send_student_session_tomorrow(user_id, student_session_id, timeslot_id)
+
+
+def send_student_session_one_hour(
+    user_id: int, student_session_id: int, timeslot_id: int
+) -> None:
     try:
         user = User.objects.get(id=user_id)
         session: StudentSession = StudentSession.objects.select_related("company").get(
@@ -276,6 +297,15 @@ def notify_student_session_one_hour(  # type: ignore[no-untyped-def]
     )
 
 
+@shared_task(bind=True)  # type: ignore
+@db_backed_task_validity
+def notify_student_session_one_hour(  # type: ignore[no-untyped-def]
+    self, user_id: int, student_session_id: int, timeslot_id: int
+) -> None:
+    """Notify the user about a student session in one hour (FCM only)."""
+    send_student_session_one_hour(user_id, student_session_id, timeslot_id)
+
+
 # --- Registration Open Notifications (Broadcast) ---
 
 
@@ -334,12 +364,7 @@ def notify_student_session_registration_open(self, student_session_id: int) -> N
 # --- Registration Closing Reminders (with email) ---
 
 
-@shared_task(bind=True)  # type: ignore
-@db_backed_task_validity
-def notify_event_registration_closes_tomorrow(self, ticket_uuid: str) -> None:  # type: ignore[no-untyped-def]
-    """
-    Remind registered users that event registration/unbooking closes tomorrow (with email).
-    """
+def send_event_registration_closes_tomorrow(ticket_uuid: uuid.UUID | str) -> None:
     try:
         ticket = Ticket.objects.select_related("user", "event").get(
             uuid=ticket_uuid, used=False
@@ -382,12 +407,111 @@ def notify_event_registration_closes_tomorrow(self, ticket_uuid: str) -> None:
 
 @shared_task(bind=True)  # type: ignore
 @db_backed_task_validity
-def notify_student_session_timeslot_booking_freezes_tomorrow(  # type: ignore[no-untyped-def]
-    self, timeslot_id: int, application_id: int
-) -> None:
+def notify_event_registration_closes_tomorrow(self, ticket_uuid: str) -> None:  # type: ignore[no-untyped-def]
     """
-    Remind selected users that timeslot booking/unbooking closes tomorrow (with email).
+    Remind registered users that event registration/unbooking closes tomorrow (with email).
+    """
+    send_event_registration_closes_tomorrow(ticket_uuid)
+
+
+@shared_task  # type: ignore
+def schedule_ticket_reminders(ticket_uuids: list[str]) -> None:
+    """
+    Schedule the reminders of newly booked tickets. Queued once the booking has committed so
+    that the booking itself never waits for the broker, all reminder rows are created in bulk.
+    """
+    tickets: list[Ticket] = list(
+        Ticket.objects.select_related("event").filter(
+            uuid__in=ticket_uuids,
+            # Already scheduled if this task is retried, or rescheduled by an event change
+            notify_event_tomorrow__isnull=True,
+            notify_event_in_one_hour__isnull=True,
+            notify_registration_closes_tomorrow__isnull=True,
+        )
+    )
+    if len(tickets) < len(ticket_uuids):
+        logger.info(
+            f"{len(ticket_uuids) - len(tickets)} tickets were removed or already scheduled"
+        )
+    Ticket.schedule_notifications_in_bulk(tickets)
+
+
+# Class of the advisory locks held by reschedule_event_reminders, keyed by the event id
+RESCHEDULE_EVENT_LOCK: int = 1
+
+
+@shared_task  # type: ignore
+def reschedule_event_reminders(event_id: int) -> None:
+    """
+    Reschedule the reminders of all tickets to an event that was moved, once the move is
+    committed. Queued instead of run within the admin request when the event has many tickets.
+    """
+    with transaction.atomic():
+        # Serializes reschedules of the same event, so the latest start time wins. An advisory
+        # lock rather than the event row, which booking and unbooking need while the reminders
+        # are published to the broker.
+        with connection.cursor() as cursor:
+            cursor.execute(
+                "SELECT pg_advisory_xact_lock(%s, %s)",
+                [RESCHEDULE_EVENT_LOCK, event_id],
+            )
+        event: Event | None = Event.objects.filter(id=event_id).first()
+        if event is None:
+            logger.warning(f"Event with id {event_id} not found.")
+            return
+        event.reschedule_ticket_notifications()
+
+
+@shared_task  # type: ignore
+def notify_event_waitlist_promoted(ticket_uuid: str) -> None:
+    """
+    Tell a student on the waitlist that a seat was freed and is now theirs (with email).
+    Queued directly when the seat is handed out, so it is not db backed.
     """
+    try:
+        ticket = Ticket.objects.select_related("user", "event").get(
+            uuid=ticket_uuid, used=False
+        )
+    except Ticket.DoesNotExist:
+        logger.warning(f"Ticket with uuid {ticket_uuid} not found or already used.")
+        return
+
+    user = ticket.user
+    event = ticket.event
+    local_start_time = make_local_time(event.start_time).strftime("%Y-%m-%d %H:%M")
+    title = f"You got a spot at {event.name}! 🎉"
+
+    # 1. FCM/Notification Body (Concise)
+    fcm_body = f"A spot opened up at {event.name} and it is now yours. Your ticket is in the app."
+
+    # 2. Email Body (Rich/Detailed)
+    email_body = (
+        f"A spot opened up at {event.name} ({local_start_time}) and since you were first on the waiting list "
+        f"it has been booked for you. Your ticket is available in the app. "
+        f"If you can no longer attend, please unbook it so the next student on the waiting list gets the spot."
+    )
+
+    link = f"{APP_BASE_URL}/events/detail/{event.id}/ticket"
+    Notification.objects.create(
+        target_user=user,
+        title=title,
+        body=fcm_body,  # Used for FCM
+        email_body=email_body,  # Used for Email
+        # Email fields
+        greeting=f"Hi {user.first_name},",
+        heading=f"Booked from the waiting list: {event.name}",
+        button_text="View Your Ticket",
+        button_link=link,
+        fcm_link=link,
+        note="We look forward to seeing you there!",
+        email_sent=True,
+        fcm_sent=True,
+    )
+
+
+def send_student_session_timeslot_booking_freezes_tomorrow(
+    timeslot_id: int, application_id: int
+) -> None:
     try:
         # Import inside the task to avoid potential Celery startup issues/circular imports
 
@@ -453,3 +577,63 @@ def notify_student_session_timeslot_booking_freezes_tomorrow(  # type: ignore[no
         email_sent=True,
         fcm_sent=True,
     )
+
+
+@shared_task(bind=True)  # type: ignore
+@db_backed_task_validity
+def notify_student_session_timeslot_booking_freezes_tomorrow(  # type: ignore[no-untyped-def]
+    self, timeslot_id: int, application_id: int
+) -> None:
+    """
+    Remind selected users that timeslot booking/unbooking closes tomorrow (with email).
+    """
+    send_student_session_timeslot_booking_freezes_tomorrow(timeslot_id, application_id)
+
+
+# --- Reminder Sweeper (REMINDER_ENGINE=sweeper) ---
+
+REMINDER_SENDERS: dict[ReminderKind, Callable[..., None]] = {
+    ReminderKind.EVENT_TOMORROW: send_event_tomorrow,
+    ReminderKind.EVENT_IN_ONE_HOUR: send_event_one_hour,
+    ReminderKind.EVENT_REGISTRATION_CLOSES_TOMORROW: send_event_registration_closes_tomorrow,
+    ReminderKind.TIMESLOT_TOMORROW: send_student_session_tomorrow,
+    ReminderKind.TIMESLOT_IN_ONE_HOUR: send_student_session_one_hour,
+    ReminderKind.TIMESLOT_BOOKING_CLOSES_TOMORROW: send_student_session_timeslot_booking_freezes_tomorrow,
+}
+
+
+@shared_task  # type: ignore
+def sweep_reminders() -> None:
+    """
+    Periodic task (celery beat) which finds the reminders that became due and sends them
+    in batches, see notifications/reminders.py. Does nothing with the ETA reminder engine.
+    """
+    if not reminder_sweeper_enabled():
+        return
+
+    lock_key = f"notifications:{cache_namespace()}:sweep-reminders-lock"
+    if not cache.add(lock_key, True, timeout=reminders.LOOKBACK.total_seconds()):
+        logger.warning("Previous reminder sweep is still running, skipping")
+        return
+    try:
+        now = timezone.now()
+        due = reminders.claim_due_reminders(now)
+        for kind, arguments in reminders.batches(due):
+            send_reminders.delay(kind, arguments)
+        reminders.forget_old_reminders(now)
+        if due:
+            logger.info(f"Dispatched {len(due)} reminders")
+    finally:
+        cache.delete(lock_key)
+
+
+@shared_task  # type: ignore
+def send_reminders(kind: int, arguments: list[list[Any]]) -> None:
+    """Sends a batch of reminders of one kind, `arguments` holds the arguments per reminder."""
+    send = REMINDER_SENDERS[ReminderKind(kind)]
+    for reminder_arguments in arguments:
+        try:
+            send(*reminder_arguments)
+        except Exception:
+            # One broken reminder must not keep the rest of the batch from being sent
+            logger.exception(f"Failed to send {ReminderKind(kind).label} reminder")
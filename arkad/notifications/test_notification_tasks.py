@@ -20,7 +20,7 @@ from student_sessions.models import (
     ApplicationStatus,
 )
 from user_models.models import User
-from notifications.models import Notification
+from notifications.models import Notification, ScheduledCeleryTasks
 from companies.models import Company
 
 # Define constants used in assertions
@@ -241,9 +241,10 @@ class NotificationTasksTestCase(TestCase):
 
     def test_notify_event_registration_closes_tomorrow(self) -> None:
         """Tests unbooking reminder is sent to active ticket holders."""
-        t = Ticket.objects.create(
-            user=self.user2, event=self.event, used=False, uuid=uuid.uuid4()
-        )
+        # user2 may only hold one ticket for the event, make it an active one
+        t = self.ticket_used
+        t.used = False
+        t.save()
 
         tasks.notify_event_registration_closes_tomorrow(t.uuid)
 
@@ -264,6 +265,40 @@ class NotificationTasksTestCase(TestCase):
         self.assertIn("closes tomorrow", n0_body)
         self.assertIn("unbook your ticket immediately", n0_email_body)
 
+    def test_notify_event_waitlist_promoted(self) -> None:
+        """Tests the student promoted from the waitlist is told about their ticket."""
+        tasks.notify_event_waitlist_promoted(str(self.ticket1.uuid))
+
+        notification = Notification.objects.get()
+        self.assertEqual(notification.target_user, self.user1)
+        self.assertTrue(notification.email_sent)
+        self.assertIn(self.event.name, notification.title or "")
+        self.assertIn("waiting list", notification.email_body or "")
+
+    def test_schedule_ticket_reminders(self) -> None:
+        """Tests booked tickets get their reminders scheduled in bulk, and only once."""
+        ticket_uuids = [str(self.ticket1.uuid), str(self.ticket_used.uuid)]
+        with self.assertNumQueries(3):  # Load tickets, insert reminders, update tickets
+            tasks.schedule_ticket_reminders(ticket_uuids)
+
+        self.ticket1.refresh_from_db()
+        assert self.ticket1.notify_event_tomorrow is not None
+        self.assertEqual(
+            self.ticket1.notify_event_tomorrow.task_name,
+            tasks.notify_event_tomorrow.name,
+        )
+        self.assertEqual(
+            self.ticket1.notify_event_tomorrow.task_arguments,
+            [str(self.ticket1.uuid)],
+        )
+        self.assertIsNotNone(self.ticket1.notify_event_in_one_hour)
+        scheduled = ScheduledCeleryTasks.objects.count()
+        self.assertGreaterEqual(scheduled, 4)
+
+        # A retried task leaves the scheduled reminders alone
+        tasks.schedule_ticket_reminders(ticket_uuids)
+        self.assertEqual(ScheduledCeleryTasks.objects.count(), scheduled)
+
     # --- Student Session Task Tests (REGULAR SESSION) ---
 
     def test_notify_student_session_tomorrow_regular(self) -> None:
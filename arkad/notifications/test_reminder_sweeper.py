@@ -0,0 +1,171 @@
+import datetime
+from unittest.mock import patch
+
+from django.test import TestCase, override_settings
+from django.utils import timezone
+
+from companies.models import Company
+from event_booking.models import Event, Ticket
+from notifications import tasks
+from notifications.models import (
+    Notification,
+    ReminderKind,
+    ScheduledCeleryTasks,
+    SentReminder,
+)
+from notifications.reminders import claim_due_reminders, forget_old_reminders
+from student_sessions.models import (
+    ApplicationStatus,
+    StudentSession,
+    StudentSessionApplication,
+    StudentSessionTimeslot,
+)
+from user_models.models import User
+
+
+@override_settings(REMINDER_ENGINE="sweeper")
+class ReminderSweeperTests(TestCase):
+    def setUp(self) -> None:
+        self.now = timezone.now()
+        self.user = User.objects.create_user(
+            username="sweeper@example.com", password="p", first_name="Sam"
+        )
+        # Starts a little less than 24h from now, so the reminder for tomorrow is due
+        self.event = Event.objects.create(
+            name="Sweeper Event",
+            location="Hall",
+            start_time=self.now + datetime.timedelta(hours=24, minutes=-2),
+            end_time=self.now + datetime.timedelta(hours=26),
+            capacity=10,
+        )
+        self.ticket = Ticket.objects.create(user=self.user, event=self.event)
+
+    def _claimed(self, now: datetime.datetime) -> list[tuple[ReminderKind, str]]:
+        return [(r.kind, r.target) for r in claim_due_reminders(now)]
+
+    def test_due_ticket_reminder_is_claimed_once(self) -> None:
+        self.assertEqual(
+            self._claimed(self.now),
+            [(ReminderKind.EVENT_TOMORROW, str(self.ticket.uuid))],
+        )
+        self.assertEqual(SentReminder.objects.count(), 1)
+        # The next sweep overlaps the window, but it was already sent
+        self.assertEqual(self._claimed(self.now + datetime.timedelta(minutes=5)), [])
+
+    def test_ticket_reminders_are_not_scheduled_as_eta_tasks(self) -> None:
+        with (
+            patch("notifications.tasks.schedule_ticket_reminders.delay") as schedule,
+            self.captureOnCommitCallbacks(execute=True),
+        ):
+            Ticket.objects.create(
+                user=User.objects.create(username="u2"), event=self.event
+            )
+        schedule.assert_not_called()
+        self.ticket.schedule_notifications(self.event.start_time)
+        self.assertEqual(ScheduledCeleryTasks.objects.count(), 0)
+
+    def test_moved_event_is_reminded_again(self) -> None:
+        self._claimed(self.now)
+        self.event.start_time += datetime.timedelta(days=1)
+        self.event.end_time += datetime.timedelta(days=1)
+        self.event.save()
+
+        self.assertEqual(self._claimed(self.now), [])
+        self.assertEqual(
+            self._claimed(self.now + datetime.timedelta(days=1)),
+            [(ReminderKind.EVENT_TOMORROW, str(self.ticket.uuid))],
+        )
+
+    def test_used_tickets_and_pending_eta_tasks_are_skipped(self) -> None:
+        other = Ticket.objects.create(
+            user=User.objects.create(username="u2"), event=self.event, used=True
+        )
+        self.ticket.notify_event_tomorrow = ScheduledCeleryTasks.objects.create(
+            task_id="pending", eta=self.now
+        )
+        self.ticket.save()
+        self.assertEqual(self._claimed(self.now), [])
+
+        self.ticket.notify_event_tomorrow.revoked = True
+        self.ticket.notify_event_tomorrow.save()
+        self.assertEqual(
+            self._claimed(self.now),
+            [(ReminderKind.EVENT_TOMORROW, str(self.ticket.uuid))],
+        )
+        self.assertNotIn(
+            str(other.uuid), SentReminder.objects.values_list("target", flat=True)
+        )
+
+    def test_bulk_tickets_and_muted_events_are_skipped(self) -> None:
+        Ticket.objects.create(user=self.user, event=self.event, issued_in_bulk=True)
+        Ticket.objects.create(user=self.user, event=self.event, issued_in_bulk=True)
+        muted = Event.objects.create(
+            name="Muted Event",
+            location="Hall",
+            start_time=self.event.start_time,
+            end_time=self.event.end_time,
+            capacity=10,
+            send_notifications_for_event=False,
+        )
+        Ticket.objects.create(user=self.user, event=muted)
+        self.assertEqual(
+            self._claimed(self.now),
+            [(ReminderKind.EVENT_TOMORROW, str(self.ticket.uuid))],
+        )
+
+    def test_timeslot_reminders(self) -> None:
+        self.ticket.delete()
+        company = Company.objects.create(name="Sweeper Company")
+        session = StudentSession.objects.create(company=company)
+        application = StudentSessionApplication.objects.create(
+            student_session=session, user=self.user, status=ApplicationStatus.ACCEPTED
+        )
+        timeslot = StudentSessionTimeslot.objects.create(
+            student_session=session,
+            start_time=self.now + datetime.timedelta(minutes=50),
+            booking_closes_at=self.now + datetime.timedelta(days=1),
+        )
+        timeslot.selected_applications.add(application)
+
+        claimed = claim_due_reminders(self.now)
+        self.assertEqual(
+            sorted((r.kind, r.arguments) for r in claimed),
+            [
+                (
+                    ReminderKind.TIMESLOT_IN_ONE_HOUR,
+                    [self.user.id, session.id, timeslot.id],
+                ),
+                (
+                    ReminderKind.TIMESLOT_BOOKING_CLOSES_TOMORROW,
+                    [timeslot.id, application.id],
+                ),
+            ],
+        )
+
+    def test_sweep_dispatches_batches(self) -> None:
+        with patch("notifications.tasks.send_reminders.delay") as send:
+            tasks.sweep_reminders()
+            tasks.sweep_reminders()
+        send.assert_called_once_with(
+            ReminderKind.EVENT_TOMORROW, [[str(self.ticket.uuid)]]
+        )
+
+    @override_settings(REMINDER_ENGINE="eta")
+    def test_sweep_does_nothing_with_eta_engine(self) -> None:
+        with patch("notifications.tasks.send_reminders.delay") as send:
+            tasks.sweep_reminders()
+        send.assert_not_called()
+        self.assertEqual(SentReminder.objects.count(), 0)
+
+    def test_send_reminders(self) -> None:
+        tasks.send_reminders(
+            ReminderKind.EVENT_TOMORROW, [[str(self.ticket.uuid)], ["not-a-uuid"]]
+        )
+        notification = Notification.objects.get()
+        self.assertEqual(notification.target_user, self.user)
+        self.assertIn(self.event.name, notification.title)
+
+    def test_old_reminders_are_forgotten(self) -> None:
+        self._claimed(self.now)
+        forget_old_reminders(self.now + datetime.timedelta(days=2))
+        self.assertEqual(SentReminder.objects.count(), 0)
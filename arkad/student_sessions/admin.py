@@ -5,7 +5,14 @@ from django.db.models import QuerySet
 from django.http import HttpRequest
 from import_export.admin import ImportExportModelAdmin
 
-from .models import StudentSession, StudentSessionApplication, StudentSessionTimeslot
+from .decisions import decide_applications
+from .models import (
+    ApplicationStatus,
+    StudentSession,
+    StudentSessionApplication,
+    StudentSessionTimeslot,
+    TimeslotSelection,
+)
 from .import_export_resources import (
     StudentSessionApplicationResource,
     StudentSessionAttendeeResource,
@@ -85,11 +92,11 @@ class StudentSessionApplicationAdmin(ImportExportModelAdmin):  # type: ignore[ty
         self, request: HttpRequest, queryset: QuerySet[StudentSessionApplication]
     ) -> None:
         """Accept selected applications."""
-        count = 0
-        for application in queryset:
-            if not application.is_accepted():
-                application.accept()
-                count += 1
+        count = len(
+            decide_applications(
+                queryset.values_list("id", flat=True), ApplicationStatus.ACCEPTED
+            )
+        )
         self.message_user(
             request,
             f"Successfully accepted {count} application(s).",
@@ -101,11 +108,11 @@ class StudentSessionApplicationAdmin(ImportExportModelAdmin):  # type: ignore[ty
         self, request: HttpRequest, queryset: QuerySet[StudentSessionApplication]
     ) -> None:
         """Deny selected applications."""
-        count = 0
-        for application in queryset:
-            if not application.is_rejected():
-                application.deny()
-                count += 1
+        count = len(
+            decide_applications(
+                queryset.values_list("id", flat=True), ApplicationStatus.REJECTED
+            )
+        )
         self.message_user(
             request,
             f"Successfully denied {count} application(s).",
@@ -136,10 +143,19 @@ class StudentSessionAdmin(admin.ModelAdmin):  # type: ignore[type-arg]
     )
 
 
+class TimeslotSelectionInline(admin.TabularInline):  # type: ignore[type-arg]
+    model = TimeslotSelection
+    fields = ("application", "exclusive")
+    readonly_fields = ("exclusive",)  # Follows the session type
+    raw_id_fields = ("application",)
+    extra = 0
+
+
 @admin.register(StudentSessionTimeslot)
 class StudentSessionTimeslotAdmin(admin.ModelAdmin):  # type: ignore[type-arg]
     list_display = ("student_session", "start_time", "duration", "get_selected_count")
     list_filter = (StudentSessionListFilter,)
+    inlines = [TimeslotSelectionInline]
 
     @admin.display(description="Selected Applications")
     def get_selected_count(self, obj: StudentSessionTimeslot) -> str:
@@ -1,25 +1,39 @@
+from functools import partial
+
 from django.db import transaction, IntegrityError
-from django.db.models import Q, Count
+from django.db.models import Q
 from django.db.models.fields.files import FieldFile
+from django.http import HttpResponse
 from django.utils import timezone
 from pydantic import BaseModel
 from pydantic_core import ValidationError
-from ninja import File, UploadedFile
+from ninja import File, Query, UploadedFile
 
 from arkad.auth import OPTIONAL_AUTH
-from arkad.customized_django_ninja import Router, ListType
+from arkad.utils import atomic_with_retry
+from arkad.customized_django_ninja import (
+    KeysetPagination,
+    ListType,
+    Router,
+    paginate_queryset,
+)
 from user_models.models import AuthenticatedRequest
+from student_sessions.availability import timeslots_for_application
+from student_sessions.decisions import DECISIONS, decide_applications
+from student_sessions.catalog import (
+    get_application_statuses,
+    render_session_catalog,
+)
 from student_sessions.models import (
     StudentSession,
     StudentSessionApplication,
     StudentSessionTimeslot,
-    SessionType,
     ApplicationStatus,
+    TimeslotSelection,
 )
 from student_sessions.schema import (
     TimeslotSchema,
     StudentSessionNormalUserListSchema,
-    StudentSessionNormalUserSchema,
     CreateStudentSessionSchema,
     ApplicantSchema,
     StudentSessionApplicationSchema,
@@ -31,7 +45,7 @@ from student_sessions.schema import (
 )
 from user_models.schema import ProfileSchema
 from functools import wraps
-from typing import Callable, Literal
+from typing import Callable
 
 router = Router(tags=["Student Sessions"])
 
@@ -70,40 +84,9 @@ def get_student_sessions(request: AuthenticatedRequest):
 
     If the user is authenticated, it will also include their application status for each session.
     """
-    sessions: list[StudentSession] = list(StudentSession.objects.all())
-    id_to_session: dict[int, StudentSession] = {s.id: s for s in sessions}
-    my_applications_statuses: dict[int, Literal["accepted", "pending", "rejected"]] = (
-        dict()
-    )
-    if request.user.is_authenticated:
-        applications = StudentSessionApplication.objects.filter(user=request.user).all()
-        for application in applications:
-            if application.student_session_id in id_to_session:
-                my_applications_statuses[application.student_session_id] = (
-                    application.status
-                )
-
-    return StudentSessionNormalUserListSchema(
-        student_sessions=[
-            StudentSessionNormalUserSchema(
-                company_id=s.company_id,
-                booking_close_time=s.booking_close_time,
-                id=s.id,
-                available=True,
-                user_status=my_applications_statuses.get(s.id, None),
-                field_modifications=s.field_modifications,
-                description=s.description,
-                disclaimer=s.disclaimer,
-                booking_open_time=s.booking_open_time,
-                session_type=s.session_type,
-                location=s.location,
-                name=s.name,
-                company_event_at=s.company_event_at,  # For now, we do not check if actually company event
-            )
-            for s in sessions
-        ],
-        numElements=len(sessions),
-    )
+    if not request.user.is_authenticated:
+        return render_session_catalog({})
+    return render_session_catalog(get_application_statuses(request.user.id))
 
 
 @router.post("/exhibitor", response={406: str, 201: TimeslotSchema, 401: str})
@@ -143,17 +126,25 @@ def get_exhibitor_sessions(request: AuthenticatedRequestSession):
     response={200: ListType[ApplicantSchema], 401: str, 404: str, 406: str},
 )
 @exhibitor_check
-def get_student_session_applicants(request: AuthenticatedRequestSession):
+def get_student_session_applicants(
+    request: AuthenticatedRequestSession,
+    response: HttpResponse,
+    pagination: Query[KeysetPagination],
+):
     """
     Returns a list of the applicants to a company's student-session, used when the company wants to select applicants.
+    Paginated by application if limit is given (see KeysetPagination).
     """
     session: StudentSession = request.student_session
 
     result: list[ApplicantSchema] = []
-    applications = (
-        StudentSessionApplication.objects.prefetch_related("user")
-        .filter(student_session=session)
-        .all()
+    applications = paginate_queryset(
+        StudentSessionApplication.objects.select_related("user").filter(
+            student_session=session
+        ),
+        "id",
+        pagination,
+        response,
     )
     for a in applications:
         cv: FieldFile | None = a.cv or a.user.cv
@@ -184,22 +175,18 @@ def update_student_session_application_status(
 
     session: StudentSession = request.student_session
     try:
-        with transaction.atomic():
-            applicant = StudentSessionApplication.objects.select_for_update().get(
-                student_session=session, user_id=data.applicant_user_id
-            )
-            if not applicant.is_pending():
-                return 409, "Applicant status has been set and can not be modified"
-
-            match data.status:
-                case "accepted":
-                    applicant.accept()
-                case "rejected":
-                    applicant.deny()
-                case _:
-                    return 409, "Invalid status provided"
+        applicant = StudentSessionApplication.objects.only("id", "status").get(
+            student_session=session, user_id=data.applicant_user_id
+        )
     except StudentSessionApplication.DoesNotExist:
         return 404, "Applicant not found"
+    if not applicant.is_pending():
+        return 409, "Applicant status has been set and can not be modified"
+    if data.status not in DECISIONS:
+        return 409, "Invalid status provided"
+    # Only decides if still pending, a concurrent decision wins
+    if not decide_applications([applicant.id], data.status, pending_only=True):
+        return 409, "Applicant status has been set and can not be modified"
     return 200, "Applicant accepted"
 
 
@@ -222,44 +209,19 @@ def get_student_session_timeslots(request: AuthenticatedRequest, company_id: int
     except StudentSessionApplication.DoesNotExist:
         return 404, "Application not found"
 
-    session = application.student_session
-
-    max_applications_per_slot: int = (
-        1 if session.session_type == SessionType.REGULAR else 1000_000_000
-    )
-
-    timeslots = (
-        StudentSessionTimeslot.objects.annotate(
-            num_selected_applications=Count("selected_applications")
+    # Served from the availability snapshot, so refreshing the list does not hit the database
+    result = [
+        TimeslotSchemaUser(
+            id=timeslot.id,
+            start_time=timeslot.start_time,
+            duration=timeslot.duration,
+            status="bookedByCurrentUser" if user_booked else "free",
+            booking_closes_at=timeslot.booking_closes_at,
         )
-        .filter(
-            Q(student_session__company_id=company_id)
-            & (
-                (
-                    Q(booking_closes_at__gte=timezone.now())
-                    | Q(booking_closes_at__isnull=True)
-                )
-                & Q(num_selected_applications__lt=max_applications_per_slot)
-                | Q(selected_applications=application)
-            )
-        )
-        .prefetch_related("selected_applications")
-        .all()
-    )
-    result = []
-    for timeslot in timeslots:
-        # Check if user has booked this timeslot
-        user_booked = timeslot.selected_applications.filter(id=application.id).exists()
-
-        result.append(
-            TimeslotSchemaUser(
-                id=timeslot.id,
-                start_time=timeslot.start_time,
-                duration=timeslot.duration,
-                status="bookedByCurrentUser" if user_booked else "free",
-                booking_closes_at=timeslot.booking_closes_at,
-            )
+        for timeslot, user_booked in timeslots_for_application(
+            application.student_session_id, application.id
         )
+    ]
 
     return 200, result
 
@@ -275,48 +237,40 @@ def confirm_student_session(
     """
 
     try:
-        with transaction.atomic():
-            try:
-                applicant = StudentSessionApplication.objects.get(
-                    student_session__company_id=company_id, user_id=request.user.id
-                )
-                if not applicant.is_accepted():
-                    return 409, "Applicant not accepted"
-            except StudentSessionApplication.DoesNotExist:
-                return 404, "Application not found"
-
-            session = applicant.student_session
-
-            timeslot: StudentSessionTimeslot = (
-                StudentSessionTimeslot.objects.select_for_update().get(
-                    Q(booking_closes_at__gte=timezone.now())
-                    | Q(booking_closes_at__isnull=True),
-                    id=timeslot_id,
-                    student_session=session,
-                )
-            )
-
-            # Check if user already has a booking for this session
-            existing_booking = StudentSessionTimeslot.objects.filter(
-                Q(student_session=session) & Q(selected_applications=applicant)
-            ).first()
-
-            if existing_booking:
-                return 409, "You have already booked a timeslot"
+        applicant = StudentSessionApplication.objects.get(
+            student_session__company_id=company_id, user_id=request.user.id
+        )
+    except StudentSessionApplication.DoesNotExist:
+        return 404, "Application not found"
+    if not applicant.is_accepted():
+        return 409, "Applicant not accepted"
 
-            # Check if timeslot is available based on session type
-            if not timeslot.is_available_for_application():
-                return 404, "Timeslot not found or already taken"
+    try:
+        timeslot: StudentSessionTimeslot = (
+            StudentSessionTimeslot.objects.select_related("student_session").get(
+                Q(booking_closes_at__gte=timezone.now())
+                | Q(booking_closes_at__isnull=True),
+                id=timeslot_id,
+                student_session_id=applicant.student_session_id,
+            )
+        )
+    except StudentSessionTimeslot.DoesNotExist:
+        return 404, "Timeslot not found or already taken"
 
-            # Add the selection using the model method
+    try:
+        with transaction.atomic():
+            # No locks, the constraints of TimeslotSelection reject the losing insert
+            # if the timeslot is taken or the student booked another timeslot meanwhile
             timeslot.add_selection(applicant)
             timeslot.time_booked = timezone.now()
-            timeslot.save()
-
-            return 200, "Student session confirmed"
-    except StudentSessionTimeslot.DoesNotExist:
+            timeslot.save(update_fields=["time_booked"])
+    except IntegrityError:
+        if TimeslotSelection.objects.filter(application=applicant).exists():
+            return 409, "You have already booked a timeslot"
         return 404, "Timeslot not found or already taken"
 
+    return 200, "Student session confirmed"
+
 
 @router.post("/unbook", response={200: str, 401: str, 404: str, 409: str})
 def unbook_student_session(request: AuthenticatedRequest, company_id: int):
@@ -334,26 +288,93 @@ def unbook_student_session(request: AuthenticatedRequest, company_id: int):
     except StudentSessionApplication.DoesNotExist:
         return 404, "Application not found"
 
-    # Find the timeslot booked by this application
-    timeslot = StudentSessionTimeslot.objects.filter(
-        Q(selected_applications=application)
-    ).first()
+    with transaction.atomic():
+        # Find the timeslot booked by this application
+        timeslot = StudentSessionTimeslot.objects.filter(
+            Q(selected_applications=application)
+        ).first()
 
-    if not timeslot:
-        return 404, "Timeslot not found or already taken"
+        if not timeslot:
+            return 404, "Timeslot not found or already taken"
 
+        if (
+            timeslot.booking_closes_at is not None
+            and timeslot.booking_closes_at <= timezone.now()
+        ):
+            return 409, "Unbooking period has expired"
+
+        # Remove the booking using the model method
+        timeslot.remove_selection(application)
+        timeslot.time_booked = None
+        timeslot.save(update_fields=["time_booked"])
+
+    return 200, "Student session unbooked"
+
+
+def _switch_timeslot(
+    user_id: int, data: SwitchStudentSessionTimeslot
+) -> tuple[int, str]:
+    # Both timeslots are locked by one query in id order, so students switching in
+    # opposite directions wait for each other instead of deadlocking
+    timeslots: dict[int, StudentSessionTimeslot] = {
+        timeslot.id: timeslot
+        for timeslot in StudentSessionTimeslot.objects.select_for_update(of=("self",))
+        .select_related("student_session")
+        .filter(id__in=sorted([data.from_timeslot_id, data.new_timeslot_id]))
+        .order_by("id")
+    }
+    now = timezone.now()
+
+    current_timeslot: StudentSessionTimeslot | None = timeslots.get(
+        data.from_timeslot_id
+    )
+    if current_timeslot is None:
+        return 404, "Student session timeslot not found"
     if (
-        timeslot.booking_closes_at is not None
-        and timeslot.booking_closes_at <= timezone.now()
+        current_timeslot.booking_closes_at is not None
+        and current_timeslot.booking_closes_at <= now
     ):
-        return 409, "Unbooking period has expired"
+        return (
+            409,
+            "Your current booking period has expired and cannot be modified",
+        )
 
-    # Remove the booking using the model method
-    timeslot.remove_selection(application)
-    timeslot.time_booked = None
-    timeslot.save()
+    new_timeslot: StudentSessionTimeslot | None = timeslots.get(data.new_timeslot_id)
+    if new_timeslot is None or (
+        new_timeslot.booking_closes_at is not None
+        and new_timeslot.booking_closes_at < now
+    ):
+        return (
+            404,
+            "New timeslot not found, already taken, or booking has closed",
+        )
 
-    return 200, "Student session unbooked"
+    # Check so that the student session connected to the new_timeslot is the same as the current_timeslot
+    if new_timeslot.student_session_id != current_timeslot.student_session_id:
+        return 409, "Timeslots belong to different student sessions"
+
+    try:
+        application: StudentSessionApplication = StudentSessionApplication.objects.get(
+            student_session_id=current_timeslot.student_session_id,
+            user_id=user_id,
+            status=ApplicationStatus.ACCEPTED,
+            selected_timeslots=current_timeslot,
+        )
+    except StudentSessionApplication.DoesNotExist:
+        return 404, "Application not found"
+
+    # The current booking is only given up if the insert of the new one succeeds,
+    # the constraints of TimeslotSelection reject it if the timeslot was taken.
+    # The reminders are replaced by add_selection, once the insert went through.
+    current_timeslot.selected_applications.remove(application)
+    current_timeslot.time_booked = None
+    current_timeslot.save(update_fields=["time_booked"])
+
+    new_timeslot.add_selection(application)
+    new_timeslot.time_booked = now
+    new_timeslot.save(update_fields=["time_booked"])
+
+    return 200, "Timeslot switched successfully"
 
 
 @router.post("/switch-timeslot", response={200: str, 401: str, 404: str, 409: str})
@@ -367,79 +388,15 @@ def switch_student_session_timeslot(
     preventing race conditions where the new timeslot might be taken by another user.
     """
 
-    try:
-        with transaction.atomic():
-            # Lock both timeslots to prevent race conditions
-            try:
-                current_timeslot: StudentSessionTimeslot = (
-                    StudentSessionTimeslot.objects.select_for_update().get(
-                        id=data.from_timeslot_id
-                    )
-                )
-            except StudentSessionTimeslot.DoesNotExist:
-                return 404, "Student session timeslot not found"
-
-            if (
-                current_timeslot.booking_closes_at is not None
-                and current_timeslot.booking_closes_at <= timezone.now()
-            ):
-                return (
-                    409,
-                    "Your current booking period has expired and cannot be modified",
-                )
-
-            # Check if trying to switch to the same timeslot
-            if current_timeslot.id == data.new_timeslot_id:
-                return 409, "You are already booked for this timeslot"
-
-            # Try to lock and book the new timeslot
-            try:
-                new_timeslot: StudentSessionTimeslot = (
-                    StudentSessionTimeslot.objects.select_for_update().get(
-                        Q(booking_closes_at__gte=timezone.now())
-                        | Q(booking_closes_at__isnull=True),
-                        id=data.new_timeslot_id,
-                    )
-                )
-
-                # Check if timeslot is available based on session type
-                if not new_timeslot.is_available_for_application():
-                    return 404, "Timeslot not found or already taken"
-
-            except StudentSessionTimeslot.DoesNotExist:
-                return (
-                    404,
-                    "New timeslot not found, already taken, or booking has closed",
-                )
-
-            # Check so that the student session connected to the new_timeslot is the same as the current_timeslot
-            if new_timeslot.student_session_id != current_timeslot.student_session_id:
-                return 409, "Timeslots belong to different student sessions"
-
-            try:
-                application: StudentSessionApplication = (
-                    StudentSessionApplication.objects.get(
-                        student_session_id=current_timeslot.student_session_id,
-                        user_id=request.user.id,
-                        status=ApplicationStatus.ACCEPTED,
-                    )
-                )
-            except StudentSessionApplication.DoesNotExist:
-                return 404, "Application not found"
-
-            # Perform the switch atomically
-            current_timeslot.selected_applications.remove(application)
-            current_timeslot.time_booked = None
-            current_timeslot.save()
-
-            new_timeslot.selected_applications.add(application)
-            new_timeslot.time_booked = timezone.now()
-            new_timeslot.save()
-
-            return 200, "Timeslot switched successfully"
+    # Check if trying to switch to the same timeslot
+    if data.from_timeslot_id == data.new_timeslot_id:
+        return 409, "You are already booked for this timeslot"
 
+    try:
+        # Deadlocks with bookings of other timeslots are still possible, those are retried
+        return atomic_with_retry(partial(_switch_timeslot, request.user.id, data))
     except IntegrityError:
-        return 409, "Failed to switch timeslot due to a database constraint violation"
+        return 404, "Timeslot not found or already taken"
 
 
 @router.post("/apply", response={404: str, 409: str, 200: str})
@@ -0,0 +1,152 @@
+"""
+Availability snapshot of the timeslots of a student session, served by
+GET /api/student-session/timeslots.
+
+Right after the timeslots are released every accepted student refreshes the list, while only
+a few of them book at the same moment. The snapshot holds each timeslot of a session with a
+taken flag and which application booked which timeslot, so the list of a student is answered
+from the cache and the lookup of their application.
+
+Every change to the bookings or the schedule of a session bumps its version immediately and on
+commit, and the committing transaction rebuilds the snapshot for the new version with one query.
+A snapshot is only stored under a version after that version was set, so it always includes
+every change that bumped an earlier version. Readers that miss rebuild it the same way.
+"""
+
+import datetime
+import time
+from functools import partial
+from typing import NamedTuple
+
+from django.core.cache import cache
+from django.db import transaction
+from django.utils import timezone
+
+from arkad.utils import cache_namespace
+from student_sessions.models import SessionType, StudentSessionTimeslot
+
+SNAPSHOT_TTL_SECONDS: int = 60 * 60
+
+
+class TimeslotAvailability(NamedTuple):
+    id: int
+    start_time: datetime.datetime
+    duration: int
+    booking_closes_at: datetime.datetime | None
+    # Regular sessions take one booking per timeslot, company events any number
+    taken: bool
+
+
+class AvailabilitySnapshot(NamedTuple):
+    timeslots: list[TimeslotAvailability]
+    # Application id to the id of the timeslot it booked
+    booked: dict[int, int]
+
+
+def _version_key(session_id: int) -> str:
+    return f"student-sessions:{cache_namespace()}:availability-version:{session_id}"
+
+
+def _snapshot_key(session_id: int, version: int) -> str:
+    return f"student-sessions:{cache_namespace()}:availability:{session_id}:{version}"
+
+
+def _get_version(session_id: int) -> int:
+    key: str = _version_key(session_id)
+    version: int | None = cache.get(key)
+    if version is None:
+        version = time.time_ns()
+        if not cache.add(key, version, timeout=None):
+            version = cache.get(key, version)
+    assert version is not None
+    return version
+
+
+def build_snapshot(session_id: int) -> AvailabilitySnapshot:
+    """Reads the timeslots of the session together with their bookings in one query."""
+    rows = (
+        StudentSessionTimeslot.objects.filter(student_session_id=session_id)
+        .order_by("start_time", "id")
+        .values_list(
+            "id",
+            "start_time",
+            "duration",
+            "booking_closes_at",
+            "student_session__session_type",
+            "selected_applications",
+        )
+    )
+    timeslots: dict[int, TimeslotAvailability] = {}
+    booked: dict[int, int] = {}
+    for (
+        timeslot_id,
+        start_time,
+        duration,
+        booking_closes_at,
+        session_type,
+        application_id,
+    ) in rows:
+        if timeslot_id not in timeslots:
+            timeslots[timeslot_id] = TimeslotAvailability(
+                timeslot_id, start_time, duration, booking_closes_at, False
+            )
+        if application_id is not None:
+            booked[application_id] = timeslot_id
+            if session_type == SessionType.REGULAR:
+                timeslots[timeslot_id] = timeslots[timeslot_id]._replace(taken=True)
+    return AvailabilitySnapshot(list(timeslots.values()), booked)
+
+
+def _store_snapshot(session_id: int, version: int) -> AvailabilitySnapshot:
+    snapshot: AvailabilitySnapshot = build_snapshot(session_id)
+    cache.set(
+        _snapshot_key(session_id, version), snapshot, timeout=SNAPSHOT_TTL_SECONDS
+    )
+    return snapshot
+
+
+def get_snapshot(session_id: int) -> AvailabilitySnapshot:
+    """The availability of the timeslots of the session, from the cache when possible."""
+    version: int = _get_version(session_id)
+    snapshot: AvailabilitySnapshot | None = cache.get(
+        _snapshot_key(session_id, version)
+    )
+    if snapshot is None:
+        snapshot = _store_snapshot(session_id, version)
+    return snapshot
+
+
+def _refresh(session_id: int) -> None:
+    version: int = time.time_ns()
+    cache.set(_version_key(session_id), version, timeout=None)
+    _store_snapshot(session_id, version)
+
+
+def availability_changed(session_id: int) -> None:
+    """Call when bookings or timeslots of the session changed."""
+    cache.set(_version_key(session_id), time.time_ns(), timeout=None)
+    # The booking is already committed, a cache hiccup must not fail it
+    transaction.on_commit(partial(_refresh, session_id), robust=True)
+
+
+def timeslots_for_application(
+    session_id: int, application_id: int
+) -> list[tuple[TimeslotAvailability, bool]]:
+    """
+    The timeslots the application can see, paired with whether it booked them: its own
+    booking and every timeslot that is not taken and still open for booking.
+    """
+    snapshot: AvailabilitySnapshot = get_snapshot(session_id)
+    booked_id: int | None = snapshot.booked.get(application_id)
+    now: datetime.datetime = timezone.now()
+    return [
+        (timeslot, timeslot.id == booked_id)
+        for timeslot in snapshot.timeslots
+        if timeslot.id == booked_id
+        or (
+            not timeslot.taken
+            and (
+                timeslot.booking_closes_at is None or timeslot.booking_closes_at >= now
+            )
+        )
+    ]
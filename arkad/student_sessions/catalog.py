@@ -0,0 +1,116 @@
+"""
+Shared catalog of student sessions served by GET /api/student-session/all.
+
+Like the event catalog, the sessions are the same for every user apart from the status of
+their own application. Each session is serialized once (which includes validating the
+field_modifications JSON) and cached, and each request only appends the user's statuses from
+one values_list query. The cache is versioned and the version is bumped when a session is
+saved or deleted, both immediately and on commit.
+"""
+
+import json
+import time
+from typing import NamedTuple
+
+from django.core.cache import cache
+from django.db import transaction
+from django.http import HttpResponse
+from ninja.responses import NinjaJSONEncoder
+
+from arkad.utils import cache_namespace
+from student_sessions.models import StudentSession, StudentSessionApplication
+from student_sessions.schema import StudentSessionNormalUserSchema
+
+CATALOG_TTL_SECONDS: int = 60 * 60
+
+
+class CatalogEntry(NamedTuple):
+    session_id: int
+    # Serialized StudentSessionNormalUserSchema without the user status and closing brace
+    json_prefix: str
+
+
+def _version_key() -> str:
+    return f"student-sessions:{cache_namespace()}:catalog-version"
+
+
+def _catalog_key(version: int) -> str:
+    return f"student-sessions:{cache_namespace()}:catalog:{version}"
+
+
+def _get_catalog_version() -> int:
+    key: str = _version_key()
+    version: int | None = cache.get(key)
+    if version is None:
+        version = time.time_ns()
+        if not cache.add(key, version, timeout=None):
+            version = cache.get(key, version)
+    assert version is not None
+    return version
+
+
+def _serialize_session(s: StudentSession) -> CatalogEntry:
+    data: dict[str, object] = StudentSessionNormalUserSchema(
+        company_id=s.company_id,
+        booking_close_time=s.booking_close_time,
+        id=s.id,
+        available=True,
+        field_modifications=s.field_modifications,
+        description=s.description,
+        disclaimer=s.disclaimer,
+        booking_open_time=s.booking_open_time,
+        session_type=s.session_type,  # type: ignore[arg-type]  # A SessionType value
+        location=s.location,
+        name=s.name,
+        company_event_at=s.company_event_at,  # For now, we do not check if actually company event
+    ).model_dump(by_alias=True)
+    del data["userStatus"]
+    serialized: str = json.dumps(data, cls=NinjaJSONEncoder)
+    return CatalogEntry(s.id, serialized[:-1])
+
+
+def get_session_catalog() -> list[CatalogEntry]:
+    """Returns every student session ordered by id, built at most once per change."""
+    version: int = _get_catalog_version()
+    catalog: list[CatalogEntry] | None = cache.get(_catalog_key(version))
+    if catalog is None:
+        catalog = [_serialize_session(s) for s in StudentSession.objects.order_by("id")]
+        cache.set(_catalog_key(version), catalog, timeout=CATALOG_TTL_SECONDS)
+    return catalog
+
+
+def invalidate_session_catalog() -> None:
+    """Call whenever a student session is created, changed or deleted."""
+
+    def bump() -> None:
+        cache.set(_version_key(), time.time_ns(), timeout=None)
+
+    bump()
+    transaction.on_commit(bump)
+
+
+def get_application_statuses(user_id: int) -> dict[int, str]:
+    """Maps student session ids to the status of the user's application to it."""
+    return dict(
+        StudentSessionApplication.objects.filter(user_id=user_id).values_list(
+            "student_session_id", "status"
+        )
+    )
+
+
+def render_session_catalog(statuses: dict[int, str]) -> HttpResponse:
+    """
+    Renders the catalog as a StudentSessionNormalUserListSchema, with `statuses` mapping
+    session ids to the status of the requesting user's application (defaults to null).
+    """
+    catalog: list[CatalogEntry] = get_session_catalog()
+    parts: list[str] = [
+        f'{entry.json_prefix}, "userStatus": {json.dumps(statuses.get(entry.session_id))}}}'
+        for entry in catalog
+    ]
+    return HttpResponse(
+        '{"studentSessions": ['
+        + ", ".join(parts)
+        + f'], "numElements": {len(catalog)}}}',
+        content_type="application/json; charset=utf-8",
+    )
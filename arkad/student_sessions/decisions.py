@@ -0,0 +1,148 @@
+"""
+Decisions on student session applications, taken by companies through
+PUT /api/student-session/exhibitor/update-application-status and by the staff through the admin
+actions and the CSV import.
+
+A company accepting its students from the admin or a file decides hundreds of applications at
+once, so apply_decisions() sets the status of all of them with one UPDATE ... RETURNING,
+books the accepted students of a company event onto its timeslot with one insert per session
+and enqueues one background job that schedules their reminders and notifies every student of
+the decision, which takes a broker message or an email each.
+"""
+
+from collections import defaultdict
+from functools import partial
+from typing import Any, Iterable, Mapping
+
+from django.db import connection, transaction
+
+from student_sessions.models import (
+    COMPANY_EVENT_DEFAULT_DURATION,
+    ApplicationStatus,
+    SessionType,
+    StudentSession,
+    StudentSessionApplication,
+    StudentSessionTimeslot,
+    TimeslotSelection,
+)
+from student_sessions.tasks import send_application_decisions
+from user_models.agenda import invalidate_agendas
+
+DECISIONS: tuple[str, ...] = (ApplicationStatus.ACCEPTED, ApplicationStatus.REJECTED)
+
+
+def decide_applications(
+    application_ids: Iterable[int], status: str, *, pending_only: bool = False
+) -> list[int]:
+    """
+    Accepts or rejects the applications, those that already have the status (or any decision
+    when `pending_only` is set) are left as they are.
+    Returns the ids of the applications that were changed by this call.
+    """
+    return sorted(
+        apply_decisions(
+            dict.fromkeys(application_ids, status), pending_only=pending_only
+        )
+    )
+
+
+def apply_decisions(
+    decisions: Mapping[int, str], *, pending_only: bool = False
+) -> dict[int, str]:
+    """
+    Sets the status of each application id to its decision, like decide_applications() but
+    accepting some and rejecting others in the same statement and background job.
+    Returns the decisions that changed an application.
+    """
+    assert set(decisions.values()) <= set(DECISIONS), "Can only accept or reject"
+    if not decisions:
+        return {}
+
+    query: str = (
+        f"UPDATE {connection.ops.quote_name(StudentSessionApplication._meta.db_table)} AS a "
+        "SET status = d.status FROM unnest(%s::bigint[], %s::text[]) AS d(id, status) "
+        "WHERE a.id = d.id AND a.status <> d.status"
+    )
+    params: list[Any] = [list(decisions), list(decisions.values())]
+    if pending_only:
+        query += " AND a.status = %s"
+        params.append(ApplicationStatus.PENDING)
+    query += " RETURNING a.id, a.student_session_id, a.user_id, a.status"
+
+    with transaction.atomic():
+        with connection.cursor() as cursor:
+            cursor.execute(query, params)
+            rows: list[tuple[int, int, int, str]] = cursor.fetchall()
+        if not rows:
+            return {}
+
+        accepted: dict[int, list[int]] = defaultdict(list)
+        by_status: dict[str, list[int]] = defaultdict(list)
+        for application_id, session_id, _, status in rows:
+            by_status[status].append(application_id)
+            if status == ApplicationStatus.ACCEPTED:
+                accepted[session_id].append(application_id)
+        _book_company_events(accepted)
+
+        # The update bypasses post_save, which usually drops the agendas
+        invalidate_agendas(user_id for _, _, user_id, _ in rows)
+
+        transaction.on_commit(
+            partial(
+                send_application_decisions.delay,
+                {status: sorted(ids) for status, ids in by_status.items()},
+            )
+        )
+    return {application_id: status for application_id, _, _, status in rows}
+
+
+def _book_company_events(accepted: dict[int, list[int]]) -> None:
+    """
+    Books the accepted applications of company events onto the timeslot of the event, which
+    is created for the first one. Applications booked before (accepted earlier) keep their booking.
+    The reminders of the bookings are scheduled by the background job.
+    """
+    if not accepted:
+        return
+    sessions: list[StudentSession] = list(
+        StudentSession.objects.filter(
+            id__in=accepted, session_type=SessionType.COMPANY_EVENT
+        ).order_by("id")
+    )
+    if not sessions:
+        return
+    already_booked: set[int] = set(
+        TimeslotSelection.objects.filter(
+            application_id__in=[
+                application_id
+                for session in sessions
+                for application_id in accepted[session.id]
+            ]
+        ).values_list("application_id", flat=True)
+    )
+    for session in sessions:
+        applications: list[StudentSessionApplication] = list(
+            StudentSessionApplication.objects.filter(
+                id__in=[
+                    application_id
+                    for application_id in accepted[session.id]
+                    if application_id not in already_booked
+                ]
+            )
+        )
+        if not applications:
+            continue
+        timeslot, _ = StudentSessionTimeslot.objects.select_for_update().get_or_create(
+            student_session=session,
+            start_time=session.company_event_at,
+            defaults={"duration": COMPANY_EVENT_DEFAULT_DURATION},
+        )
+        TimeslotSelection.objects.bulk_create(
+            TimeslotSelection(
+                timeslot=timeslot, application=application, exclusive=False
+            )
+            for application in applications
+        )
+        TimeslotSelection.send_added(
+            timeslot, {application.id for application in applications}
+        )
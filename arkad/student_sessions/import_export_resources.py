@@ -1,8 +1,12 @@
 from typing import Any
 
+from django.db.models import QuerySet
 from import_export import resources, fields, widgets
+from import_export.instance_loaders import CachedInstanceLoader
 
 from arkad.settings import make_local_time
+from user_models.agenda import invalidate_agendas
+from .decisions import DECISIONS, apply_decisions
 from .models import StudentSessionApplication
 
 
@@ -32,6 +36,8 @@ class StudentSessionApplicationResource(resources.ModelResource):  # type: ignor
     def __init__(self, *args: Any, **kwargs: Any):
         self.request = kwargs.pop("request", None)
         super().__init__()
+        # Application ids to the status they are accepted or rejected with by the import
+        self.decisions: dict[int, str] = {}
 
     # The only mutable field "status"
     status = fields.Field(
@@ -90,17 +96,15 @@ class StudentSessionApplicationResource(resources.ModelResource):  # type: ignor
             return str(cv_file.url)
         return ""
 
-    def before_import_row(self, row: dict[str, Any], **kwargs: Any) -> None:
-        """
-        Store the original status before import to detect changes.
-        """
-        instance_id = row.get("id")
-        if instance_id:
-            try:
-                instance = StudentSessionApplication.objects.get(id=instance_id)
-                row["_original_status"] = instance.status
-            except StudentSessionApplication.DoesNotExist:
-                pass
+    def get_queryset(self) -> QuerySet[StudentSessionApplication]:
+        # The export and the import preview show the user and company of every row, the
+        # session is only passed through and its field_modifications are costly to parse
+        return StudentSessionApplication.objects.select_related(
+            "user", "student_session__company"
+        ).defer("student_session__field_modifications")
+
+    def before_import(self, dataset: Any, **kwargs: Any) -> None:
+        self.decisions = {}
 
     def save_instance(
         self,
@@ -110,54 +114,32 @@ class StudentSessionApplicationResource(resources.ModelResource):  # type: ignor
         **kwargs: Any,
     ) -> None:
         """
-        Override save_instance to store the original status before saving.
+        Collects the accepted and rejected applications to decide them together after the
+        import, any other status change is bulk updated.
         """
-        # Store original status on the instance for later use
-        if instance.pk and not is_create:
-            try:
-                original = StudentSessionApplication.objects.get(pk=instance.pk)
-                instance._original_status = original.status  # type: ignore[attr-defined]
-            except StudentSessionApplication.DoesNotExist:
-                instance._original_status = None  # type: ignore[attr-defined]
+        if not is_create and instance.status in DECISIONS:
+            self.decisions[instance.pk] = instance.status
         else:
-            instance._original_status = row.get("_original_status")  # type: ignore[attr-defined]
+            super().save_instance(instance, is_create, row, **kwargs)
 
-        # Get dry_run from kwargs
-        dry_run = kwargs.get("dry_run", False)
+    def get_bulk_update_fields(self) -> list[str]:
+        return ["status"]
 
-        # Don't call accept()/deny() here as they will save()
-        # Just update the status field directly
-        if not dry_run:
-            instance.save()
-        self.custom_after_save_instance(instance, dry_run)
+    def bulk_update(self, *args: Any, **kwargs: Any) -> None:
+        # bulk_update bypasses post_save, which usually drops the agendas
+        invalidate_agendas(instance.user_id for instance in self.update_instances)
+        super().bulk_update(*args, **kwargs)
 
-    @staticmethod
-    def custom_after_save_instance(
-        instance: StudentSessionApplication,
-        dry_run: bool = False,
-        **kwargs: Any,
-    ) -> None:
+    def after_import(self, dataset: Any, result: Any, **kwargs: Any) -> None:
         """
-        Call accept() or deny() method when status changes during import.
-        This ensures the proper logic (like creating timeslots) is executed.
+        Accepts and rejects the collected applications with one statement, which also books
+        company events and notifies the students in one background job.
+        A dry run only previews, so it leaves the decisions alone.
         """
-
-        if dry_run:
-            return
-
-        # Get the new status from the instance
-        new_status = instance.status
-
-        # Get the original status if it was stored
-        original_status = getattr(instance, "_original_status", None)
-
-        # If status changed to accepted, call accept() method
-        if new_status == "accepted" and original_status != "accepted":
-            instance.accept()
-        # If status changed to rejected, call deny() method
-        elif new_status == "rejected" and original_status != "rejected":
-            # Send email
-            instance.deny()
+        super().after_import(dataset, result, **kwargs)
+        if not kwargs.get("dry_run", False):
+            apply_decisions(self.decisions)
+        self.decisions = {}
 
     class Meta:
         model = StudentSessionApplication
@@ -165,6 +147,10 @@ class StudentSessionApplicationResource(resources.ModelResource):  # type: ignor
         # This is the key for matching records during import.
         # We use the application's unique ID.
         import_id_fields = ("id",)
+        # Load the applications of every row with one query
+        instance_loader_class = CachedInstanceLoader
+        # Write the changes together instead of per row
+        use_bulk = True
 
         # Define the fields to be included in the export/import file.
         # 'id' is crucial for matching records on import.
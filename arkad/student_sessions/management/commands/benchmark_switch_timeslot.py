@@ -0,0 +1,196 @@
+import contextlib
+import multiprocessing
+import time
+from concurrent.futures import ProcessPoolExecutor
+from datetime import timedelta
+from functools import partial
+from types import SimpleNamespace
+from typing import Any, Callable
+
+from django.contrib.auth.hashers import make_password
+from django.core.management import BaseCommand, CommandParser
+from django.db import DatabaseError, connections, transaction
+from django.test import override_settings
+from django.utils import timezone
+
+from companies.models import Company
+from student_sessions.api import switch_student_session_timeslot
+from student_sessions.models import (
+    ApplicationStatus,
+    SessionType,
+    StudentSession,
+    StudentSessionApplication,
+    StudentSessionTimeslot,
+)
+from student_sessions.schema import SwitchStudentSessionTimeslot
+from user_models.models import User
+
+
+def legacy_switch(user: User, data: SwitchStudentSessionTimeslot) -> int:
+    """The previous switch-timeslot path, which locks the timeslots in request order."""
+    with transaction.atomic():
+        current: StudentSessionTimeslot = (
+            StudentSessionTimeslot.objects.select_for_update().get(
+                id=data.from_timeslot_id
+            )
+        )
+        new: StudentSessionTimeslot = (
+            StudentSessionTimeslot.objects.select_for_update().get(
+                id=data.new_timeslot_id
+            )
+        )
+        application: StudentSessionApplication = StudentSessionApplication.objects.get(
+            student_session_id=current.student_session_id,
+            user_id=user.id,
+            status=ApplicationStatus.ACCEPTED,
+        )
+        current.selected_applications.remove(application)
+        current.time_booked = None
+        current.save(update_fields=["time_booked"])
+        new.add_selection(application)
+        new.time_booked = timezone.now()
+        new.save(update_fields=["time_booked"])
+        return 200
+
+
+def ordered_switch(user: User, data: SwitchStudentSessionTimeslot) -> int:
+    status, _ = switch_student_session_timeslot(SimpleNamespace(user=user), data)  # type: ignore[arg-type]
+    return int(status)
+
+
+def switch_back_and_forth(
+    switch: Callable[[User, SwitchStudentSessionTimeslot], int],
+    rounds: int,
+    student: tuple[User, int, int],
+) -> list[tuple[int, float]]:
+    """Moves the student between their two timeslots over the worker's own connection."""
+    user, current, other = student
+    timings: list[tuple[int, float]] = []
+    for _ in range(rounds):
+        data = SwitchStudentSessionTimeslot(
+            from_timeslot_id=current, new_timeslot_id=other
+        )
+        start: float = time.perf_counter()
+        try:
+            status: int = switch(user, data)
+        except DatabaseError:  # Deadlocks surface as server errors
+            status = 500
+        timings.append((status, time.perf_counter() - start))
+        if status == 200:
+            current, other = other, current
+    return timings
+
+
+class Command(BaseCommand):
+    help = (
+        "Lets pairs of students swap timeslots in opposite directions at the same time and "
+        "compares the p99 latency of the previous request-order locking of switch-timeslot "
+        "with the sorted locking and retries. "
+        "Creates (and removes) its own session, timeslots and users in the configured database."
+    )
+
+    def add_arguments(self, parser: CommandParser) -> None:
+        parser.add_argument(
+            "--pairs",
+            type=int,
+            default=8,
+            help="Pairs of students swapping, each student is its own process.",
+        )
+        parser.add_argument(
+            "--rounds", type=int, default=50, help="Switches per student."
+        )
+        parser.add_argument(
+            "--with-notifications",
+            action="store_true",
+            help="Also queue the timeslot reminders (requires a Celery broker).",
+        )
+
+    def handle(self, *args: Any, **options: Any) -> None:
+        prefix: str = f"benchmark-switch-{time.time_ns()}"
+        users: list[User] = User.objects.bulk_create(
+            User(username=f"{prefix}-{i}", password=make_password(None))
+            for i in range(2 * options["pairs"])
+        )
+        company: Company = Company.objects.create(name=prefix)
+        try:
+            with (
+                contextlib.nullcontext()
+                if options["with_notifications"]
+                else override_settings(REMINDER_ENGINE="sweeper")
+            ):
+                for name, switch in (
+                    ("request order (previous)", legacy_switch),
+                    ("sorted order with retries", ordered_switch),
+                ):
+                    self._run(name, switch, company, users, options)
+        finally:
+            company.delete()
+            User.objects.filter(username__startswith=prefix).delete()
+
+    def _run(
+        self,
+        name: str,
+        switch: Callable[[User, SwitchStudentSessionTimeslot], int],
+        company: Company,
+        users: list[User],
+        options: dict[str, Any],
+    ) -> None:
+        now = timezone.now()
+        # Timeslots of company events take any number of students, so every swap can succeed
+        session: StudentSession = StudentSession.objects.create(
+            company=company,
+            session_type=SessionType.COMPANY_EVENT,
+            company_event_at=now + timedelta(days=30),
+            booking_open_time=now - timedelta(days=1),
+            booking_close_time=now + timedelta(days=1),
+        )
+        timeslots: list[StudentSessionTimeslot] = [
+            StudentSessionTimeslot.objects.create(
+                student_session=session,
+                start_time=now + timedelta(days=30, minutes=30 * i),
+                booking_closes_at=now + timedelta(days=1),
+            )
+            for i in range(len(users))
+        ]
+        students: list[tuple[User, int, int]] = []
+        for i, user in enumerate(users):
+            # The students of a pair start on each other's target
+            current, other = timeslots[i], timeslots[i ^ 1]
+            current.selected_applications.add(
+                StudentSessionApplication.objects.create(
+                    user=user,
+                    student_session=session,
+                    status=ApplicationStatus.ACCEPTED,
+                )
+            )
+            students.append((user, current.id, other.id))
+
+        # Separate processes so the database, not the interpreter lock, is what is measured
+        connections.close_all()
+        try:
+            start: float = time.perf_counter()
+            with ProcessPoolExecutor(
+                max_workers=len(students),
+                mp_context=multiprocessing.get_context("fork"),
+                initializer=connections.close_all,
+            ) as executor:
+                results: list[tuple[int, float]] = [
+                    timing
+                    for timings in executor.map(
+                        partial(switch_back_and_forth, switch, options["rounds"]),
+                        students,
+                    )
+                    for timing in timings
+                ]
+            elapsed: float = time.perf_counter() - start
+
+            switched: int = sum(1 for status, _ in results if status == 200)
+            errors: int = sum(1 for status, _ in results if status == 500)
+            latencies: list[float] = sorted(latency for _, latency in results)
+            p99: float = latencies[max(0, int(len(latencies) * 0.99) - 1)]
+            self.stdout.write(
+                f"{name:28} {len(results) / elapsed:8.1f} switches/s, "
+                f"p99 {p99 * 1000:7.1f} ms, {switched} switched, {errors} failed"
+            )
+        finally:
+            session.delete()
@@ -0,0 +1,20 @@
+# Generated by Django 5.2.7 on 2026-10-17 02:03
+
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('notifications', '0009_sentreminder'),
+        ('student_sessions', '0033_alter_studentsession_notify_registration_open_and_more'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='studentsessionapplication',
+            index=models.Index(fields=['student_session', 'id'], name='student_ses_student_b9f5fa_idx'),
+        ),
+    ]
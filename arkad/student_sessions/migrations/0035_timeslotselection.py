@@ -0,0 +1,63 @@
+# Generated by Django 5.2.7 on 2026-10-17 09:12
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+def mark_regular_selections(apps, schema_editor):
+    TimeslotSelection = apps.get_model("student_sessions", "TimeslotSelection")
+    TimeslotSelection.objects.exclude(
+        timeslot__student_session__session_type="regular"
+    ).update(exclusive=False)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('student_sessions', '0034_studentsessionapplication_session_id_index'),
+    ]
+
+    operations = [
+        # Take over the table of the implicit many-to-many as it is
+        migrations.SeparateDatabaseAndState(
+            state_operations=[
+                migrations.CreateModel(
+                    name='TimeslotSelection',
+                    fields=[
+                        ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                        ('timeslot', models.ForeignKey(db_column='studentsessiontimeslot_id', on_delete=django.db.models.deletion.CASCADE, to='student_sessions.studentsessiontimeslot')),
+                        ('application', models.ForeignKey(db_column='studentsessionapplication_id', on_delete=django.db.models.deletion.CASCADE, to='student_sessions.studentsessionapplication')),
+                    ],
+                    options={
+                        'db_table': 'student_sessions_studentsessiontimeslot_selected_applications',
+                        'unique_together': {('timeslot', 'application')},
+                    },
+                ),
+                migrations.AlterField(
+                    model_name='studentsessiontimeslot',
+                    name='selected_applications',
+                    field=models.ManyToManyField(blank=True, help_text='Selected applications for this timeslot - supports multiple for company events', related_name='selected_timeslots', through='student_sessions.TimeslotSelection', to='student_sessions.studentsessionapplication'),
+                ),
+            ],
+            database_operations=[],
+        ),
+        migrations.AddField(
+            model_name='timeslotselection',
+            name='exclusive',
+            field=models.BooleanField(default=True, help_text='Set for timeslots of regular sessions, which take one booking'),
+        ),
+        migrations.RunPython(mark_regular_selections, migrations.RunPython.noop),
+        # Implied by one_timeslot_per_application
+        migrations.AlterUniqueTogether(
+            name='timeslotselection',
+            unique_together=set(),
+        ),
+        migrations.AddConstraint(
+            model_name='timeslotselection',
+            constraint=models.UniqueConstraint(fields=('application',), name='one_timeslot_per_application'),
+        ),
+        migrations.AddConstraint(
+            model_name='timeslotselection',
+            constraint=models.UniqueConstraint(condition=models.Q(('exclusive', True)), fields=('timeslot',), name='one_application_per_regular_timeslot'),
+        ),
+    ]
@@ -1,12 +1,12 @@
 import datetime
 from datetime import timedelta
 from functools import partial
-from typing import Any
+from typing import Any, Iterable
 
 from django.core.exceptions import ValidationError
-from django.db import models, transaction
+from django.db import models
 from django.db.models import UniqueConstraint
-from django.db.models.signals import m2m_changed
+from django.db.models.signals import m2m_changed, post_delete, post_save
 from django.dispatch import receiver
 from django.utils import timezone
 from arkad.defaults import (
@@ -14,9 +14,14 @@ from arkad.defaults import (
     STUDENT_SESSIONS_CLOSE_UTC,
     STUDENT_TIMESLOT_BOOKING_CLOSE_UTC,
 )
+from arkad.field_tracking import TrackedFieldsModel
 from arkad.settings import APP_BASE_URL
 from arkad.utils import unique_file_upload_path
-from notifications.models import ScheduledCeleryTasks, Notification
+from notifications.models import (
+    Notification,
+    ScheduledCeleryTasks,
+    reminder_sweeper_enabled,
+)
 from student_sessions.dynamic_fields import FieldModificationSchema
 from user_models.models import User
 from companies.models import Company
@@ -90,37 +95,41 @@ class StudentSessionApplication(models.Model):
                 name="unique_student_session_motivation",
             )
         ]
+        # Keyset pagination of the applicants to a session
+        indexes = [models.Index(fields=["student_session", "id"])]
 
     def __str__(self) -> str:
         return f"Application by {self.user} to {self.student_session.company.name}"
 
     def accept(self) -> None:
-        self.status = ApplicationStatus.ACCEPTED
-        try:
-            # For company events, automatically create a timeslot if it doesn't exist
-            if self.student_session.session_type == SessionType.COMPANY_EVENT:
-                with transaction.atomic():
-                    timeslot, created = (
-                        StudentSessionTimeslot.objects.select_for_update().get_or_create(
-                            student_session=self.student_session,
-                            start_time=self.student_session.company_event_at,
-                            defaults={
-                                "duration": COMPANY_EVENT_DEFAULT_DURATION,  # 8 hours in minutes
-                            },
-                        )
-                    )
-                    # Automatically add this application to the timeslot
-                    timeslot.add_selection(self)
+        """Accepts the application, see student_sessions.decisions."""
+        from student_sessions.decisions import (
+            decide_applications,
+        )  # Avoid circular import
 
-            from notifications.models import Notification  # Avoid circular import
+        decide_applications([self.id], ApplicationStatus.ACCEPTED)
+        self.refresh_from_db()
 
+    def deny(self) -> None:
+        """Rejects the application, see student_sessions.decisions."""
+        from student_sessions.decisions import (
+            decide_applications,
+        )  # Avoid circular import
+
+        decide_applications([self.id], ApplicationStatus.REJECTED)
+        self.refresh_from_db()
+
+    def decision_notification(self) -> Notification:
+        """The unsaved notification telling the student that the application was accepted or rejected."""
+        company_name: str = self.student_session.company.name
+        if self.is_accepted():
             link = f"{APP_BASE_URL}/sessions/book/{self.student_session.company.id if self.student_session.company else ''}"
-            Notification.objects.create(
+            return Notification(
                 target_user=self.user,
-                title=f"Your application to {self.student_session.company.name} has been accepted",
-                body=f"Congratulations! Your application to {self.student_session.company.name} has been accepted."
+                title=f"Your application to {company_name} has been accepted",
+                body=f"Congratulations! Your application to {company_name} has been accepted."
                 f" Timeslots are already released so hurry up and enter the app and book your spot!",
-                email_body=f"Congratulations! Your application to {self.student_session.company.name} has been accepted.\n\nTimeslots are already released so hurry up and enter the app and book your spot!\n They follow first come first served principle.",
+                email_body=f"Congratulations! Your application to {company_name} has been accepted.\n\nTimeslots are already released so hurry up and enter the app and book your spot!\n They follow first come first served principle.",
                 greeting=f"Hi {self.user.first_name},",
                 heading="Application Accepted",
                 button_text="View Session",
@@ -130,19 +139,10 @@ class StudentSessionApplication(models.Model):
                 email_sent=True,
                 fcm_sent=True,
             )
-        except Exception as e:
-            raise e
-        finally:
-            self.save()
-
-    def deny(self) -> None:
-        self.status = ApplicationStatus.REJECTED
-        self.save()
-
-        Notification.objects.create(
+        return Notification(
             target_user=self.user,
-            title=f"Your application to {self.student_session.company.name} has been sadly been rejected",
-            body=f"We regret to inform you that your application to {self.student_session.company.name} has been rejected.",
+            title=f"Your application to {company_name} has been sadly been rejected",
+            body=f"We regret to inform you that your application to {company_name} has been rejected.",
             email_sent=True,
             fcm_sent=False,  # No FCM for rejection
         )
@@ -166,60 +166,163 @@ class StudentSessionApplication(models.Model):
             self.cv.delete(save=False)
         return super().delete(*args, **kwargs)
 
-    def schedule_notifications(
+    NOTIFICATION_FIELDS: tuple[str, ...] = (
+        "notify_timeslot_tomorrow",
+        "notify_timeslot_in_one_hour",
+        "notify_timeslot_booking_closes_tomorrow",
+    )
+
+    def _notification_tasks(
         self,
         start_time: datetime.datetime,
         unbook_closes_at: datetime.datetime,
         timeslot_id: int,
-    ) -> None:
-        # You have registered for YYY with XXX is tomorrow/ in one hour
-        assert self.is_accepted(), (
-            "Can only schedule notifications for accepted applications"
-        )
+    ) -> list[tuple[str, Any, datetime.datetime, list[Any]]]:
+        """(field, task, eta, arguments) of the reminders still ahead for a booked timeslot."""
         from notifications import tasks
 
-        self.remove_notifications()  # Make sure to not duplicate tasks
+        if reminder_sweeper_enabled():
+            return []  # Sent by the reminder sweeper instead
 
+        now: datetime.datetime = timezone.now()
+        notification_tasks: list[tuple[str, Any, datetime.datetime, list[Any]]] = []
+
+        # You have registered for YYY with XXX is tomorrow/ in one hour
         eta1 = start_time - timedelta(hours=24)
-        if eta1 > timezone.now():
-            self.notify_timeslot_tomorrow = ScheduledCeleryTasks.schedule_task(
-                task_function=tasks.notify_student_session_tomorrow,
-                eta=eta1,
-                arguments=[self.user.id, self.student_session.id, timeslot_id],
+        if eta1 > now:
+            notification_tasks.append(
+                (
+                    "notify_timeslot_tomorrow",
+                    tasks.notify_student_session_tomorrow,
+                    eta1,
+                    [self.user_id, self.student_session_id, timeslot_id],
+                )
             )
-
         eta2 = start_time - timedelta(hours=1)
-        if eta2 > timezone.now():
-            self.notify_timeslot_in_one_hour = ScheduledCeleryTasks.schedule_task(
-                task_function=tasks.notify_student_session_one_hour,
-                eta=eta2,
-                arguments=[self.user.id, self.student_session.id, timeslot_id],
+        if eta2 > now:
+            notification_tasks.append(
+                (
+                    "notify_timeslot_in_one_hour",
+                    tasks.notify_student_session_one_hour,
+                    eta2,
+                    [self.user_id, self.student_session_id, timeslot_id],
+                )
             )
         eta3 = unbook_closes_at - timedelta(days=1)
-        if eta3 > timezone.now():
-            self.notify_timeslot_booking_closes_tomorrow = ScheduledCeleryTasks.schedule_task(
-                task_function=tasks.notify_student_session_timeslot_booking_freezes_tomorrow,
-                eta=eta3,
-                arguments=[timeslot_id, self.id],
+        if eta3 > now:
+            notification_tasks.append(
+                (
+                    "notify_timeslot_booking_closes_tomorrow",
+                    tasks.notify_student_session_timeslot_booking_freezes_tomorrow,
+                    eta3,
+                    [timeslot_id, self.id],
+                )
             )
-        self.save()
+        return notification_tasks
+
+    def schedule_notifications(
+        self,
+        start_time: datetime.datetime,
+        unbook_closes_at: datetime.datetime,
+        timeslot_id: int,
+    ) -> None:
+        assert self.is_accepted(), (
+            "Can only schedule notifications for accepted applications"
+        )
+        StudentSessionApplication.schedule_notifications_in_bulk(
+            [self], start_time, unbook_closes_at, timeslot_id
+        )
 
     def remove_notifications(self) -> None:
-        if self.notify_timeslot_tomorrow:
-            self.notify_timeslot_tomorrow.revoke()
-            self.notify_timeslot_tomorrow = None
-        if self.notify_timeslot_in_one_hour:
-            self.notify_timeslot_in_one_hour.revoke()
-            self.notify_timeslot_in_one_hour = None
-        if self.notify_timeslot_booking_closes_tomorrow:
-            self.notify_timeslot_booking_closes_tomorrow.revoke()
-            self.notify_timeslot_booking_closes_tomorrow = None
-        self.save()
+        StudentSessionApplication.remove_notifications_in_bulk([self])
 
+    @classmethod
+    def schedule_notifications_in_bulk(
+        cls,
+        applications: list["StudentSessionApplication"],
+        start_time: datetime.datetime,
+        unbook_closes_at: datetime.datetime,
+        timeslot_id: int,
+    ) -> None:
+        """
+        Replaces the reminders of applications booked on the same timeslot, with one revoke
+        broadcast for the old reminders, one insert of the new reminder rows and one update of
+        the applications.
+        """
+        changed: list[StudentSessionApplication] = cls._revoke_notifications(
+            applications
+        )
+        notification_tasks = [
+            (application, field, task, eta, arguments)
+            for application in applications
+            for field, task, eta, arguments in application._notification_tasks(
+                start_time, unbook_closes_at, timeslot_id
+            )
+        ]
+        scheduled = ScheduledCeleryTasks.schedule_tasks(
+            [
+                (task, eta, arguments)
+                for _, _, task, eta, arguments in notification_tasks
+            ]
+        )
+        for (application, field, *_), scheduled_task in zip(
+            notification_tasks, scheduled
+        ):
+            setattr(application, field, scheduled_task)
+        # Applications that neither had nor got reminders are not written
+        to_update: dict[int, StudentSessionApplication] = {
+            application.id: application
+            for application in [*changed, *(task[0] for task in notification_tasks)]
+        }
+        if to_update:
+            StudentSessionApplication.objects.bulk_update(
+                to_update.values(), cls.NOTIFICATION_FIELDS
+            )
+
+    @classmethod
+    def remove_notifications_in_bulk(
+        cls, applications: list["StudentSessionApplication"]
+    ) -> None:
+        """
+        Revokes the reminders of the applications with one broadcast and clears them with one
+        update, applications without reminders are not written.
+        """
+        changed: list[StudentSessionApplication] = cls._revoke_notifications(
+            applications
+        )
+        if changed:
+            StudentSessionApplication.objects.bulk_update(
+                changed, cls.NOTIFICATION_FIELDS
+            )
 
-class StudentSessionTimeslot(models.Model):
-    selected_applications = models.ManyToManyField(
+    @classmethod
+    def _revoke_notifications(
+        cls, applications: list["StudentSessionApplication"]
+    ) -> list["StudentSessionApplication"]:
+        """Revokes and unsets the reminders, returns the applications that had any."""
+        changed: list[StudentSessionApplication] = []
+        task_ids: list[int] = []
+        for application in applications:
+            ids: list[int] = [
+                task_id
+                for field in cls.NOTIFICATION_FIELDS
+                if (task_id := getattr(application, f"{field}_id")) is not None
+            ]
+            if ids:
+                task_ids.extend(ids)
+                changed.append(application)
+                for field in cls.NOTIFICATION_FIELDS:
+                    setattr(application, field, None)
+        ScheduledCeleryTasks.revoke_tasks(task_ids)
+        return changed
+
+
+class StudentSessionTimeslot(TrackedFieldsModel):
+    tracked_fields = ("start_time", "booking_closes_at")
+
+    selected_applications: "models.ManyToManyField[StudentSessionApplication, TimeslotSelection]" = models.ManyToManyField(
         StudentSessionApplication,
+        through="TimeslotSelection",
         related_name="selected_timeslots",
         blank=True,
         help_text="Selected applications for this timeslot - supports multiple for company events",
@@ -254,57 +357,156 @@ class StudentSessionTimeslot(models.Model):
     def __str__(self) -> str:
         return f"Timeslot {self.start_time} - {self.duration} minutes"
 
-    def is_available_for_application(self) -> bool:
-        """Check if this timeslot is available for booking."""
-        session_type = self.student_session.session_type
-
-        if session_type == SessionType.COMPANY_EVENT:
-            # Company events allow multiple selections
-            return True
-        else:  # regular
-            # Regular sessions only allow one selection
-            return self.selected_applications.count() == 0
+    @property
+    def is_exclusive(self) -> bool:
+        """Timeslots of regular sessions take one booking, those of company events any number."""
+        return bool(self.student_session.session_type == SessionType.REGULAR)
 
     def add_selection(self, application: StudentSessionApplication) -> None:
-        """Add an application selection to this timeslot."""
-        self.selected_applications.add(application)
+        """
+        Add an application selection to this timeslot and schedule its reminders.
+        Raises IntegrityError if the timeslot is taken or the application already has one.
+        Bookings go through here, selected_applications.add() schedules no reminders.
+        """
+        # A plain insert, selected_applications.add() would skip an existing booking silently
+        TimeslotSelection.objects.create(timeslot=self, application=application)
+        TimeslotSelection.send_added(self, {application.pk})
+        if application.is_accepted():
+            application.schedule_notifications(
+                self.start_time,
+                unbook_closes_at=self.booking_closes_at,
+                timeslot_id=self.id,
+            )
 
     def remove_selection(self, application: StudentSessionApplication) -> None:
-        """Remove an application selection from this timeslot."""
+        """Remove an application selection from this timeslot and revoke its reminders."""
         self.selected_applications.remove(application)
+        application.remove_notifications()
 
     def get_selected_application(self) -> StudentSessionApplication | None:
         """Get the single selected application for regular sessions."""
         return self.selected_applications.first()
 
     def save(self, *args, **kwargs) -> None:  # type: ignore
-        # Override the save method of the model
-        # Schedule a notification task
-        if self.pk is not None:
-            if self.selected_applications.exists():
-                self._remove_notifications()
-                self._schedule_notifications()
+        # Reschedule the reminders of the selected applications if the times moved,
+        # add_selection and remove_selection take care of bookings
+        if self.pk is not None and self.changed_fields(kwargs.get("update_fields")):
+            self.reschedule_notifications()
         super().save(*args, **kwargs)
 
     def delete(self, *args, **kwargs) -> tuple[int, dict[str, int]]:  # type: ignore
-        self._remove_notifications()
+        StudentSessionApplication.remove_notifications_in_bulk(
+            list(self.selected_applications.all())
+        )
         return super().delete(*args, **kwargs)
 
-    def _schedule_notifications(self) -> None:
-        # You have registered for YYY with XXX is tomorrow/ in one hour
-        for application in self.selected_applications.all():
-            application.schedule_notifications(
-                self.start_time,
-                unbook_closes_at=self.booking_closes_at,
-                timeslot_id=self.id,
-            )
+    def reschedule_notifications(self) -> None:
+        """Replaces the reminders of every selected application in bulk."""
+        applications: list[StudentSessionApplication] = list(
+            self.selected_applications.all()
+        )
+        accepted: list[StudentSessionApplication] = [
+            application for application in applications if application.is_accepted()
+        ]
+        StudentSessionApplication.remove_notifications_in_bulk(
+            [
+                application
+                for application in applications
+                if not application.is_accepted()
+            ]
+        )
+        StudentSessionApplication.schedule_notifications_in_bulk(
+            accepted, self.start_time, self.booking_closes_at, self.id
+        )
+
+
+class TimeslotSelectionQuerySet(models.QuerySet["TimeslotSelection"]):
+    def bulk_create(
+        self, objs: Iterable["TimeslotSelection"], *args: Any, **kwargs: Any
+    ) -> list["TimeslotSelection"]:
+        """
+        Copies the session type of the timeslots into `exclusive` like save() does, with one
+        query. selected_applications.add() inserts its bookings through here.
+        """
+        selections: list[TimeslotSelection] = list(objs)
+        regular: set[int] = set(
+            StudentSessionTimeslot.objects.filter(
+                id__in={selection.timeslot_id for selection in selections},
+                student_session__session_type=SessionType.REGULAR,
+            ).values_list("id", flat=True)
+        )
+        for selection in selections:
+            selection.exclusive = selection.timeslot_id in regular
+        return super().bulk_create(selections, *args, **kwargs)
+
+
+class TimeslotSelection(models.Model):
+    """
+    A booking of a timeslot by an application, the through model of
+    StudentSessionTimeslot.selected_applications. The database makes sure that an application
+    books at most one timeslot and that a timeslot of a regular session is booked at most once,
+    so concurrent bookings need no locks, the losing insert raises IntegrityError.
+    """
+
+    timeslot = models.ForeignKey(
+        StudentSessionTimeslot,
+        on_delete=models.CASCADE,
+        db_column="studentsessiontimeslot_id",
+    )
+    application = models.ForeignKey(
+        StudentSessionApplication,
+        on_delete=models.CASCADE,
+        db_column="studentsessionapplication_id",
+    )
+    # The constraint can not join the session, so its type is copied to every booking
+    exclusive = models.BooleanField(
+        default=True,
+        help_text="Set for timeslots of regular sessions, which take one booking",
+    )
 
-    def _remove_notifications(self) -> None:
-        for application in self.selected_applications.all():
-            application.remove_notifications()
+    objects = TimeslotSelectionQuerySet.as_manager()
+
+    class Meta:
+        # The table of the implicit many-to-many this model replaced
+        db_table = "student_sessions_studentsessiontimeslot_selected_applications"
+        constraints = [
+            UniqueConstraint(
+                fields=["application"], name="one_timeslot_per_application"
+            ),
+            UniqueConstraint(
+                fields=["timeslot"],
+                condition=models.Q(exclusive=True),
+                name="one_application_per_regular_timeslot",
+            ),
+        ]
+
+    def __str__(self) -> str:
+        return f"{self.application} in {self.timeslot}"
+
+    def save(self, *args: Any, **kwargs: Any) -> None:
+        self.exclusive = self.timeslot.is_exclusive
+        super().save(*args, **kwargs)
+
+    @staticmethod
+    def send_added(timeslot: StudentSessionTimeslot, application_ids: set[int]) -> None:
+        """
+        Sends the m2m_changed signal of selected_applications.add() for selections that were
+        inserted directly, so the receivers of the many-to-many see them.
+        """
+        m2m_changed.send(
+            sender=TimeslotSelection,
+            instance=timeslot,
+            action="post_add",
+            reverse=False,
+            model=StudentSessionApplication,
+            pk_set=application_ids,
+            using=timeslot._state.db,
+        )
 
 
-class StudentSession(models.Model):
+class StudentSession(TrackedFieldsModel):
+    tracked_fields = ("booking_open_time", "session_type")
+
     company = models.ForeignKey(  # Must be a foreign key to Company, as a company may have a student session and a company event
         Company,
         on_delete=models.CASCADE,
@@ -412,41 +614,137 @@ class StudentSession(models.Model):
         Calls full clean before saving to ensure constraints are checked.
         """
         self.full_clean()
-        saved = super().save(*args, **kwargs)
-        self.schedule_notifications()  # After save so id is not None
-        return saved
+        changed: set[str] = self.changed_fields(kwargs.get("update_fields"))
+        created: bool = self.pk is None
+        super().save(*args, **kwargs)
+        if "session_type" in changed and not created:
+            # Fails with IntegrityError if a timeslot that becomes exclusive is booked twice
+            TimeslotSelection.objects.filter(timeslot__student_session=self).update(
+                exclusive=self.session_type == SessionType.REGULAR
+            )
+        if "booking_open_time" in changed:
+            self.schedule_notifications()  # After save so id is not None
+            StudentSession.objects.filter(id=self.id).update(
+                notify_registration_open=self.notify_registration_open
+            )
 
     def revoke_and_reschedule_tasks(self) -> None:
         # Remove and reschedule notifications for the session itself
         self.schedule_notifications()  # This already revokes and reschedules
-        # For each timeslot, for each selected application, remove and reschedule notifications if timeslot is in the future
+        # Reminders of timeslots in the past are not scheduled again
         for timeslot in self.timeslots.all():
-            for application in timeslot.selected_applications.all():
-                application.remove_notifications()
-                if timeslot.start_time > timezone.now() and application.is_accepted():
-                    application.schedule_notifications(
-                        timeslot.start_time,
-                        unbook_closes_at=timeslot.booking_closes_at,
-                        timeslot_id=timeslot.id,
-                    )
-
-                setattr(application, "_signal_receivers_disabled", True)
-                application.save()
-            setattr(timeslot, "_signal_receivers_disabled", True)
-            timeslot.save()
+            timeslot.reschedule_notifications()
         setattr(self, "_signal_receivers_disabled", True)
         self.save()
 
 
 @receiver(m2m_changed, sender=StudentSessionTimeslot.selected_applications.through)
-def validate_single_selection(
-    sender: Any, instance: StudentSessionTimeslot, action: str, **kwargs: Any
+def invalidate_agendas_on_selection_change(
+    sender: Any,
+    instance: StudentSessionTimeslot | StudentSessionApplication,
+    action: str,
+    reverse: bool,
+    pk_set: set[int] | None,
+    **kwargs: Any,
 ) -> None:
-    if action in ("post_add", "post_remove", "post_clear"):
-        if (
-            instance.student_session.session_type == SessionType.REGULAR
-            and instance.selected_applications.count() > 1
-        ):
-            raise ValidationError(
-                "Regular sessions can only have one selected application"
+    from user_models.agenda import (  # Avoid circular import
+        invalidate_agendas,
+        invalidate_all_agendas,
+    )
+
+    if action not in ("post_add", "post_remove", "post_clear"):
+        return
+    if isinstance(instance, StudentSessionApplication):
+        invalidate_agendas([instance.user_id])
+    elif pk_set is None:  # Cleared, the applications are not known anymore
+        invalidate_all_agendas()
+    else:
+        invalidate_agendas(
+            StudentSessionApplication.objects.filter(id__in=pk_set).values_list(
+                "user_id", flat=True
             )
+        )
+
+
+@receiver(post_save, sender=StudentSessionApplication)
+@receiver(post_delete, sender=StudentSessionApplication)
+def invalidate_agenda_on_application_change(
+    sender: type[StudentSessionApplication],
+    instance: StudentSessionApplication,
+    **kwargs: Any,
+) -> None:
+    """Only accepted applications are on the agenda."""
+    from user_models.agenda import invalidate_agendas  # Avoid circular import
+
+    invalidate_agendas([instance.user_id])
+
+
+@receiver(post_save, sender=StudentSession)
+@receiver(post_delete, sender=StudentSession)
+def invalidate_session_catalog_on_change(
+    sender: type[StudentSession], instance: StudentSession, **kwargs: Any
+) -> None:
+    from student_sessions.catalog import (
+        invalidate_session_catalog,
+    )  # Avoid circular import
+
+    invalidate_session_catalog()
+
+
+@receiver(post_save, sender=StudentSessionTimeslot)
+@receiver(post_save, sender=StudentSession)
+@receiver(post_delete, sender=StudentSessionTimeslot)
+@receiver(post_delete, sender=StudentSession)
+def invalidate_agendas_on_schedule_change(
+    sender: type[models.Model],
+    instance: models.Model,
+    created: bool = False,
+    update_fields: frozenset[str] | None = None,
+    **kwargs: Any,
+) -> None:
+    """Moving or renaming a session or timeslot changes the agenda of everyone booked."""
+    from user_models.agenda import invalidate_all_agendas  # Avoid circular import
+
+    # Nobody is booked yet, or only the booking time was saved
+    if created or (update_fields is not None and update_fields <= {"time_booked"}):
+        return
+    invalidate_all_agendas()
+
+
+@receiver(m2m_changed, sender=StudentSessionTimeslot.selected_applications.through)
+def update_availability_on_selection_change(
+    sender: Any,
+    instance: StudentSessionTimeslot | StudentSessionApplication,
+    action: str,
+    **kwargs: Any,
+) -> None:
+    """Booking, unbooking and switching a timeslot all change the selections."""
+    from student_sessions.availability import (  # Avoid circular import
+        availability_changed,
+    )
+
+    if action in ("post_add", "post_remove", "post_clear"):
+        availability_changed(instance.student_session_id)
+
+
+@receiver(post_save, sender=StudentSessionTimeslot)
+@receiver(post_save, sender=StudentSession)
+@receiver(post_delete, sender=StudentSessionTimeslot)
+def update_availability_on_schedule_change(
+    sender: type[models.Model],
+    instance: StudentSessionTimeslot | StudentSession,
+    created: bool = False,
+    update_fields: frozenset[str] | None = None,
+    **kwargs: Any,
+) -> None:
+    from student_sessions.availability import (  # Avoid circular import
+        availability_changed,
+    )
+
+    if update_fields is not None and update_fields <= {"time_booked"}:
+        return
+    if isinstance(instance, StudentSession):
+        if not created:  # The session type decides if a booked timeslot is taken
+            availability_changed(instance.id)
+    else:
+        availability_changed(instance.student_session_id)
@@ -0,0 +1,65 @@
+import logging
+import operator
+from collections import defaultdict
+from functools import reduce
+
+from celery import shared_task  # type: ignore[import-untyped]
+from django.db import transaction
+from django.db.models import Q
+
+from student_sessions.models import (
+    ApplicationStatus,
+    StudentSessionApplication,
+    StudentSessionTimeslot,
+    TimeslotSelection,
+)
+
+logger = logging.getLogger(__name__)
+
+
+@shared_task  # type: ignore
+def send_application_decisions(decisions: dict[str, list[int]]) -> None:
+    """
+    Schedules the reminders of the accepted applications that are booked (onto a company event)
+    and notifies the students of the decisions, given as the ids of the applications by status,
+    see decisions.py.
+    Applications that were decided differently since are skipped, their own job notifies them.
+    """
+    schedule_booking_reminders(decisions.get(ApplicationStatus.ACCEPTED, []))
+
+    applications = StudentSessionApplication.objects.filter(
+        reduce(
+            operator.or_,
+            (Q(id__in=ids, status=status) for status, ids in decisions.items()),
+            Q(pk__in=[]),
+        )
+    ).select_related("user", "student_session__company")
+    for application in applications:
+        try:
+            application.decision_notification().save()
+        except Exception:
+            # One unreachable student must not keep the others from hearing back
+            logger.exception(
+                f"Failed to notify the decision on application {application.id}"
+            )
+
+
+def schedule_booking_reminders(application_ids: list[int]) -> None:
+    """Schedules the reminders of the booked accepted applications, in bulk per timeslot."""
+    with transaction.atomic():
+        selections = TimeslotSelection.objects.filter(
+            application_id__in=application_ids,
+            application__status=ApplicationStatus.ACCEPTED,
+        ).select_related("timeslot", "application")
+        booked: dict[StudentSessionTimeslot, list[StudentSessionApplication]] = (
+            defaultdict(list)
+        )
+        for selection in selections:
+            booked[selection.timeslot].append(selection.application)
+        for timeslot, applications in booked.items():
+            StudentSessionApplication.schedule_notifications_in_bulk(
+                applications,
+                timeslot.start_time,
+                timeslot.booking_closes_at,
+                timeslot.id,
+            )
@@ -1,7 +1,12 @@
 import datetime
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from unittest.mock import patch
 
 from django.core.exceptions import ValidationError
-from django.test import Client
+from django.db import IntegrityError, connection, connections, transaction
+from django.test import Client, TransactionTestCase, skipUnlessDBFeature
+from django.test.utils import CaptureQueriesContext
 
 from student_sessions.models import (
     StudentSessionTimeslot,
@@ -18,9 +23,19 @@ from django.core.files.uploadedfile import SimpleUploadedFile
 from django.test import TestCase, RequestFactory
 from django.utils import timezone
 
+from arkad.utils import is_transaction_conflict
 from companies.models import Company
-from student_sessions.models import StudentSession, StudentSessionApplication
+from notifications.models import Notification, ScheduledCeleryTasks
+from student_sessions.decisions import decide_applications
+from student_sessions.models import (
+    ApplicationStatus,
+    SessionType,
+    StudentSession,
+    StudentSessionApplication,
+    TimeslotSelection,
+)
 from student_sessions.import_export_resources import StudentSessionApplicationResource
+from student_sessions.tasks import send_application_decisions
 
 
 class StudentSessionTests(TestCase):
@@ -106,6 +121,31 @@ class StudentSessionTests(TestCase):
         data = StudentSessionNormalUserListSchema(**resp.json())
         self.assertEqual(data.numElements, 2)
 
+    def test_get_sessions_cached_catalog(self):
+        session = self._create_student_session(self.company_user1.company)
+        other = self._create_student_session(self.company_user2.company)
+        StudentSessionApplication.objects.create(
+            user=self.student_users[0], student_session=session, status="accepted"
+        )
+        headers = self._get_auth_headers(self.student_users[0])
+        self.client.get("/api/student-session/all", headers=headers)
+
+        with self.assertNumQueries(1):  # Only the user's application statuses
+            resp = self.client.get("/api/student-session/all", headers=headers)
+        data = StudentSessionNormalUserListSchema(**resp.json())
+        self.assertEqual(
+            {s.id: s.user_status for s in data.student_sessions},
+            {session.id: "accepted", other.id: None},
+        )
+
+        other.description = "Updated"
+        other.save()
+        resp = self.client.get("/api/student-session/all")
+        data = StudentSessionNormalUserListSchema(**resp.json())
+        self.assertEqual(
+            {s.id: s.description for s in data.student_sessions}[other.id], "Updated"
+        )
+
     def test_book_unopened_session(self):
         """Test that booking is not allowed for sessions that are not yet open"""
         session = StudentSession.objects.create(
@@ -374,6 +414,28 @@ class StudentSessionTests(TestCase):
         applicants = resp.json()
         self.assertEqual(len(applicants), 3)
 
+    def test_get_applicants_paginated(self):
+        session = self._create_student_session(self.company_user1.company)
+        for student in self.student_users:
+            StudentSessionApplication.objects.create(
+                user=student, student_session=session, motivation_text="Hire me"
+            )
+        headers = self._get_auth_headers(self.company_user1)
+
+        resp = self.client.get(
+            "/api/student-session/exhibitor/applicants?limit=3", headers=headers
+        )
+        self.assertEqual(len(resp.json()), 3)
+        resp = self.client.get(
+            "/api/student-session/exhibitor/applicants?limit=3&cursor="
+            + resp.headers["X-Next-Cursor"],
+            headers=headers,
+        )
+        self.assertEqual(
+            [a["user"]["firstName"] for a in resp.json()], ["Student3", "Student4"]
+        )
+        self.assertNotIn("X-Next-Cursor", resp.headers)
+
     def test_accept_applicant(self):
         """Test that exhibitors can accept applicants"""
         session = self._create_student_session(self.company_user1.company)
@@ -530,6 +592,69 @@ class StudentSessionTests(TestCase):
         for t in timeslots:
             self.assertGreater(t.booking_closes_at, timezone.now())
 
+    def test_get_timeslots_from_availability_snapshot(self):
+        session = self._create_student_session(self.company_user1.company)
+        first = self._create_timeslot(session)
+        second = self._create_timeslot(
+            session, start_time=timezone.now() + datetime.timedelta(hours=2)
+        )
+        for student in self.student_users[:2]:
+            StudentSessionApplication.objects.create(
+                user=student,
+                student_session=session,
+                motivation_text="Please accept me",
+                status="accepted",
+            )
+        url = f"/api/student-session/timeslots?company_id={session.company.id}"
+        booker = self._get_auth_headers(self.student_users[0])
+        other = self._get_auth_headers(self.student_users[1])
+        self.client.get(url, headers=other)
+
+        with self.assertNumQueries(1):  # Only the lookup of the application
+            resp = self.client.get(url, headers=other)
+        self.assertEqual([t["id"] for t in resp.json()], [first.id, second.id])
+
+        with self.captureOnCommitCallbacks(execute=True):
+            resp = self.client.post(
+                f"/api/student-session/accept?company_id={session.company.id}&timeslot_id={first.id}",
+                headers=booker,
+            )
+        self.assertEqual(resp.status_code, 200)
+        with self.assertNumQueries(1):  # Rebuilt when the booking was committed
+            resp = self.client.get(url, headers=other)
+        self.assertEqual([t["id"] for t in resp.json()], [second.id])
+        resp = self.client.get(url, headers=booker)
+        self.assertEqual(
+            [(t["id"], t["status"]) for t in resp.json()],
+            [(first.id, "bookedByCurrentUser"), (second.id, "free")],
+        )
+
+        with self.captureOnCommitCallbacks(execute=True):
+            resp = self.client.post(
+                "/api/student-session/switch-timeslot",
+                data={"from_timeslot_id": first.id, "new_timeslot_id": second.id},
+                content_type="application/json",
+                headers=booker,
+            )
+        self.assertEqual(resp.status_code, 200)
+        resp = self.client.get(url, headers=other)
+        self.assertEqual([t["id"] for t in resp.json()], [first.id])
+
+        with self.captureOnCommitCallbacks(execute=True):
+            resp = self.client.post(
+                f"/api/student-session/unbook?company_id={session.company.id}",
+                headers=booker,
+            )
+        self.assertEqual(resp.status_code, 200)
+        resp = self.client.get(url, headers=other)
+        self.assertEqual([t["id"] for t in resp.json()], [first.id, second.id])
+
+        # Editing the schedule changes the snapshot too
+        second.booking_closes_at = timezone.now() - datetime.timedelta(minutes=1)
+        second.save()
+        resp = self.client.get(url, headers=other)
+        self.assertEqual([t["id"] for t in resp.json()], [first.id])
+
     def test_unbook_timeslot(self):
         """Test that students can unbook their timeslots"""
         session = self._create_student_session(self.company_user1.company)
@@ -560,6 +685,69 @@ class StudentSessionTests(TestCase):
         self.assertEqual(timeslot.selected_applications.count(), 0)
         self.assertIsNone(timeslot.time_booked)
 
+    def test_timeslot_selection_constraints(self):
+        session = self._create_student_session(self.company_user1.company)
+        first = self._create_timeslot(session)
+        second = self._create_timeslot(
+            session, start_time=timezone.now() + datetime.timedelta(hours=2)
+        )
+        applications = [
+            StudentSessionApplication.objects.create(
+                user=student, student_session=session, status="accepted"
+            )
+            for student in self.student_users[:2]
+        ]
+        first.add_selection(applications[0])
+
+        # A regular timeslot is booked once, and an application books one timeslot
+        for timeslot, application in [
+            (first, applications[1]),
+            (second, applications[0]),
+            (first, applications[0]),
+        ]:
+            with self.assertRaises(IntegrityError), transaction.atomic():
+                timeslot.add_selection(application)
+
+        # Timeslots of company events take any number of bookings
+        session.session_type = SessionType.COMPANY_EVENT
+        session.company_event_at = timezone.now() + datetime.timedelta(days=2)
+        session.save()
+        first.refresh_from_db()
+        first.student_session.refresh_from_db()
+        first.add_selection(applications[1])
+        self.assertEqual(first.selected_applications.count(), 2)
+        self.assertFalse(TimeslotSelection.objects.filter(exclusive=True).exists())
+
+    def test_selected_applications_add_follows_the_session_type(self):
+        session = self._create_student_session(self.company_user1.company)
+        regular = self._create_timeslot(session)
+        event_session = self._create_student_session(self.company_user2.company)
+        event_session.session_type = SessionType.COMPANY_EVENT
+        event_session.company_event_at = timezone.now() + datetime.timedelta(days=2)
+        event_session.save()
+        event = self._create_timeslot(event_session)
+        applications = [
+            StudentSessionApplication.objects.create(
+                user=student, student_session=event_session, status="accepted"
+            )
+            for student in self.student_users[:3]
+        ]
+
+        # Company events take any number of bookings, also one at a time
+        event.selected_applications.add(applications[0])
+        event.selected_applications.add(applications[1])
+        applications[2].selected_timeslots.add(event)
+        self.assertEqual(event.selected_applications.count(), 3)
+        self.assertFalse(
+            TimeslotSelection.objects.filter(timeslot=event, exclusive=True).exists()
+        )
+
+        other = StudentSessionApplication.objects.create(
+            user=self.student_users[3], student_session=session, status="accepted"
+        )
+        regular.selected_applications.add(other)
+        self.assertTrue(TimeslotSelection.objects.get(timeslot=regular).exclusive)
+
     def test_get_application(self):
         """Test retrieving an existing application"""
         session = self._create_student_session(self.company_user1.company)
@@ -781,6 +969,93 @@ class StudentSessionTests(TestCase):
         self.assertEqual(new_timeslot.selected_applications.first(), application)
         self.assertIsNotNone(new_timeslot.time_booked)
 
+    def test_timeslot_reminders_follow_bookings_and_moves(self):
+        session = self._create_student_session(self.company_user1.company)
+        application = StudentSessionApplication.objects.create(
+            user=self.student_users[0], student_session=session, status="accepted"
+        )
+        start = timezone.now() + datetime.timedelta(hours=3)
+        current_timeslot = self._create_timeslot(session, start_time=start)
+        new_timeslot = self._create_timeslot(
+            session, start_time=start + datetime.timedelta(hours=2)
+        )
+
+        current_timeslot.add_selection(application)
+        old_task = application.notify_timeslot_in_one_hour
+        self.assertEqual(old_task.eta, start - datetime.timedelta(hours=1))
+
+        resp = self.client.post(
+            "/api/student-session/switch-timeslot",
+            data={
+                "from_timeslot_id": current_timeslot.id,
+                "new_timeslot_id": new_timeslot.id,
+            },
+            content_type="application/json",
+            headers=self._get_auth_headers(self.student_users[0]),
+        )
+        self.assertEqual(resp.status_code, 200, resp.content)
+        old_task.refresh_from_db()
+        self.assertTrue(old_task.revoked)
+        application.refresh_from_db()
+        moved_task = application.notify_timeslot_in_one_hour
+        self.assertEqual(moved_task.eta, start + datetime.timedelta(hours=1))
+
+        # Saves that do not move the timeslot leave the reminders alone
+        new_timeslot = StudentSessionTimeslot.objects.get(id=new_timeslot.id)
+        new_timeslot.duration = 45
+        new_timeslot.save()
+        application.refresh_from_db()
+        self.assertEqual(application.notify_timeslot_in_one_hour, moved_task)
+
+        new_timeslot.start_time += datetime.timedelta(hours=1)
+        new_timeslot.save()
+        application.refresh_from_db()
+        self.assertEqual(
+            application.notify_timeslot_in_one_hour.eta,
+            start + datetime.timedelta(hours=2),
+        )
+
+    def test_timeslot_reminders_are_rescheduled_in_bulk(self):
+        session = self._create_student_session(self.company_user1.company)
+        session.session_type = SessionType.COMPANY_EVENT
+        session.company_event_at = timezone.now() + datetime.timedelta(days=3)
+        session.save()
+        start = timezone.now() + datetime.timedelta(days=3)
+        timeslot = self._create_timeslot(
+            session,
+            start_time=start,
+            booking_closes_at=start - datetime.timedelta(hours=12),
+        )
+        applications = [
+            StudentSessionApplication.objects.create(
+                user=student, student_session=session, status="accepted"
+            )
+            for student in self.student_users[:4]
+        ]
+        for application in applications[:3]:
+            timeslot.add_selection(application)
+        old_tasks = set(ScheduledCeleryTasks.objects.values_list("id", flat=True))
+        self.assertEqual(len(old_tasks), 9)
+
+        # A booking only touches the reminders of the application that booked
+        timeslot.add_selection(applications[3])
+        self.assertEqual(
+            ScheduledCeleryTasks.objects.exclude(id__in=old_tasks).count(), 3
+        )
+        self.assertFalse(ScheduledCeleryTasks.objects.filter(revoked=True).exists())
+
+        with patch("arkad.celery.app.control.revoke") as revoke:
+            timeslot.start_time += datetime.timedelta(hours=1)
+            timeslot.save()
+        revoke.assert_called_once()  # One broadcast for all reminders
+        self.assertEqual(len(revoke.call_args.args[0]), 12)
+        for application in applications:
+            application.refresh_from_db()
+            self.assertEqual(
+                application.notify_timeslot_in_one_hour.eta,
+                start,
+            )
+
     def test_switch_timeslot_without_current_booking(self):
         """Test switching when user has no current booking"""
         session = self._create_student_session(self.company_user1.company)
@@ -1067,6 +1342,133 @@ class StudentSessionTests(TestCase):
         self.assertEqual(resp.status_code, 401, resp.content)
 
 
+class TimeslotBookingRaceTests(TransactionTestCase):
+    def setUp(self):
+        company = Company.objects.create(name="Racing")
+        self.session = StudentSession.objects.create(
+            company=company,
+            booking_close_time=timezone.now() + datetime.timedelta(days=1),
+            booking_open_time=timezone.now() - datetime.timedelta(days=1),
+        )
+        self.timeslots = [
+            StudentSessionTimeslot.objects.create(
+                student_session=self.session,
+                start_time=timezone.now() + datetime.timedelta(hours=1, minutes=30 * i),
+                booking_closes_at=timezone.now() + datetime.timedelta(days=1),
+            )
+            for i in range(20)
+        ]
+        self.students = User.objects.bulk_create(
+            User(
+                username=f"racer{i}",
+                email=f"racer{i}@student.com",
+                first_name="Racer",
+                last_name=str(i),
+                is_student=True,
+            )
+            for i in range(200)
+        )
+        StudentSessionApplication.objects.bulk_create(
+            StudentSessionApplication(
+                user=student,
+                student_session=self.session,
+                motivation_text="Faster",
+                status="accepted",
+            )
+            for student in self.students
+        )
+
+    def tearDown(self):
+        connections.close_all()
+
+    def _book(self, student: User, timeslot: StudentSessionTimeslot) -> int:
+        try:
+            return (
+                Client()
+                .post(
+                    f"/api/student-session/accept?company_id={self.session.company_id}&timeslot_id={timeslot.id}",
+                    headers={"Authorization": student.create_jwt_token()},
+                )
+                .status_code
+            )
+        finally:
+            connections.close_all()
+
+    @skipUnlessDBFeature("supports_partial_indexes")
+    def test_200_students_race_for_20_timeslots(self):
+        # Every student tries two timeslots at once, each timeslot is raced by 20 requests
+        attempts = [
+            (student, self.timeslots[(i + offset) % 20])
+            for i, student in enumerate(self.students)
+            for offset in (0, 1)
+        ]
+        with ThreadPoolExecutor(max_workers=16) as ex:
+            statuses = list(ex.map(lambda attempt: self._book(*attempt), attempts))
+
+        self.assertEqual(statuses.count(200), 20)
+        self.assertEqual(set(statuses), {200, 404, 409})
+        selections = TimeslotSelection.objects.all()
+        self.assertEqual(
+            sorted(selections.values_list("timeslot_id", flat=True)),
+            sorted(t.id for t in self.timeslots),
+        )
+        self.assertEqual(
+            len(set(selections.values_list("application_id", flat=True))), 20
+        )
+
+    def test_opposite_switches_do_not_deadlock(self):
+        # In each pair of timeslots the two holders swap in opposite directions at once,
+        # locking in request order that is s1 then s2 against s2 then s1
+        holders = self.students[:20]
+        for student, timeslot in zip(holders, self.timeslots):
+            timeslot.selected_applications.add(
+                StudentSessionApplication.objects.get(user=student)
+            )
+        start = threading.Barrier(20)
+
+        def switch(i: int) -> int:
+            client = Client()
+            start.wait()
+            try:
+                return client.post(
+                    "/api/student-session/switch-timeslot",
+                    data={
+                        "from_timeslot_id": self.timeslots[i].id,
+                        "new_timeslot_id": self.timeslots[i ^ 1].id,
+                    },
+                    content_type="application/json",
+                    headers={"Authorization": holders[i].create_jwt_token()},
+                ).status_code
+            finally:
+                connections.close_all()
+
+        with (
+            patch(
+                "arkad.utils.is_transaction_conflict",
+                wraps=is_transaction_conflict,
+            ) as conflict,
+            ThreadPoolExecutor(max_workers=20) as ex,
+        ):
+            statuses = list(ex.map(switch, range(20)))
+
+        self.assertNotIn(500, statuses)
+        self.assertLessEqual(set(statuses), {200, 404})
+        # Ordered locking leaves no deadlock to retry
+        conflict.assert_not_called()
+        # The other timeslot of each pair is taken, so everyone keeps their booking
+        self.assertEqual(
+            sorted(
+                TimeslotSelection.objects.filter(
+                    application__user__in=holders
+                ).values_list("application__user_id", "timeslot_id")
+            ),
+            sorted(
+                (student.id, timeslot.id)
+                for student, timeslot in zip(holders, self.timeslots)
+            ),
+        )
+
+
 class StudentSessionApplicationResourceTest(TestCase):
     @classmethod
     def setUpTestData(cls):
@@ -2024,3 +2426,142 @@ class CompanyEventSessionTests(TestCase):
         self.assertEqual(apps[4].status, "rejected")
         self.assertNotIn(apps[2], timeslot.selected_applications.all())
         self.assertNotIn(apps[4], timeslot.selected_applications.all())
+
+    def test_bulk_decision_books_company_event_and_enqueues_one_job(self):
+        """Deciding many applications at once books them together and notifies in one job."""
+        event_session = StudentSession.objects.create(
+            company=self.company_user.company,
+            booking_close_time=timezone.now() + datetime.timedelta(days=1),
+            booking_open_time=timezone.now() - datetime.timedelta(days=1),
+            session_type=SessionType.COMPANY_EVENT,
+            company_event_at=timezone.now() + datetime.timedelta(days=7),
+        )
+        apps = [
+            StudentSessionApplication.objects.create(
+                user=user, student_session=event_session, status="pending"
+            )
+            for user in self.student_users[:4]
+        ]
+        apps[0].status = "accepted"
+        apps[0].save()
+
+        with (
+            patch("student_sessions.tasks.send_application_decisions.delay") as delay,
+            self.captureOnCommitCallbacks(execute=True),
+        ):
+            changed = decide_applications(
+                [app.id for app in apps], ApplicationStatus.ACCEPTED
+            )
+
+        # The application accepted before is left as it is
+        self.assertEqual(changed, sorted(app.id for app in apps[1:]))
+        delay.assert_called_once_with({ApplicationStatus.ACCEPTED: changed})
+        timeslot = StudentSessionTimeslot.objects.get(student_session=event_session)
+        self.assertEqual(
+            set(timeslot.selected_applications.values_list("id", flat=True)),
+            set(changed),
+        )
+        self.assertFalse(
+            TimeslotSelection.objects.filter(application__in=changed, exclusive=True)
+        )
+
+        # The job notifies the students whose application still has the decision
+        StudentSessionApplication.objects.filter(id=changed[0]).update(
+            status="rejected"
+        )
+        send_application_decisions({ApplicationStatus.ACCEPTED: changed})
+        self.assertEqual(
+            set(Notification.objects.values_list("target_user_id", flat=True)),
+            {app.user_id for app in apps[2:]},
+        )
+        # and schedules the reminders of their bookings
+        self.assertEqual(
+            set(
+                StudentSessionApplication.objects.filter(
+                    notify_timeslot_in_one_hour__isnull=False
+                ).values_list("id", flat=True)
+            ),
+            set(changed[1:]),
+        )
+
+    def test_pending_only_decision_does_not_overturn_a_decision(self):
+        """update-application-status can not change an application that was decided."""
+        session = StudentSession.objects.create(
+            company=self.company_user.company,
+            booking_close_time=timezone.now() + datetime.timedelta(days=1),
+            booking_open_time=timezone.now() - datetime.timedelta(days=1),
+        )
+        application = StudentSessionApplication.objects.create(
+            user=self.student_users[0], student_session=session, status="pending"
+        )
+        self.assertEqual(
+            decide_applications(
+                [application.id], ApplicationStatus.REJECTED, pending_only=True
+            ),
+            [application.id],
+        )
+        self.assertEqual(
+            decide_applications(
+                [application.id], ApplicationStatus.ACCEPTED, pending_only=True
+            ),
+            [],
+        )
+        application.refresh_from_db()
+        self.assertEqual(application.status, "rejected")
+
+    def test_import_queries_do_not_grow_with_the_file(self):
+        """Previewing and importing a large file takes the same few queries as a small one."""
+        event_session = StudentSession.objects.create(
+            company=self.company_user.company,
+            booking_close_time=timezone.now() + datetime.timedelta(days=1),
+            booking_open_time=timezone.now() - datetime.timedelta(days=1),
+            session_type=SessionType.COMPANY_EVENT,
+            company_event_at=timezone.now() + datetime.timedelta(days=7),
+        )
+        users = User.objects.bulk_create(
+            User(username=f"import-{i}", email=f"import-{i}@example.com")
+            for i in range(60)
+        )
+        apps = StudentSessionApplication.objects.bulk_create(
+            StudentSessionApplication(
+                user=user, student_session=event_session, status="pending"
+            )
+            for user in users
+        )
+        dataset = tablib.Dataset(
+            *[
+                (app.id, "accepted" if i % 3 else "rejected")
+                for i, app in enumerate(apps)
+            ],
+            headers=("id", "Status"),
+        )
+        resource = StudentSessionApplicationResource(
+            request=RequestFactory(SERVER_NAME="testserver").get("/admin/")
+        )
+
+        with CaptureQueriesContext(connection) as preview:
+            result = resource.import_data(dataset, dry_run=True)
+        self.assertFalse(result.has_errors())
+        self.assertLessEqual(len(preview), 10)
+        self.assertFalse(
+            StudentSessionApplication.objects.exclude(status="pending").exists()
+        )
+
+        with (
+            patch("student_sessions.tasks.send_application_decisions.delay") as delay,
+            self.captureOnCommitCallbacks(execute=True),
+            CaptureQueriesContext(connection) as queries,
+        ):
+            resource.import_data(dataset, dry_run=False)
+        self.assertLessEqual(len(queries), 30)
+
+        accepted = sorted(app.id for i, app in enumerate(apps) if i % 3)
+        rejected = sorted(app.id for i, app in enumerate(apps) if not i % 3)
+        delay.assert_called_once_with(
+            {ApplicationStatus.ACCEPTED: accepted, ApplicationStatus.REJECTED: rejected}
+        )
+        timeslot = StudentSessionTimeslot.objects.get(student_session=event_session)
+        self.assertEqual(
+            sorted(timeslot.selected_applications.values_list("id", flat=True)),
+            accepted,
+        )
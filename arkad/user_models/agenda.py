@@ -0,0 +1,136 @@
+"""
+Personal agenda served by GET /api/me/agenda: the events a user has tickets to and the student
+session and company event timeslots they booked, sorted by start time.
+
+The agenda is built from two joined queries and cached per user as serialized JSON. The cache
+of a user is dropped when one of their bookings changes, and a shared schedule version is bumped
+when events, sessions or timeslots are edited, which changes the agenda of everyone attending.
+Like the event catalog, both are done immediately and again on commit, so a request that read
+the database just before the change can not cache the old agenda for long.
+"""
+
+import datetime
+import json
+import time
+from typing import Any, Iterable
+
+from django.core.cache import cache
+from django.db import transaction
+from django.http import HttpResponse
+from ninja.responses import NinjaJSONEncoder
+
+from arkad.utils import cache_namespace
+from event_booking.models import Ticket
+from student_sessions.models import (
+    ApplicationStatus,
+    SessionType,
+    StudentSessionTimeslot,
+)
+from user_models.schema import AgendaItemSchema, AgendaItemType
+
+AGENDA_TTL_SECONDS: int = 60 * 60
+
+
+def _version_key() -> str:
+    return f"agenda:{cache_namespace()}:schedule-version"
+
+
+def _agenda_key(user_id: int) -> str:
+    return f"agenda:{cache_namespace()}:user:{user_id}"
+
+
+def _get_schedule_version() -> int:
+    key: str = _version_key()
+    version: int | None = cache.get(key)
+    if version is None:
+        version = time.time_ns()
+        if not cache.add(key, version, timeout=None):
+            version = cache.get(key, version)
+    assert version is not None
+    return version
+
+
+def build_agenda(user_id: int) -> list[AgendaItemSchema]:
+    """The agenda of the user, from one query for tickets and one for booked timeslots."""
+    items: list[AgendaItemSchema] = [
+        AgendaItemSchema(
+            type=AgendaItemType.EVENT,
+            title=ticket.event.name,
+            start_time=ticket.event.start_time,
+            end_time=ticket.event.end_time,
+            location=ticket.event.location,
+            company_id=ticket.event.company_id,
+            company_name=ticket.event.company.name if ticket.event.company else None,
+            event_id=ticket.event_id,
+            ticket_uuid=ticket.uuid,
+        )
+        for ticket in Ticket.objects.select_related("event__company").filter(
+            user_id=user_id
+        )
+    ]
+
+    timeslots = (
+        StudentSessionTimeslot.objects.select_related("student_session__company")
+        .filter(
+            selected_applications__user_id=user_id,
+            selected_applications__status=ApplicationStatus.ACCEPTED,
+        )
+        .distinct()
+    )
+    for timeslot in timeslots:
+        session = timeslot.student_session
+        items.append(
+            AgendaItemSchema(
+                type=AgendaItemType.COMPANY_EVENT
+                if session.session_type == SessionType.COMPANY_EVENT
+                else AgendaItemType.STUDENT_SESSION,
+                title=str(session),
+                start_time=timeslot.start_time,
+                end_time=timeslot.start_time
+                + datetime.timedelta(minutes=timeslot.duration),
+                location=session.location,
+                company_id=session.company_id,
+                company_name=session.company.name,
+                timeslot_id=timeslot.id,
+            )
+        )
+    items.sort(key=lambda item: item.start_time)
+    return items
+
+
+def render_agenda(user_id: int) -> HttpResponse:
+    """Renders the agenda as a JSON list of AgendaItemSchema, from the cache when possible."""
+    version: int = _get_schedule_version()
+    cached: tuple[int, str] | None = cache.get(_agenda_key(user_id))
+    if cached is not None and cached[0] == version:
+        content: str = cached[1]
+    else:
+        data: list[dict[str, Any]] = [
+            item.model_dump(by_alias=True) for item in build_agenda(user_id)
+        ]
+        content = json.dumps(data, cls=NinjaJSONEncoder)
+        cache.set(_agenda_key(user_id), (version, content), timeout=AGENDA_TTL_SECONDS)
+    return HttpResponse(content, content_type="application/json; charset=utf-8")
+
+
+def invalidate_agendas(user_ids: Iterable[int]) -> None:
+    """Call when bookings of these users changed."""
+    keys: list[str] = [_agenda_key(user_id) for user_id in set(user_ids)]
+    if not keys:
+        return
+
+    def drop() -> None:
+        cache.delete_many(keys)
+
+    drop()
+    transaction.on_commit(drop)
+
+
+def invalidate_all_agendas() -> None:
+    """Call when an event, student session or timeslot is edited or deleted."""
+
+    def bump() -> None:
+        cache.set(_version_key(), time.time_ns(), timeout=None)
+
+    bump()
+    transaction.on_commit(bump)
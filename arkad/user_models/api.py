@@ -15,13 +15,15 @@ from django.urls import reverse
 from django.utils.http import urlsafe_base64_encode
 from django.utils.encoding import force_bytes
 from ninja import File, UploadedFile, PatchDict
-from arkad.customized_django_ninja import Router
+from arkad.customized_django_ninja import ListType, Router
 from arkad.jwt_utils import jwt_encode, jwt_decode
 from arkad.settings import SECRET_KEY
 from email_app.emails import send_signup_code_email
 from email_app.utils import get_base_url
+from user_models.agenda import render_agenda
 from user_models.models import User, AuthenticatedRequest
 from user_models.schema import (
+    AgendaItemSchema,
     SigninSchema,
     ProfileSchema,
     SignupSchema,
@@ -39,6 +41,7 @@ auth = Router(tags=["Authentication"])
 profile = Router(tags=["User Profile"])
 staff_enrollment = Router(tags=["Staff Enrollment"])
 router = Router(tags=["Users"])
+me = Router(tags=["Me"])
 router.add_router("", auth)
 router.add_router("profile", profile)
 router.add_router("staff-enrollment", staff_enrollment)
@@ -483,3 +486,12 @@ def staff_complete_signup(request: HttpRequest, data: StaffCompleteSignupSchema)
             return 400, "Email already exists"
         else:
             return 500, "Something went wrong"
+
+
+@me.get("agenda", response={200: ListType[AgendaItemSchema]})
+def get_agenda(request: AuthenticatedRequest):
+    """
+    Returns the events the user has tickets to and the student session and company event
+    timeslots they booked, sorted by start time.
+    """
+    return render_agenda(request.user.id)
@@ -0,0 +1,136 @@
+"""
+Cache used to resolve the user behind an authenticated API request.
+
+Every authenticated request resolves a user, so instead of querying Postgres each time
+users are looked up in two layers:
+
+1. A small per-process LRU with a short TTL, so bursts from the same phone never leave the worker.
+2. A shared Redis entry keyed by the user id and a per-user "auth epoch".
+
+Bumping the epoch (on save/delete) orphans every shared entry for that user. The epoch is bumped
+both immediately and on commit: a request that read the row before the saving transaction
+committed may have cached the old user under the first new epoch, the second bump orphans it.
+Other processes may keep serving the old instance for at most LOCAL_TTL_SECONDS after the commit.
+
+Bearer tokens are revoked per user with a "tokens issued before T are invalid" timestamp,
+stored in Redis next to the epoch and fetched in the same round trip. Tokens carry their
+issue time in the `iat` claim, tokens without one predate revocation and are treated as
+issued at 0. The timestamp is cached locally together with the user, so a revocation
+reaches every process within LOCAL_TTL_SECONDS.
+"""
+
+import copy
+import threading
+import time
+from typing import Any, NamedTuple
+
+from cachetools import TTLCache  # type: ignore[import-untyped]
+from django.core.cache import cache
+from django.db import transaction
+
+from arkad.utils import cache_namespace
+from user_models.models import User
+
+LOCAL_TTL_SECONDS: float = 5
+LOCAL_MAX_SIZE: int = 2048
+SHARED_TTL_SECONDS: int = 10 * 60
+
+
+class _AuthEntry(NamedTuple):
+    user: User
+    revoked_before: float
+
+
+_local_entries: TTLCache = TTLCache(maxsize=LOCAL_MAX_SIZE, ttl=LOCAL_TTL_SECONDS)
+_local_lock = threading.Lock()
+
+
+def _epoch_key(user_id: int) -> str:
+    return f"auth:{cache_namespace()}:epoch:{user_id}"
+
+
+def _user_key(user_id: int, epoch: int) -> str:
+    return f"auth:{cache_namespace()}:user:{user_id}:{epoch}"
+
+
+def _revoked_before_key(user_id: int) -> str:
+    return f"auth:{cache_namespace()}:revoked-before:{user_id}"
+
+
+def _get_auth_state(user_id: int) -> tuple[int, float]:
+    """Returns the auth epoch and revocation timestamp of the user in one round trip."""
+    key: str = _epoch_key(user_id)
+    revoked_key: str = _revoked_before_key(user_id)
+    values: dict[str, Any] = cache.get_many([key, revoked_key])
+    revoked_before: float = float(values.get(revoked_key, 0))
+    epoch: int | None = values.get(key)
+    if epoch is None:
+        epoch = time.time_ns()
+        if not cache.add(key, epoch, timeout=None):
+            # Someone else initialised it first, use theirs
+            epoch = cache.get(key, epoch)
+    assert epoch is not None
+    return epoch, revoked_before
+
+
+def _get_auth_entry(user_id: int) -> _AuthEntry | None:
+    with _local_lock:
+        entry: _AuthEntry | None = _local_entries.get(user_id)
+    if entry is not None:
+        return entry
+
+    epoch, revoked_before = _get_auth_state(user_id)
+    user: User | None = cache.get(_user_key(user_id, epoch))
+    if user is None:
+        user = User.objects.select_related("company").filter(id=user_id).first()
+        if user is None:
+            return None
+        cache.set(_user_key(user_id, epoch), user, timeout=SHARED_TTL_SECONDS)
+
+    entry = _AuthEntry(user, revoked_before)
+    with _local_lock:
+        _local_entries[user_id] = entry
+    return entry
+
+
+def get_cached_user(user_id: int) -> User | None:
+    """
+    Returns the user with the given id (with company preloaded) or None if it does not exist.
+
+    The returned instance is a copy, so callers may modify it freely.
+    """
+    entry: _AuthEntry | None = _get_auth_entry(user_id)
+    return copy.copy(entry.user) if entry is not None else None
+
+
+def is_token_revoked(user_id: int, issued_at: float | None) -> bool:
+    """
+    Returns True if a token for the user issued at `issued_at` (the `iat` claim) has been revoked.
+    """
+    entry: _AuthEntry | None = _get_auth_entry(user_id)
+    if entry is None:
+        return True
+    return (issued_at or 0) < entry.revoked_before
+
+
+def invalidate_cached_user(user_id: int) -> None:
+    """
+    Invalidates all cached copies of the user, call whenever a user is changed or deleted.
+    """
+
+    def bump() -> None:
+        cache.set(_epoch_key(user_id), time.time_ns(), timeout=None)
+        with _local_lock:
+            _local_entries.pop(user_id, None)
+
+    bump()
+    transaction.on_commit(bump)
+
+
+def revoke_user_tokens(user_id: int) -> None:
+    """
+    Invalidates every token issued to the user until now, e.g. after a password reset.
+    """
+    # Kept forever, tokens may live for 30 days and must not become valid again
+    cache.set(_revoked_before_key(user_id), time.time(), timeout=None)
+    invalidate_cached_user(user_id)
@@ -0,0 +1,71 @@
+import random
+import time
+from typing import Any, Callable
+
+import jwt
+from django.core.management import BaseCommand, CommandParser
+
+from arkad import jwt_utils
+from arkad.jwt_utils import jwt_decode, jwt_decode_cached, jwt_encode
+
+
+class Command(BaseCommand):
+    help = (
+        "Microbenchmark of bearer token verification, compares the uncached RS256 "
+        "verification with the verified-token cache at different hit rates."
+    )
+
+    def add_arguments(self, parser: CommandParser) -> None:
+        parser.add_argument(
+            "--requests", type=int, default=20000, help="Simulated requests per run."
+        )
+        parser.add_argument(
+            "--hit-rates",
+            type=float,
+            nargs="+",
+            default=[0.5, 0.9, 0.99],
+            help="Fractions of requests carrying an already seen token.",
+        )
+
+    def handle(self, *args: Any, **options: Any) -> None:
+        n: int = options["requests"]
+        rng = random.Random(0)
+
+        # Pre-generate every token so signing is not part of the measurement
+        fresh_tokens: list[str] = [
+            jwt_encode({"user_id": i}, expiry_minutes=60) for i in range(n)
+        ]
+        repeated_token: str = jwt_encode({"user_id": -1}, expiry_minutes=60)
+
+        def legacy_decode(token: str) -> dict[str, Any]:
+            # What every request did before: parse the PEM and verify the signature
+            return jwt.decode(  # type: ignore[no-any-return]
+                token,
+                jwt_utils.SIGNING_KEY.public_pem(),
+                algorithms=[jwt_utils.SIGNING_KEY.algorithm],
+            )
+
+        baseline: float = self._measure(legacy_decode, fresh_tokens)
+        self.stdout.write(f"PEM parse + verify (previous):  {baseline:8.2f} us/request")
+        uncached: float = self._measure(jwt_decode, fresh_tokens)
+        self.stdout.write(f"verify with parsed key:         {uncached:8.2f} us/request")
+
+        for hit_rate in options["hit_rates"]:
+            jwt_utils._verified_tokens.clear()
+            tokens: list[str] = [
+                repeated_token if rng.random() < hit_rate else fresh_tokens[i]
+                for i in range(n)
+            ]
+            cached: float = self._measure(jwt_decode_cached, tokens)
+            self.stdout.write(
+                f"cached, {hit_rate:5.0%} hit rate:         {cached:8.2f} us/request "
+                f"(saves {baseline - cached:7.2f} us, {1 - cached / baseline:5.1%})"
+            )
+
+    @staticmethod
+    def _measure(decode: Callable[[str], dict[str, Any]], tokens: list[str]) -> float:
+        """Returns the CPU time per call in microseconds."""
+        start: float = time.process_time()
+        for token in tokens:
+            decode(token)
+        return (time.process_time() - start) / len(tokens) * 1_000_000
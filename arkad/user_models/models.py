@@ -2,6 +2,8 @@ from functools import partial
 from typing import Any
 
 from django.contrib.auth.models import AbstractUser
+from django.db.models.signals import post_delete, post_save
+from django.dispatch import receiver
 from pydantic import BaseModel, GetCoreSchemaHandler
 from pydantic_core import CoreSchema, core_schema
 
@@ -123,6 +125,8 @@ class User(AbstractUser):
 
     fcm_token = models.TextField(null=True, blank=True)
 
+    _password_changed: bool = False
+
     @property
     def is_company(self) -> bool:
         return self.company is not None
@@ -141,6 +145,11 @@ class User(AbstractUser):
             expiry_minutes=expiry_days * 24 * 60,
         )
 
+    def set_password(self, raw_password: str | None) -> None:
+        super().set_password(raw_password)
+        # Existing tokens are revoked once the new password is saved
+        self._password_changed = True
+
     def get_auth_headers(self) -> dict[str, str]:
         return {"Authorization": self.create_jwt_token()}
 
@@ -157,6 +166,32 @@ class User(AbstractUser):
         return super().delete(*args, **kwargs)
 
 
+@receiver(post_save, sender=User)
+@receiver(post_delete, sender=User)
+def invalidate_auth_cache(sender: type[User], instance: User, **kwargs: Any) -> None:
+    """Makes sure authenticated requests never see a stale (e.g. deactivated) user."""
+    from user_models.auth_cache import invalidate_cached_user  # Avoid circular import
+
+    invalidate_cached_user(instance.id)
+
+
+@receiver(post_save, sender=User)
+@receiver(post_delete, sender=User)
+def revoke_auth_tokens(
+    sender: type[User], instance: User, created: bool = False, **kwargs: Any
+) -> None:
+    """Revokes issued tokens when the password changes or the user is deactivated or deleted."""
+    from user_models.auth_cache import revoke_user_tokens  # Avoid circular import
+
+    deleted: bool = kwargs["signal"] is post_delete
+    password_changed: bool = instance._password_changed
+    instance._password_changed = False
+    if created:
+        return
+    if deleted or password_changed or not instance.is_active:
+        revoke_user_tokens(instance.id)
+
+
 class PydanticUser:
     @classmethod
     def __get_pydantic_core_schema__(
@@ -1,3 +1,7 @@
+from datetime import datetime
+from enum import Enum
+from uuid import UUID
+
 from arkad.customized_django_ninja import Schema
 
 
@@ -88,3 +92,22 @@ class StaffCompleteSignupSchema(Schema):
     password: str
     first_name: str | None = None
     last_name: str | None = None
+
+
+class AgendaItemType(str, Enum):
+    EVENT = "event"
+    STUDENT_SESSION = "student_session"
+    COMPANY_EVENT = "company_event"
+
+
+class AgendaItemSchema(Schema):
+    type: AgendaItemType
+    title: str
+    start_time: datetime
+    end_time: datetime
+    location: str | None = None
+    company_id: int | None = None
+    company_name: str | None = None
+    event_id: int | None = None  # Events
+    ticket_uuid: UUID | None = None  # Events
+    timeslot_id: int | None = None  # Student sessions and company events
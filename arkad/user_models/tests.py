@@ -1,8 +1,21 @@
 from django.core.files.uploadedfile import SimpleUploadedFile
+import datetime
+
+from django.core.cache import cache
 from django.test import TestCase, Client
+from django.utils import timezone
 from django.contrib.auth import get_user_model
 
 from arkad.jwt_utils import jwt_encode, jwt_decode, PUBLIC_KEY
+from companies.models import Company
+from event_booking.models import Event, Ticket
+from student_sessions.models import (
+    ApplicationStatus,
+    StudentSession,
+    StudentSessionApplication,
+    StudentSessionTimeslot,
+)
+from user_models.agenda import invalidate_agendas
 
 User = get_user_model()
 
@@ -420,3 +433,76 @@ class DeleteAccountTestCase(TestCase):
             os.path.exists(profile_pic_path),
             "Profile picture should be deleted from filesystem",
         )
+
+
+class AgendaTestCase(TestCase):
+    def setUp(self):
+        cache.clear()  # Agendas are cached per user id
+        self.user = User.objects.create_user(
+            username="agenda", password="p", first_name="A"
+        )
+        self.headers = {"Authorization": self.user.create_jwt_token()}
+        self.company = Company.objects.create(name="Agenda AB")
+        now = timezone.now()
+        self.event = Event.objects.create(
+            name="Lunch lecture",
+            location="E:A",
+            company=self.company,
+            start_time=now + datetime.timedelta(days=3),
+            end_time=now + datetime.timedelta(days=3, hours=1),
+            capacity=10,
+        )
+        self.ticket = Ticket.objects.create(user=self.user, event=self.event)
+        session = StudentSession.objects.create(company=self.company)
+        application = StudentSessionApplication.objects.create(
+            student_session=session,
+            user=self.user,
+            status=ApplicationStatus.ACCEPTED,
+        )
+        self.timeslot = StudentSessionTimeslot.objects.create(
+            student_session=session,
+            start_time=now + datetime.timedelta(days=2),
+            duration=30,
+        )
+        self.timeslot.selected_applications.add(application)
+
+    def _agenda(self) -> list[dict]:
+        response = self.client.get("/api/me/agenda", headers=self.headers)
+        self.assertEqual(response.status_code, 200)
+        return response.json()
+
+    def test_agenda_is_sorted_and_built_in_two_queries(self):
+        self._agenda()  # Warms the user lookup of the authentication
+        invalidate_agendas([self.user.id])
+        with self.assertNumQueries(2):
+            agenda = self._agenda()
+        self.assertEqual(
+            [
+                (item["type"], item.get("timeslotId"), item.get("eventId"))
+                for item in agenda
+            ],
+            [
+                ("student_session", self.timeslot.id, None),
+                ("event", None, self.event.id),
+            ],
+        )
+        self.assertEqual(agenda[1]["ticketUuid"], str(self.ticket.uuid))
+        self.assertEqual(agenda[0]["companyName"], "Agenda AB")
+
+        with self.assertNumQueries(0):
+            self.assertEqual(self._agenda(), agenda)
+
+    def test_agenda_follows_changes(self):
+        self._agenda()
+        self.ticket.delete()
+        self.assertEqual([item["type"] for item in self._agenda()], ["student_session"])
+
+        self.timeslot.start_time += datetime.timedelta(days=1)
+        self.timeslot.save()
+        self.assertEqual(
+            self._agenda()[0]["startTime"][:16],
+            self.timeslot.start_time.isoformat()[:16],
+        )
+
+        self.timeslot.selected_applications.clear()
+        self.assertEqual(self._agenda(), [])
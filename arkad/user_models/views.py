@@ -29,7 +29,7 @@ def delete_account(request: HttpRequest) -> HttpResponse:
             )
             return redirect(reverse("delete_account"))
 
-        # Delete the user and all associated data
+        # Delete the user and all associated data, this also revokes all issued tokens
         user.delete()
         messages.success(request, "Your account has been successfully deleted.")
         return redirect("/")